@@ -0,0 +1,185 @@
+"""Concurrent size and image-header probing for page assets such as images."""
+import asyncio
+import os
+from collections import OrderedDict, deque
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+from fetcher import AsyncLRUCache, http_client
+from image_headers import parse_image_header
+
+ASSET_PROBE_CONCURRENCY = int(os.getenv('DBIM_ASSET_PROBE_CONCURRENCY', '16'))
+ASSET_PROBE_TIMEOUT = float(os.getenv('DBIM_ASSET_PROBE_TIMEOUT', '10'))
+ASSET_PROBE_CACHE_TTL = float(os.getenv('DBIM_ASSET_PROBE_CACHE_TTL', '300'))
+ASSET_PROBE_CACHE_MAX_ENTRIES = int(os.getenv('DBIM_ASSET_PROBE_CACHE_MAX_ENTRIES', '4096'))
+# Image header probes read this many leading bytes first, growing up to the max if needed
+IMAGE_HEADER_BYTES = int(os.getenv('DBIM_IMAGE_HEADER_BYTES', str(16 * 1024)))
+IMAGE_HEADER_MAX_BYTES = int(os.getenv('DBIM_IMAGE_HEADER_MAX_BYTES', str(256 * 1024)))
+
+# Probe results are shared by every check that looks at the same asset
+asset_probe_cache = AsyncLRUCache(ASSET_PROBE_CACHE_TTL, ASSET_PROBE_CACHE_MAX_ENTRIES)
+
+
+def _content_range_total(value: str) -> int:
+    """Return the total length from a ``Content-Range: bytes 0-0/12345`` header."""
+    total = value.rpartition('/')[2].strip()
+    return int(total) if total.isdigit() else 0
+
+
+def _interleave_by_host(urls: Iterable[str]) -> List[str]:
+    """Order URLs round-robin by host so no single host monopolises the probe slots."""
+    by_host: "OrderedDict[str, deque]" = OrderedDict()
+    for url in urls:
+        by_host.setdefault(urlsplit(url).netloc.lower(), deque()).append(url)
+    ordered = []
+    while by_host:
+        for host in list(by_host):
+            queue = by_host[host]
+            ordered.append(queue.popleft())
+            if not queue:
+                del by_host[host]
+    return ordered
+
+
+async def _probe_asset_size(url: str, headers: Optional[Dict[str, str]],
+                            timeout: float) -> Dict[str, object]:
+    """
+    Find the byte size of an asset without downloading its body.
+    Uses HEAD first, then a one-byte Range GET, then a GET that is closed
+    as soon as the response headers arrive. ``size_bytes`` is None when no
+    response states a length (e.g. chunked transfer encoding).
+    """
+    resp = await http_client.head(url, headers=headers, timeout=timeout)
+    size = int(resp.headers.get('content-length', 0) or 0)
+    method = 'head'
+    if size == 0:
+        range_headers = {**(headers or {}), 'Range': 'bytes=0-0'}
+        async with http_client.stream('GET', url, headers=range_headers, timeout=timeout) as resp:
+            if resp.status_code == 206 and 'content-range' in resp.headers:
+                size = _content_range_total(resp.headers['content-range'])
+                method = 'range'
+            else:
+                size = int(resp.headers.get('content-length', 0) or 0)
+                method = 'get'
+    return {
+        'url': url,
+        'size_bytes': size or None,
+        'status_code': resp.status_code,
+        'content_type': resp.headers.get('content-type', ''),
+        'method': method,
+    }
+
+
+async def probe_asset_size(url: str, headers: Optional[Dict[str, str]] = None,
+                           timeout: float = ASSET_PROBE_TIMEOUT) -> Dict[str, object]:
+    """Probe ``url`` once and serve repeat probes from the shared cache."""
+    return await asset_probe_cache.get_or_fetch(url, lambda: _probe_asset_size(url, headers, timeout))
+
+
+async def _probe_image_header(url: str, headers: Optional[Dict[str, str]],
+                              timeout: float) -> Dict[str, object]:
+    """
+    Read the image's format, pixel dimensions and byte size from its first
+    few KB. Uses Range requests over a growing window (large EXIF / ICC
+    segments can push a JPEG's frame header past the first window); a server
+    that ignores Range is read only until the header is parsed. ``size_bytes``
+    is None when the size cannot be established.
+    """
+    data = bytearray()
+    size = 0
+    status_code, content_type = 0, ''
+    method = 'range'
+    window = IMAGE_HEADER_BYTES
+    while True:
+        range_headers = {**(headers or {}), 'Range': f'bytes={len(data)}-{window - 1}'}
+        async with http_client.stream('GET', url, headers=range_headers, timeout=timeout) as resp:
+            if resp.status_code == 416:
+                break  # the file ends before this offset
+            resp.raise_for_status()
+            status_code = resp.status_code
+            content_type = resp.headers.get('content-type', content_type)
+            if resp.status_code != 206:
+                # Range ignored: read the full response only until the header is known
+                method = 'get'
+                data.clear()
+                size = int(resp.headers.get('content-length', 0) or 0)
+                ended = True
+                async for chunk in resp.aiter_bytes():
+                    data.extend(chunk)
+                    if len(data) >= IMAGE_HEADER_MAX_BYTES or parse_image_header(bytes(data)).complete:
+                        ended = False
+                        break
+                if ended and not size:
+                    size = len(data)
+                break
+            size = _content_range_total(resp.headers.get('content-range', '')) or size
+            async for chunk in resp.aiter_bytes():
+                data.extend(chunk)
+        if (parse_image_header(bytes(data)).complete or (size and len(data) >= size)
+                or window >= IMAGE_HEADER_MAX_BYTES):
+            break
+        window = min(window * 4, IMAGE_HEADER_MAX_BYTES)
+    header = parse_image_header(bytes(data))
+    if not size:
+        # No Content-Range / Content-Length; fall back to the size probe (None if it finds none either)
+        size = (await probe_asset_size(url, headers=headers, timeout=timeout))['size_bytes']
+    return {
+        'url': url,
+        'size_bytes': size,
+        'status_code': status_code,
+        'content_type': content_type,
+        'format': header.format,
+        'width': header.width,
+        'height': header.height,
+        'bytes_read': len(data),
+        'method': method,
+    }
+
+
+async def probe_image_header(url: str, headers: Optional[Dict[str, str]] = None,
+                             timeout: float = ASSET_PROBE_TIMEOUT) -> Dict[str, object]:
+    """Probe ``url``'s image header once and serve repeat probes from the shared cache."""
+    return await asset_probe_cache.get_or_fetch(('header', url),
+                                                lambda: _probe_image_header(url, headers, timeout))
+
+
+async def _iter_probes(probe: Callable[..., Awaitable[Dict[str, object]]], urls: Iterable[str],
+                       headers: Optional[Dict[str, str]], concurrency: int) -> AsyncIterator[Dict[str, object]]:
+    limit = asyncio.Semaphore(concurrency)
+
+    async def run(url: str) -> Dict[str, object]:
+        async with limit:
+            try:
+                return await probe(url, headers=headers)
+            except Exception as e:
+                return {'url': url, 'error': str(e)}
+
+    tasks = [asyncio.ensure_future(run(url)) for url in _interleave_by_host(dict.fromkeys(urls))]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def iter_asset_sizes(urls: Iterable[str], headers: Optional[Dict[str, str]] = None,
+                           concurrency: int = ASSET_PROBE_CONCURRENCY) -> AsyncIterator[Dict[str, object]]:
+    """
+    Probe all ``urls`` concurrently and yield each result as soon as it arrives.
+    Failed probes are yielded with an ``error`` key instead of raising.
+    """
+    async for result in _iter_probes(probe_asset_size, urls, headers, concurrency):
+        yield result
+
+
+async def probe_asset_sizes(urls: Iterable[str], headers: Optional[Dict[str, str]] = None,
+                            concurrency: int = ASSET_PROBE_CONCURRENCY) -> Dict[str, Dict[str, object]]:
+    """Probe all ``urls`` concurrently and return the results keyed by URL."""
+    return {result['url']: result async for result in iter_asset_sizes(urls, headers, concurrency)}
+
+
+async def probe_image_headers(urls: Iterable[str], headers: Optional[Dict[str, str]] = None,
+                              concurrency: int = ASSET_PROBE_CONCURRENCY) -> Dict[str, Dict[str, object]]:
+    """Probe the headers of all image ``urls`` concurrently and return the results keyed by URL."""
+    return {result['url']: result async for result in _iter_probes(probe_image_header, urls, headers, concurrency)}
@@ -0,0 +1,106 @@
+"""One-shot full-site audit scheduling for the DBIM Toolkit."""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Shared resources a check may depend on:
+#   html       - raw page download and parse tree (fetcher.get_page)
+#   render     - single-navigation browser snapshot (render_snapshot.get_render_snapshot)
+#   assets     - the probed image inventory of the page (image_inventory.get_image_inventory)
+#   browser    - a dedicated browser page the check drives itself
+#   network    - a direct request that must not be served from cache
+#   screenshot - an uploaded screenshot for this guideline
+
+
+class AuditCheck:
+    """
+    A guideline check and the shared resources it needs. A screenshot check
+    may also have a ``url_run`` that captures what it needs from the page
+    itself, using ``url_resources``; it runs when no upload was provided.
+    """
+
+    def __init__(self, guideline_id: int, run: Callable[..., Awaitable[Any]],
+                 resources: Tuple[str, ...] = (),
+                 url_run: Optional[Callable[[str], Awaitable[Any]]] = None,
+                 url_resources: Tuple[str, ...] = ('render',)):
+        self.guideline_id = guideline_id
+        self.run = run
+        self.resources = resources
+        self.url_run = url_run
+        self.url_resources = url_resources
+
+    @property
+    def needs_upload(self) -> bool:
+        return 'screenshot' in self.resources
+
+    @property
+    def needs_url(self) -> bool:
+        return bool(self.resources) and not self.needs_upload
+
+
+async def run_audit(url: str, checks: Iterable[AuditCheck],
+                    loaders: Dict[str, Callable[[str], Awaitable[Any]]],
+                    uploads: Optional[Dict[int, Any]] = None) -> Dict[str, Any]:
+    """
+    Run every applicable check against ``url`` concurrently.
+
+    Each shared resource in ``loaders`` that some check needs is started
+    once, up front; the checks then pick it up from the shared caches, so
+    the audit takes about as long as its slowest resource.
+    Checks that need an upload fall back to their URL mode when none was
+    provided, and are skipped when they have none.
+    """
+    uploads = uploads or {}
+    # (check, callable, argument, resources)
+    applicable: List[Tuple[AuditCheck, Callable[..., Awaitable[Any]], Tuple[Any, ...], Tuple[str, ...]]] = []
+    skipped: List[int] = []
+    for check in checks:
+        if check.needs_upload and check.guideline_id in uploads:
+            applicable.append((check, check.run, (uploads[check.guideline_id],), ()))
+        elif check.needs_upload and check.url_run is not None:
+            applicable.append((check, check.url_run, (url,), check.url_resources))
+        elif check.needs_upload:
+            skipped.append(check.guideline_id)
+        elif check.needs_url:
+            applicable.append((check, check.run, (url,), check.resources))
+        else:
+            applicable.append((check, check.run, (), ()))
+
+    needed = sorted({r for _, _, _, resources in applicable for r in resources if r in loaders})
+    resource_timings: Dict[str, float] = {}
+    check_timings: Dict[int, float] = {}
+
+    async def load(resource: str) -> None:
+        started = time.monotonic()
+        try:
+            await loaders[resource](url)
+        except Exception as e:
+            # The checks depending on it report the failure themselves
+            logger.error(f"Audit resource {resource} failed for {url}: {e}")
+        resource_timings[resource] = round((time.monotonic() - started) * 1000, 2)
+
+    async def run_check(check: AuditCheck, run: Callable[..., Awaitable[Any]],
+                        args: Tuple[Any, ...]) -> Tuple[int, Any]:
+        started = time.monotonic()
+        try:
+            result = await run(*args)
+        except Exception as e:
+            result = {'success': False, 'message': str(e)}
+        check_timings[check.guideline_id] = round((time.monotonic() - started) * 1000, 2)
+        return check.guideline_id, result
+
+    started = time.monotonic()
+    loading = [asyncio.ensure_future(load(resource)) for resource in needed]
+    results = dict(await asyncio.gather(*(run_check(check, run, args) for check, run, args, _ in applicable)))
+    await asyncio.gather(*loading)
+
+    return {
+        'results': results,
+        'skipped': skipped,
+        'resource_timings_ms': resource_timings,
+        'check_timings_ms': check_timings,
+        'duration_ms': round((time.monotonic() - started) * 1000, 2),
+    }
@@ -0,0 +1,91 @@
+"""
+Benchmark HTML parsing for the asset checks.
+
+Compares a full html.parser tree (the previous behaviour), a full lxml tree
+and the targeted asset tree (ASSET_TAGS plus inline styles) on each backend,
+and reports throughput in MB/s. Pass a directory of saved pages (*.html)
+to measure a real corpus; otherwise a synthetic government-style page is used.
+
+    python benchmarks/html_parsers.py [corpus_dir]
+"""
+import sys
+import time
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from fetcher import ASSET_ATTRS, ASSET_TAGS, LXML_AVAILABLE, TagStrainer  # noqa: E402
+
+
+def synthetic_page(sections=400):
+    """A page with the usual mix of navigation, text, cards, images and scripts."""
+    parts = ['<!DOCTYPE html><html><head><title>Ministry</title>',
+             '<link rel="stylesheet" href="/css/site.css"><script src="/js/app.js"></script></head><body>',
+             '<header><nav><ul>' + ''.join(f'<li><a href="/s{i}">Section {i}</a></li>' for i in range(30))
+             + '</ul></nav></header><main>']
+    for i in range(sections):
+        parts.append(
+            f'<section class="card" id="c{i}"><h2>Scheme {i}</h2>'
+            f'<p>Citizens can apply for <strong>scheme {i}</strong> online. '
+            f'<a href="/apply/{i}">Apply now</a> or <span class="hint">read the guidelines</span>.</p>'
+            f'<div class="banner" style="background-image: url(/img/banner{i}.jpg)"></div>'
+            f'<img src="/img/photo{i}.png" alt="Photo {i}">'
+            f'<table><tr><td>Eligibility</td><td>All</td></tr><tr><td>Fee</td><td>None</td></tr></table>'
+            f'<button class="btn btn-primary">Apply</button></section>')
+    parts.append('</main><footer><p>Content owned by the Ministry</p></footer>'
+                 '<script src="/js/analytics.js"></script></body></html>')
+    return ''.join(parts)
+
+
+def load_corpus(directory):
+    if directory is None:
+        return [('synthetic', synthetic_page())]
+    pages = sorted(Path(directory).glob('*.htm*'))
+    return [(path.name, path.read_text(encoding='utf-8', errors='replace')) for path in pages]
+
+
+def asset_urls(soup):
+    """What the asset checks extract, used to confirm every variant agrees."""
+    urls = {tag.get('src') or tag.get('href') for tag in soup.find_all(ASSET_TAGS)}
+    urls.update(tag['style'] for tag in soup.find_all(style=True))
+    urls.discard(None)
+    return urls
+
+
+def timed(parse, texts, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        soups = [parse(text) for text in texts]
+        best = min(best, time.perf_counter() - started)
+    return best, soups
+
+
+def main(directory=None):
+    corpus = load_corpus(directory)
+    texts = [text for _, text in corpus]
+    megabytes = sum(len(text.encode('utf-8')) for text in texts) / 1_000_000
+    print(f"{len(texts)} page(s), {megabytes:.2f} MB")
+
+    variants = [('html.parser full', lambda text: BeautifulSoup(text, 'html.parser'))]
+    if TagStrainer is not None:
+        variants.append(('html.parser assets', lambda text: BeautifulSoup(
+            text, 'html.parser', parse_only=TagStrainer(ASSET_TAGS, ASSET_ATTRS))))
+    if LXML_AVAILABLE:
+        variants.append(('lxml full', lambda text: BeautifulSoup(text, 'lxml')))
+        if TagStrainer is not None:
+            variants.append(('lxml assets', lambda text: BeautifulSoup(
+                text, 'lxml', parse_only=TagStrainer(ASSET_TAGS, ASSET_ATTRS))))
+
+    baseline_s, baseline = timed(variants[0][1], texts)
+    expected = [asset_urls(soup) for soup in baseline]
+    print(f"{'variant':<20} {'ms':>9} {'MB/s':>8} {'speedup':>8}")
+    for name, parse in variants:
+        seconds, soups = timed(parse, texts)
+        assert [asset_urls(soup) for soup in soups] == expected, name
+        print(f"{name:<20} {seconds * 1000:>9.1f} {megabytes / seconds:>8.2f} {baseline_s / seconds:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1] if len(sys.argv) > 1 else None)
@@ -0,0 +1,59 @@
+"""
+Benchmark the logo-lockup / state-emblem pixel classification.
+
+Compares the original per-pixel Python loops against the vectorized
+kernels in image_kernels and reports the cost per megapixel.
+
+    python benchmarks/pixel_masks.py [megapixels ...]
+"""
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from image_kernels import dark_pixel_mask, light_pixel_mask, mask_fraction  # noqa: E402
+
+
+def loop_fractions(pixels):
+    """The list comprehensions previously used by the two endpoints."""
+    black = [px for px in pixels if all(c <= 40 for c in px)]
+    dark = [px for px in pixels if all(c <= 60 for c in px)]
+    light = [px for px in pixels if all(c >= 200 for c in px)]
+    n = len(pixels)
+    return len(black) / n, len(dark) / n, len(light) / n
+
+
+def kernel_fractions(pixels):
+    return (mask_fraction(dark_pixel_mask(pixels, 40)),
+            mask_fraction(dark_pixel_mask(pixels, 60)),
+            mask_fraction(light_pixel_mask(pixels, 200)))
+
+
+def timed(fn, pixels, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(pixels)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main(sizes):
+    rng = np.random.default_rng(0)
+    print(f"{'MP':>6} {'loop ms/MP':>12} {'kernel ms/MP':>13} {'speedup':>9}")
+    for megapixels in sizes:
+        n = int(megapixels * 1_000_000)
+        # Mostly near-black and near-white pixels, like a cropped logo
+        pixels = np.where(rng.random((n, 1)) < 0.5, 20, 230).astype(np.uint8)
+        pixels = np.clip(pixels + rng.integers(-30, 30, (n, 3)), 0, 255).astype(np.uint8)
+        loop_s, loop_result = timed(loop_fractions, pixels, repeat=1)
+        kernel_s, kernel_result = timed(kernel_fractions, pixels)
+        assert np.allclose(loop_result, kernel_result)
+        print(f"{megapixels:>6} {loop_s * 1000 / megapixels:>12.1f} "
+              f"{kernel_s * 1000 / megapixels:>13.3f} {loop_s / kernel_s:>8.0f}x")
+
+
+if __name__ == '__main__':
+    main([float(a) for a in sys.argv[1:]] or [0.25, 1, 2])
@@ -0,0 +1,237 @@
+"""Shared headless Chromium pool for the browser-based verify endpoints."""
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from playwright.async_api import async_playwright
+
+try:
+    import psutil
+except ImportError:  # memory-based recycling is skipped without psutil
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+# Pool settings, overridable through the environment
+BROWSER_MAX_PAGES = int(os.getenv('DBIM_BROWSER_MAX_PAGES', '4'))
+BROWSER_WARM_CONTEXTS = int(os.getenv('DBIM_BROWSER_WARM_CONTEXTS', '2'))
+BROWSER_RECYCLE_AFTER = int(os.getenv('DBIM_BROWSER_RECYCLE_AFTER', '200'))
+BROWSER_RECYCLE_RSS_MB = int(os.getenv('DBIM_BROWSER_RECYCLE_RSS_MB', '1536'))
+
+
+class _BrowserSlot:
+    """One launched Chromium instance with its pre-warmed contexts and usage counters."""
+
+    def __init__(self, browser):
+        self.browser = browser
+        self.warm: List[Any] = []
+        self.uses = 0
+        self.active = 0
+        self.retired = False
+        self.warming = False
+
+
+class BrowserPool:
+    """
+    Keeps one Chromium running for the lifetime of the app and hands out
+    isolated browser contexts, at most ``max_pages`` at a time. The browser
+    is replaced after ``recycle_after`` pages, once Chromium's resident
+    memory passes ``recycle_rss_mb``, or when it crashes or disconnects.
+    """
+
+    def __init__(self, max_pages: int = BROWSER_MAX_PAGES, warm_contexts: int = BROWSER_WARM_CONTEXTS,
+                 recycle_after: int = BROWSER_RECYCLE_AFTER, recycle_rss_mb: int = BROWSER_RECYCLE_RSS_MB):
+        self.max_pages = max_pages
+        self.warm_contexts = warm_contexts
+        self.recycle_after = recycle_after
+        self.recycle_rss_mb = recycle_rss_mb
+        self._reset()
+
+    def _reset(self) -> None:
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._playwright = None
+        self._current: Optional[_BrowserSlot] = None
+        self._pages: Optional[asyncio.Semaphore] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self.in_use = 0
+        self.waiting = 0
+        self.peak_in_use = 0
+        self.pages_served = 0
+        self.saturated_acquires = 0
+        self.total_wait_ms = 0.0
+        self.launches = 0
+        self.recycles = 0
+        self.disconnects = 0
+
+    def _bind_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Playwright objects are bound to the loop that created them
+            self._reset()
+            self._loop = loop
+            self._pages = asyncio.Semaphore(self.max_pages)
+            self._lock = asyncio.Lock()
+
+    async def start(self) -> None:
+        """Launch Chromium and pre-warm contexts ahead of the first request."""
+        self._bind_loop()
+        async with self._lock:
+            await self._ensure_browser()
+
+    async def _ensure_browser(self) -> _BrowserSlot:
+        if self._playwright is None:
+            self._playwright = await async_playwright().start()
+        if self._current is not None and not self._current.browser.is_connected():
+            self._on_disconnected(self._current)
+        if self._current is None or self._current.retired:
+            browser = await self._playwright.chromium.launch()
+            self._current = slot = _BrowserSlot(browser)
+            browser.on('disconnected', lambda _: self._on_disconnected(slot))
+            self.launches += 1
+            logger.info(f"Launched pooled Chromium (launch #{self.launches})")
+            await self._warm(self._current)
+        return self._current
+
+    def _on_disconnected(self, slot: _BrowserSlot) -> None:
+        """Retire a Chromium that crashed or lost its connection; the next page relaunches."""
+        if slot.retired:
+            return  # closed by the pool
+        slot.retired = True
+        slot.warm.clear()
+        self.disconnects += 1
+        logger.warning(f"Pooled Chromium disconnected after {slot.uses} pages; relaunching on next use")
+
+    async def _warm(self, slot: _BrowserSlot) -> None:
+        if slot.warming:
+            return
+        slot.warming = True
+        try:
+            while not slot.retired and len(slot.warm) < self.warm_contexts:
+                context = await slot.browser.new_context()
+                if slot.retired:
+                    # Retired while the context was being created; it would never be used
+                    await context.close()
+                    break
+                slot.warm.append(context)
+        finally:
+            slot.warming = False
+
+    async def _take_context(self, slot: _BrowserSlot, context_options: Dict[str, Any]):
+        if context_options or not slot.warm:
+            return await slot.browser.new_context(**context_options)
+        return slot.warm.pop()
+
+    def _chromium_rss_mb(self) -> float:
+        if psutil is None:
+            return 0.0
+        rss = 0
+        for child in psutil.Process().children(recursive=True):
+            try:
+                if 'chrom' in child.name().lower():
+                    rss += child.memory_info().rss
+            except psutil.Error:
+                continue
+        return rss / 1024 / 1024
+
+    async def _close_slot(self, slot: _BrowserSlot) -> None:
+        try:
+            for context in slot.warm:
+                await context.close()
+            slot.warm.clear()
+            await slot.browser.close()
+        except Exception as e:
+            logger.error(f"Error closing pooled browser: {e}")
+
+    async def _release(self, slot: _BrowserSlot, context) -> None:
+        try:
+            await context.close()
+        except Exception as e:
+            logger.error(f"Error closing browser context: {e}")
+        # psutil walks /proc synchronously; keep it off the event loop and out of the lock
+        rss_mb = 0.0 if slot.retired else await asyncio.to_thread(self._chromium_rss_mb)
+        async with self._lock:
+            slot.active -= 1
+            if not slot.retired and (slot.uses >= self.recycle_after or rss_mb > self.recycle_rss_mb):
+                slot.retired = True
+                self.recycles += 1
+                logger.info(f"Recycling pooled Chromium after {slot.uses} pages")
+            # A retired slot takes no new pages, so only this release can see it drain
+            close = slot.retired and slot.active == 0
+        if close:
+            await self._close_slot(slot)
+        elif not slot.retired:
+            try:
+                await self._warm(slot)
+            except Exception as e:
+                logger.error(f"Error warming browser contexts: {e}")
+
+    @asynccontextmanager
+    async def page(self, **context_options) -> AsyncIterator[Any]:
+        """
+        Yield a fresh page in its own isolated context. ``context_options`` are
+        passed to ``browser.new_context`` and bypass the warm contexts.
+        """
+        self._bind_loop()
+        if self._pages.locked():
+            self.saturated_acquires += 1
+        self.waiting += 1
+        started = time.monotonic()
+        try:
+            await self._pages.acquire()
+        finally:
+            self.waiting -= 1
+        self.total_wait_ms += (time.monotonic() - started) * 1000
+        try:
+            async with self._lock:
+                slot = await self._ensure_browser()
+                # Count the page only once it has a context, so a failed new_context
+                # cannot leave a retired slot waiting forever for active == 0
+                context = await self._take_context(slot, context_options)
+                slot.uses += 1
+                slot.active += 1
+            self.in_use += 1
+            self.pages_served += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+            try:
+                yield await context.new_page()
+            finally:
+                self.in_use -= 1
+                await self._release(slot, context)
+        finally:
+            self._pages.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool usage and saturation counters."""
+        return {
+            'max_pages': self.max_pages,
+            'in_use': self.in_use,
+            'waiting': self.waiting,
+            'peak_in_use': self.peak_in_use,
+            'saturation': round(self.in_use / self.max_pages, 2) if self.max_pages else 0,
+            'pages_served': self.pages_served,
+            'saturated_acquires': self.saturated_acquires,
+            'avg_wait_ms': round(self.total_wait_ms / self.pages_served, 2) if self.pages_served else 0,
+            'warm_contexts': len(self._current.warm) if self._current else 0,
+            'current_browser_uses': self._current.uses if self._current else 0,
+            'chromium_rss_mb': round(self._chromium_rss_mb(), 1),
+            'launches': self.launches,
+            'recycles': self.recycles,
+            'disconnects': self.disconnects,
+        }
+
+    async def close(self) -> None:
+        if self._lock is None:
+            return
+        async with self._lock:
+            if self._current is not None:
+                self._current.retired = True
+                await self._close_slot(self._current)
+            if self._playwright is not None:
+                await self._playwright.stop()
+        self._reset()
+
+
+browser_pool = BrowserPool()
@@ -0,0 +1,435 @@
+"""
+Pre-parsed stylesheet index for the DBIM Toolkit colour checks.
+
+A page's stylesheets are parsed once into rules keyed by the simple
+selectors (tag, .class, #id) of each selector's subject, with specificity
+and source order, custom properties resolved and the ``background``
+shorthand expanded. Finding the background colour of an element is then a
+handful of dictionary lookups instead of a regex scan per selector.
+"""
+import functools
+import logging
+import re
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+import soupsieve
+from bs4 import BeautifulSoup, Tag
+
+logger = logging.getLogger(__name__)
+
+_COMMENT_RE = re.compile(r'/\*.*?\*/', re.DOTALL)
+_VAR_RE = re.compile(r'var\(\s*(--[\w-]+)\s*(?:,\s*([^()]*(?:\([^()]*\)[^()]*)*))?\)')
+_ID_RE = re.compile(r'#(-?[_a-zA-Z][\w-]*)')
+_CLASS_RE = re.compile(r'\.(-?[_a-zA-Z][\w-]*)')
+_ATTR_RE = re.compile(r'\[[^\]]*\]')
+_PSEUDO_ELEMENT_RE = re.compile(r'::[\w-]+(?:\([^)]*\))?|:(?:before|after|first-line|first-letter)\b')
+_PSEUDO_CLASS_RE = re.compile(r':(?!not\()[\w-]+(?:\([^)]*\))?')
+_TYPE_RE = re.compile(r'(?:^|[\s>+~(])([a-zA-Z][\w-]*)')
+_COMBINATOR_RE = re.compile(r'\s*[>+~]\s*|\s+')
+
+# Interaction states do not describe an element's resting colour
+STATE_PSEUDO_CLASSES = (':hover', ':focus', ':active', ':visited', ':focus-within', ':focus-visible')
+
+# Selectors whose custom properties apply to the whole document
+GLOBAL_SCOPES = {':root', 'html', 'body', '*'}
+
+_URL_RE = re.compile(r'url\(\s*([\'"]?)(.*?)\1\s*\)', re.IGNORECASE)
+
+_COLOR_FUNCTION_RE = re.compile(r'^(?:rgba?|hsla?|hwb|lab|lch|oklab|oklch|color)\(', re.IGNORECASE)
+_HEX_COLOR_RE = re.compile(r'^#(?:[0-9a-fA-F]{3,4}|[0-9a-fA-F]{6}|[0-9a-fA-F]{8})$')
+_NON_COLOR_KEYWORDS = {
+    'none', 'inherit', 'initial', 'unset', 'revert', 'auto', 'repeat', 'repeat-x', 'repeat-y', 'no-repeat',
+    'space', 'round', 'scroll', 'fixed', 'local', 'top', 'bottom', 'left', 'right', 'center', 'cover',
+    'contain', 'border-box', 'padding-box', 'content-box', 'text',
+}
+
+
+class CSSRule(NamedTuple):
+    selector: str
+    specificity: Tuple[int, int, int]
+    order: int
+    declarations: Dict[str, str]
+    important: frozenset
+
+
+def strip_comments(css: str) -> str:
+    return _COMMENT_RE.sub('', css)
+
+
+def parse_declarations(block: str) -> Tuple[Dict[str, str], frozenset]:
+    """Parse ``prop: value; ...`` into a dict (last one wins) and the set of !important props."""
+    declarations: Dict[str, str] = {}
+    important = set()
+    depth = 0
+    start = 0
+    parts = []
+    for i, ch in enumerate(block):
+        if ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth = max(0, depth - 1)
+        elif ch == ';' and depth == 0:
+            parts.append(block[start:i])
+            start = i + 1
+    parts.append(block[start:])
+    for part in parts:
+        name, sep, value = part.partition(':')
+        if not sep:
+            continue
+        name = name.strip()
+        prop = name if name.startswith('--') else name.lower()
+        value = value.strip()
+        if value.lower().endswith('!important'):
+            value = value[:-len('!important')].rstrip()
+            important.add(prop)
+        if prop and value:
+            declarations[prop] = value
+    return declarations, frozenset(important)
+
+
+def iter_rule_blocks(css: str) -> Iterable[Tuple[str, str]]:
+    """
+    Yield ``(prelude, body)`` for every style rule, descending into
+    conditional group rules (@media, @supports, @layer) and skipping other
+    at-rules (@font-face, @keyframes, ...).
+    """
+    css = strip_comments(css)
+    i, n = 0, len(css)
+    while i < n:
+        brace = css.find('{', i)
+        semi = css.find(';', i)
+        if brace == -1:
+            return
+        if semi != -1 and semi < brace and css[i:semi].lstrip().startswith('@'):
+            i = semi + 1  # @import / @charset statement
+            continue
+        # Find the matching close brace
+        depth, j = 1, brace + 1
+        while j < n and depth:
+            if css[j] == '{':
+                depth += 1
+            elif css[j] == '}':
+                depth -= 1
+            j += 1
+        prelude = css[i:brace].strip()
+        body = css[brace + 1:j - 1]
+        if prelude.startswith('@'):
+            if prelude.lower().startswith(('@media', '@supports', '@layer', '@container', '@document')):
+                yield from iter_rule_blocks(body)
+        elif prelude:
+            yield prelude, body
+        i = j
+
+
+def split_selector_list(prelude: str) -> List[str]:
+    """Split a selector list on top-level commas."""
+    selectors, depth, start = [], 0, 0
+    for i, ch in enumerate(prelude):
+        if ch in '([':
+            depth += 1
+        elif ch in ')]':
+            depth = max(0, depth - 1)
+        elif ch == ',' and depth == 0:
+            selectors.append(prelude[start:i].strip())
+            start = i + 1
+    selectors.append(prelude[start:].strip())
+    return [s for s in selectors if s]
+
+
+def selector_specificity(selector: str) -> Tuple[int, int, int]:
+    """(ids, classes/attributes/pseudo-classes, types) of a selector."""
+    rest = _ATTR_RE.sub(' ', selector)
+    attributes = len(_ATTR_RE.findall(selector))
+    pseudo_elements = len(_PSEUDO_ELEMENT_RE.findall(rest))
+    rest = _PSEUDO_ELEMENT_RE.sub(' ', rest)
+    pseudo_classes = len(_PSEUDO_CLASS_RE.findall(rest))
+    rest = _PSEUDO_CLASS_RE.sub(' ', rest).replace(':not(', ' (')
+    ids = len(_ID_RE.findall(rest))
+    classes = len(_CLASS_RE.findall(rest))
+    rest = _ID_RE.sub(' ', _CLASS_RE.sub(' ', rest))
+    types = len([t for t in _TYPE_RE.findall(rest) if t != '*'])
+    return ids, classes + attributes + pseudo_classes, types + pseudo_elements
+
+
+def subject_keys(selector: str) -> List[str]:
+    """Simple-selector keys (#id, .class, tag or *) of the selector's last compound."""
+    compound = _COMBINATOR_RE.split(selector.strip())[-1]
+    compound = _PSEUDO_CLASS_RE.sub('', _PSEUDO_ELEMENT_RE.sub('', _ATTR_RE.sub('', compound)))
+    ids = ['#' + i for i in _ID_RE.findall(compound)]
+    if ids:
+        return ids
+    classes = ['.' + c for c in _CLASS_RE.findall(compound)]
+    if classes:
+        return classes
+    tag = re.match(r'[a-zA-Z][\w-]*', compound)
+    return [tag.group(0).lower()] if tag else ['*']
+
+
+def split_top_level(value: str, separator: str = ' ') -> List[str]:
+    """Split a CSS value on ``separator`` outside parentheses."""
+    parts, depth, start = [], 0, 0
+    for i, ch in enumerate(value):
+        if ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth = max(0, depth - 1)
+        elif depth == 0 and (ch == separator or (separator == ' ' and ch.isspace())):
+            parts.append(value[start:i])
+            start = i + 1
+    parts.append(value[start:])
+    return [p.strip() for p in parts if p.strip()]
+
+
+def is_color_token(token: str) -> bool:
+    if _HEX_COLOR_RE.match(token) or _COLOR_FUNCTION_RE.match(token):
+        return True
+    lowered = token.lower()
+    return token.isalpha() and lowered not in _NON_COLOR_KEYWORDS
+
+
+def background_color_of(declarations: Dict[str, str]) -> Optional[str]:
+    """The colour set by ``background-color`` or by the final layer of the ``background`` shorthand."""
+    if 'background-color' in declarations:
+        return declarations['background-color']
+    shorthand = declarations.get('background')
+    if not shorthand:
+        return None
+    final_layer = split_top_level(shorthand, ',')[-1]
+    for token in split_top_level(final_layer):
+        if token.lower().startswith(('url(', 'linear-gradient(', 'radial-gradient(', 'conic-gradient(',
+                                     'repeating-', 'image(', 'image-set(')):
+            continue
+        if is_color_token(token):
+            return token
+    return None
+
+
+def background_image_urls(declarations: Dict[str, str]) -> List[str]:
+    """Image URLs referenced by ``background`` / ``background-image``, in declaration order."""
+    urls = []
+    for prop in ('background', 'background-image'):
+        for _, url in _URL_RE.findall(declarations.get(prop, '')):
+            url = url.strip()
+            if url and url not in urls:
+                urls.append(url)
+    return urls
+
+
+class ParsedStylesheet:
+    """
+    One stylesheet parsed into ``(selector, specificity, declarations,
+    important)`` entries, in source order. Parsing is independent of the
+    page, so a shared stylesheet is parsed once and indexed for every page.
+    """
+
+    def __init__(self, css: str, href: Optional[str] = None):
+        self.href = href
+        self.size = len(css)
+        self.rules: List[Tuple[str, Tuple[int, int, int], Dict[str, str], frozenset]] = []
+        for prelude, body in iter_rule_blocks(css):
+            declarations, important = parse_declarations(body)
+            if not declarations:
+                continue
+            for selector in split_selector_list(prelude):
+                self.rules.append((selector, selector_specificity(selector), declarations, important))
+
+
+@functools.lru_cache(maxsize=1024)
+def _warn_unmatchable(selector: str, error: str) -> None:
+    """Log each selector soupsieve cannot evaluate once, not once per element."""
+    logger.warning(f"Ignoring CSS rule with a selector that cannot be evaluated: {selector!r} ({error})")
+
+
+class StylesheetIndex:
+    """Rules of a set of stylesheets, keyed by the simple selectors of their subject."""
+
+    def __init__(self, stylesheets: Iterable[Union[str, ParsedStylesheet]]):
+        self.rules_by_key: Dict[str, List[CSSRule]] = {}
+        self.custom_properties: Dict[str, str] = {}
+        self.rule_count = 0
+        self.stylesheets: List[Optional[str]] = []
+        # (url, href of the sheet it is relative to, selector) for every background image
+        self.background_images: List[Tuple[str, Optional[str], str]] = []
+        order = 0
+        for sheet in stylesheets:
+            if isinstance(sheet, str):
+                sheet = ParsedStylesheet(sheet)
+            self.stylesheets.append(sheet.href)
+            for selector, specificity, declarations, important in sheet.rules:
+                order += 1
+                if selector in GLOBAL_SCOPES:
+                    self.custom_properties.update(
+                        {k: v for k, v in declarations.items() if k.startswith('--')})
+                rule = CSSRule(selector, specificity, order, declarations, important)
+                for key in subject_keys(selector):
+                    self.rules_by_key.setdefault(key, []).append(rule)
+                self.rule_count += 1
+                for url in background_image_urls(declarations):
+                    self.background_images.append((url, sheet.href, selector))
+
+    @classmethod
+    def from_soup(cls, soup: BeautifulSoup,
+                  linked: Optional[Dict[str, ParsedStylesheet]] = None) -> 'StylesheetIndex':
+        """
+        Index the page's ``<style>`` blocks and, in document order with them,
+        the ``<link rel=stylesheet>`` sheets found in ``linked`` (keyed by the
+        link's ``href`` attribute).
+        """
+        sheets: List[Union[str, ParsedStylesheet]] = []
+        for tag in soup.find_all(['style', 'link']):
+            if tag.name == 'style':
+                sheets.append(tag.get_text())
+            elif linked and tag.get('href') in linked:
+                sheets.append(linked[tag['href']])
+        return cls(sheets)
+
+    def resolve(self, value: str, local: Optional[Dict[str, str]] = None, depth: int = 0) -> Optional[str]:
+        """Substitute ``var(--x, fallback)`` references; None if a variable cannot be resolved."""
+        if 'var(' not in value:
+            return value
+        if depth > 8:
+            return None
+        unresolved = False
+
+        def substitute(match: 're.Match') -> str:
+            nonlocal unresolved
+            name, fallback = match.group(1), match.group(2)
+            replacement = (local or {}).get(name, self.custom_properties.get(name))
+            if replacement is None:
+                replacement = fallback
+            if replacement is None:
+                unresolved = True
+                return ''
+            return replacement.strip()
+
+        substituted = _VAR_RE.sub(substitute, value)
+        if unresolved:
+            return None
+        return self.resolve(substituted, local, depth + 1)
+
+    def rules_for_key(self, key: str) -> List[CSSRule]:
+        return self.rules_by_key.get(key, [])
+
+    def _candidates(self, element: Tag) -> List[CSSRule]:
+        keys = ['*', element.name]
+        if element.get('id'):
+            keys.append('#' + element['id'])
+        keys.extend('.' + cls for cls in element.get('class', []))
+        seen = set()
+        candidates = []
+        for key in keys:
+            for rule in self.rules_by_key.get(key, []):
+                if rule.order not in seen:
+                    seen.add(rule.order)
+                    candidates.append(rule)
+        return candidates
+
+    @staticmethod
+    def _matches(rule: CSSRule, element: Tag) -> bool:
+        if any(state in rule.selector for state in STATE_PSEUDO_CLASSES) or '::' in rule.selector:
+            return False
+        try:
+            return soupsieve.match(rule.selector, element)
+        except Exception as e:
+            # Selector soupsieve cannot evaluate; a rule we cannot confirm must not win the cascade
+            _warn_unmatchable(rule.selector, str(e).partition('\n')[0])
+            return False
+
+    def matching_rules(self, element: Tag) -> List[CSSRule]:
+        """Rules whose selector matches ``element``, in cascade order (winning rule last)."""
+        rules = [rule for rule in self._candidates(element) if self._matches(rule, element)]
+        return sorted(rules, key=lambda r: (r.specificity, r.order))
+
+    def _background_from(self, rules: List[CSSRule]) -> Optional[Tuple[str, CSSRule]]:
+        # Custom properties set by the same rules, later rules overriding earlier ones
+        local = {k: v for r in rules for k, v in r.declarations.items() if k.startswith('--')}
+        winner = None
+        for rule in rules:
+            background = {}
+            for prop in ('background-color', 'background'):
+                if prop in rule.declarations:
+                    value = self.resolve(rule.declarations[prop], local)
+                    if value:
+                        background[prop] = value
+            color = background_color_of(background)
+            if color is None:
+                continue
+            important = 'background-color' in rule.important or 'background' in rule.important
+            rank = (important, rule.specificity, rule.order)
+            if winner is None or rank > winner[0]:
+                winner = (rank, color, rule)
+        return (winner[1], winner[2]) if winner else None
+
+    def background_color(self, element: Tag) -> Optional[Tuple[str, CSSRule]]:
+        """The cascaded background colour of ``element`` and the rule that sets it."""
+        return self._background_from(self.matching_rules(element))
+
+    def background_color_for_key(self, key: str) -> Optional[Tuple[str, CSSRule]]:
+        """The background colour set by rules indexed under a simple selector such as ``.btn``."""
+        rules = [r for r in self.rules_for_key(key)
+                 if not any(state in r.selector for state in STATE_PSEUDO_CLASSES) and '::' not in r.selector]
+        return self._background_from(sorted(rules, key=lambda r: (r.specificity, r.order)))
+
+    def property_value(self, element: Tag, prop: str, inherit: bool = False) -> Optional[Tuple[str, str]]:
+        """
+        Cascaded value of ``prop`` for ``element`` from its inline style and
+        the matching rules, as ``(value, source)``; with ``inherit`` the
+        nearest ancestor that sets it is used when the element does not.
+        """
+        node = element
+        while node is not None and getattr(node, 'name', None) and node.name != '[document]':
+            declarations, _ = parse_declarations(node.get('style', ''))
+            if prop in declarations:
+                value = self.resolve(declarations[prop], declarations)
+                if value and value.lower() != 'inherit':
+                    return value, 'inline_style' if node is element else f'inherited from {node.name}'
+            matched = self.matching_rules(node)
+            rules = [r for r in matched if prop in r.declarations]
+            if rules:
+                rule = max(rules, key=lambda r: (prop in r.important, r.specificity, r.order))
+                local = {k: v for r in matched for k, v in r.declarations.items() if k.startswith('--')}
+                value = self.resolve(rule.declarations[prop], local)
+                if value and value.lower() != 'inherit':
+                    return value, rule.selector if node is element else f'inherited from {rule.selector}'
+            if not inherit:
+                return None
+            node = node.parent
+        return None
+
+    def inline_background_color(self, style: str) -> Optional[str]:
+        """Background colour declared in a ``style`` attribute, with variables resolved."""
+        declarations, _ = parse_declarations(style)
+        local = {k: v for k, v in declarations.items() if k.startswith('--')}
+        background = {}
+        for prop in ('background-color', 'background'):
+            if prop in declarations:
+                value = self.resolve(declarations[prop], local)
+                if value:
+                    background[prop] = value
+        return background_color_of(background)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'rules': self.rule_count,
+            'keys': len(self.rules_by_key),
+            'custom_properties': len(self.custom_properties),
+            'background_images': len(self.background_images),
+        }
+
+
+def get_stylesheet_index(soup: BeautifulSoup) -> StylesheetIndex:
+    """
+    Return the page's stylesheet index, building it from the ``<style>``
+    blocks on first use. An index attached with ``set_stylesheet_index``
+    (e.g. one that includes linked stylesheets) takes precedence.
+    """
+    # Read through __dict__: attribute access on a Tag falls back to a document search
+    index = soup.__dict__.get('_stylesheet_index')
+    if index is None:
+        index = StylesheetIndex.from_soup(soup)
+        set_stylesheet_index(soup, index)
+    return index
+
+
+def set_stylesheet_index(soup: BeautifulSoup, index: StylesheetIndex) -> None:
+    soup.__dict__['_stylesheet_index'] = index
@@ -0,0 +1,332 @@
+"""Shared HTTP client and page fetching for the DBIM Toolkit verify endpoints."""
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, Iterable, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+import httpx
+from bs4 import BeautifulSoup
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+# Connection pool settings, overridable through the environment
+HTTP_MAX_CONNECTIONS = int(os.getenv('DBIM_HTTP_MAX_CONNECTIONS', '100'))
+HTTP_MAX_KEEPALIVE = int(os.getenv('DBIM_HTTP_MAX_KEEPALIVE', '20'))
+HTTP_MAX_PER_HOST = int(os.getenv('DBIM_HTTP_MAX_PER_HOST', '8'))
+HTTP_TIMEOUT = float(os.getenv('DBIM_HTTP_TIMEOUT', '15'))
+
+# Cache bounds, overridable through the environment
+PAGE_CACHE_TTL = float(os.getenv('DBIM_PAGE_CACHE_TTL', '300'))
+PAGE_CACHE_MAX_ENTRIES = int(os.getenv('DBIM_PAGE_CACHE_MAX_ENTRIES', '64'))
+PAGE_CACHE_MAX_BYTES = int(os.getenv('DBIM_PAGE_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+try:
+    import lxml  # noqa: F401
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+try:
+    from bs4.filter import ElementFilter
+except ImportError:  # beautifulsoup4 < 4.13 has no tag-creation hook
+    ElementFilter = None
+
+# HTML parser backend; lxml's C parser is several times faster than html.parser
+HTML_PARSER = os.getenv('DBIM_HTML_PARSER') or ('lxml' if LXML_AVAILABLE else 'html.parser')
+
+# Tags and attributes the asset checks (image sizes, caching, CDN) look at
+ASSET_TAGS = ('img', 'picture', 'source', 'script', 'link')
+ASSET_ATTRS = ('style',)
+
+
+if ElementFilter is not None:
+    class TagStrainer(ElementFilter):
+        """
+        Parse-time filter that only builds top-level elements named in ``names``
+        or carrying one of ``attrs``, with their subtrees. Everything else is
+        skipped by the tree builder, so no Tag objects are allocated for it.
+        """
+
+        def __init__(self, names: Iterable[str], attrs: Iterable[str] = ()):
+            self.names = frozenset(names)
+            self.attrs = tuple(attrs)
+
+        def allow_tag_creation(self, nsprefix, name, attrs) -> bool:
+            return name in self.names or (bool(attrs) and any(a in attrs for a in self.attrs))
+
+        def allow_string_creation(self, string: str) -> bool:
+            return False
+else:
+    TagStrainer = None
+
+
+def parse_html(text: str, names: Optional[Iterable[str]] = None, attrs: Iterable[str] = ()) -> BeautifulSoup:
+    """
+    Parse ``text`` with the configured backend. With ``names`` (and optionally
+    ``attrs``) only the matching elements are built; callers must then only
+    search for those. Falls back to a full parse when targeted parsing is unavailable.
+    """
+    if names is None or TagStrainer is None:
+        return BeautifulSoup(text, HTML_PARSER)
+    return BeautifulSoup(text, HTML_PARSER, parse_only=TagStrainer(names, attrs))
+
+
+def normalize_url(url: str) -> str:
+    """Normalize a URL so that equivalent spellings share one cache entry."""
+    url = url.strip()
+    if not url.startswith(('http://', 'https://')):
+        url = 'https://' + url
+    parts = urlsplit(url)
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or '/', parts.query, ''))
+
+
+class HttpClient:
+    """
+    Process-wide async HTTP client with keep-alive pooling and a per-host
+    concurrency cap so one slow site cannot hog every connection.
+    """
+
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            # Pools are bound to the event loop that created them
+            self._client = httpx.AsyncClient(
+                headers=DEFAULT_HEADERS,
+                timeout=HTTP_TIMEOUT,
+                follow_redirects=True,
+                http2=HTTP2_AVAILABLE,
+                limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS,
+                                    max_keepalive_connections=HTTP_MAX_KEEPALIVE),
+            )
+            self._loop = loop
+            self._host_slots = {}
+        return self._client
+
+    @asynccontextmanager
+    async def host_slot(self, url: str) -> AsyncIterator[None]:
+        """Hold one of the per-host request slots for ``url``."""
+        self.client  # make sure slots belong to the running loop
+        host = urlsplit(url).netloc.lower()
+        slot = self._host_slots.setdefault(host, asyncio.Semaphore(HTTP_MAX_PER_HOST))
+        async with slot:
+            yield
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        async with self.host_slot(url):
+            return await self.client.request(method, url, **kwargs)
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request('GET', url, **kwargs)
+
+    async def head(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request('HEAD', url, **kwargs)
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str, **kwargs) -> AsyncIterator[httpx.Response]:
+        async with self.host_slot(url):
+            async with self.client.stream(method, url, **kwargs) as response:
+                yield response
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+        self._client = None
+        self._loop = None
+
+
+http_client = HttpClient()
+
+
+class FetchedPage:
+    """
+    A downloaded page shared by every check that targets the same URL.
+    The BeautifulSoup tree is built on first access and reused afterwards;
+    checks that only need a few tag types use a cheaper targeted tree.
+    """
+
+    def __init__(self, url: str, response: httpx.Response):
+        self.url = str(response.url) or url
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.text = response.text
+        self.elapsed_ms = response.elapsed.total_seconds() * 1000
+        self.fetched_at = time.monotonic()
+        self._response = response
+        self._soup: Optional[BeautifulSoup] = None
+        self._partial_soups: Dict[Tuple[frozenset, frozenset], BeautifulSoup] = {}
+
+    @property
+    def size(self) -> int:
+        return len(self.text)
+
+    @property
+    def soup(self) -> BeautifulSoup:
+        if self._soup is None:
+            self._soup = parse_html(self.text)
+            self._partial_soups.clear()
+        return self._soup
+
+    def soup_for(self, names: Iterable[str], attrs: Iterable[str] = ()) -> BeautifulSoup:
+        """
+        A tree holding only the elements named in ``names`` or carrying one of
+        ``attrs``. Reuses the full tree if it has already been built.
+        """
+        if self._soup is not None:
+            return self._soup
+        key = (frozenset(names), frozenset(attrs))
+        soup = self._partial_soups.get(key)
+        if soup is None:
+            soup = self._partial_soups[key] = parse_html(self.text, key[0], key[1])
+        return soup
+
+    @property
+    def asset_soup(self) -> BeautifulSoup:
+        """Targeted tree for the asset checks: ASSET_TAGS plus elements with inline styles."""
+        return self.soup_for(ASSET_TAGS, ASSET_ATTRS)
+
+    def raise_for_status(self) -> None:
+        self._response.raise_for_status()
+
+
+class AsyncLRUCache:
+    """
+    Single-flight LRU cache bounded by entry count, optional total size and age.
+    Concurrent lookups of a missing key wait for one shared fetch.
+    """
+
+    def __init__(self, ttl: float, max_entries: int, max_bytes: Optional[int] = None,
+                 sizeof: Optional[Callable[[Any], int]] = None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof or (lambda value: 0)
+        self._entries: "OrderedDict[Hashable, Tuple[float, int, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value for ``key`` without fetching, or None."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, _, value = entry
+        if time.monotonic() - stored_at > self.ttl:
+            self.discard(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def discard(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        self.discard(key)
+        size = self._sizeof(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        self._entries[key] = (time.monotonic(), size, value)
+        self._bytes += size
+        while self._entries and (len(self._entries) > self.max_entries
+                                 or (self.max_bytes is not None and self._bytes > self.max_bytes)):
+            self.discard(next(iter(self._entries)))
+
+    async def get_or_fetch(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached value for ``key``, awaiting ``fetch()`` once if it is missing."""
+        value = self.peek(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.hits += 1
+            return await asyncio.shield(inflight)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await fetch()
+            self.put(key, value)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody else may be waiting; mark the exception as retrieved
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def join(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value for ``key``, waiting for a fetch already in flight; None if neither."""
+        value = self.peek(key)
+        if value is None and key in self._inflight:
+            value = await asyncio.shield(self._inflight[key])
+        return value
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+class PageCache(AsyncLRUCache):
+    """LRU cache of fetched pages keyed by normalized URL."""
+
+    def __init__(self, ttl: float = PAGE_CACHE_TTL, max_entries: int = PAGE_CACHE_MAX_ENTRIES,
+                 max_bytes: int = PAGE_CACHE_MAX_BYTES):
+        super().__init__(ttl, max_entries, max_bytes, sizeof=lambda page: page.size)
+
+    async def get(self, url: str, timeout: float = HTTP_TIMEOUT) -> FetchedPage:
+        """Return the cached page for ``url``, downloading it once if needed."""
+        key = normalize_url(url)
+
+        async def download() -> FetchedPage:
+            logger.info(f"Fetching page {key}")
+            response = await http_client.get(key, timeout=timeout)
+            return FetchedPage(key, response)
+
+        return await self.get_or_fetch(key, download)
+
+
+page_cache = PageCache()
+
+
+async def get_page(url: str, timeout: float = HTTP_TIMEOUT) -> FetchedPage:
+    """Fetch ``url`` through the shared page cache."""
+    return await page_cache.get(url, timeout=timeout)
@@ -275,7 +275,7 @@ function App() {
 
       // For endpoints that need URL parameter (CTA buttons, Noto Sans verification, etc.)
       let fetchUrl = `${API_BASE_URL}${endpoint}`;
-      if ([5, 20].includes(testCaseId)) { // CTA buttons and Noto Sans verification
+      if ([1, 5, 20].includes(testCaseId)) { // Palette census, CTA buttons and Noto Sans verification
         const separator = endpoint.includes('?') ? '&' : '?';
         const urlToUse = testCaseId === 20 ? url20 : url11;
         fetchUrl = `${fetchUrl}${separator}url=${encodeURIComponent(urlToUse)}`;
@@ -326,14 +326,18 @@ function App() {
   };
 
   const handleFooterColorVerify = async () => {
-    if (!screenshot) return;
+    if (!screenshot && !url11) return;
     try {
-      const formData = new FormData();
-      formData.append('file', screenshot);
-      const response = await fetch(`${API_BASE_URL}/api/verify/footer-color`, {
-        method: 'POST',
-        body: formData,
-      });
+      // Without an upload the footer is captured from the page at url11
+      const endpoint = `${API_BASE_URL}/api/verify/footer-color`;
+      let response;
+      if (screenshot) {
+        const formData = new FormData();
+        formData.append('file', screenshot);
+        response = await fetch(endpoint, { method: 'POST', body: formData });
+      } else {
+        response = await fetch(`${endpoint}?url=${encodeURIComponent(url11)}`);
+      }
       const data = await response.json();
       setVerificationResults((prev) => ({
         ...prev,
@@ -386,19 +390,22 @@ function App() {
   };
 
   const handleLogoLockupVerify = async () => {
-    if (!screenshot10) {
+    if (!screenshot10 && !url11) {
       setScreenshot10(null);
       setScreenshotName10('');
       return;
     }
 
     try {
-      const formData = new FormData();
-      formData.append('file', screenshot10);
-      const response = await fetch(`${API_BASE_URL}/api/verify/logo-lockups`, {
-        method: 'POST',
-        body: formData,
-      });
+      const endpoint = `${API_BASE_URL}/api/verify/logo-lockups`;
+      let response;
+      if (screenshot10) {
+        const formData = new FormData();
+        formData.append('file', screenshot10);
+        response = await fetch(endpoint, { method: 'POST', body: formData });
+      } else {
+        response = await fetch(`${endpoint}?url=${encodeURIComponent(url11)}`);
+      }
       const data = await response.json();
       setVerificationResults((prev) => ({
         ...prev,
@@ -484,19 +491,22 @@ function App() {
   };
 
   const handleStateEmblemUsageVerify = async () => {
-    if (!screenshot12) {
+    if (!screenshot12 && !url11) {
       setScreenshot12(null);
       setScreenshotName12('');
       return;
     }
 
     try {
-      const formData = new FormData();
-      formData.append('file', screenshot12);
-      const response = await fetch(`${API_BASE_URL}/api/verify/state-emblem-usage`, {
-        method: 'POST',
-        body: formData,
-      });
+      const endpoint = `${API_BASE_URL}/api/verify/state-emblem-usage`;
+      let response;
+      if (screenshot12) {
+        const formData = new FormData();
+        formData.append('file', screenshot12);
+        response = await fetch(endpoint, { method: 'POST', body: formData });
+      } else {
+        response = await fetch(`${endpoint}?url=${encodeURIComponent(url11)}`);
+      }
       const data = await response.json();
       setVerificationResults((prev) => ({
         ...prev,
@@ -670,11 +680,11 @@ function App() {
                                 }}
                                  disabled={
                                    isExecuting ||
-                                   (testCase.id === 4 && !screenshot) ||
+                                   (testCase.id === 4 && !screenshot && !url11) ||
                                    (testCase.id === 9 && !screenshot9) ||
-                                   (testCase.id === 10 && !screenshot10) ||
+                                   (testCase.id === 10 && !screenshot10 && !url11) ||
                                    (testCase.id === 11 && !url11) ||
-                                   (testCase.id === 12 && !screenshot12) ||
+                                   (testCase.id === 12 && !screenshot12 && !url11) ||
                                    (testCase.id === 20 && !url20) ||
                                    (testCase.id === 32 && !url32) ||
                                    (testCase.id === 33 && !url33) ||
@@ -773,7 +783,7 @@ function App() {
                                   )}
                                 </div>
                               )}
-                              {(testCase.id === 5 || testCase.id === 20) && (
+                              {[1, 4, 5, 10, 12, 20].includes(testCase.id) && (
                                 <div className="url-input-wrapper" style={{ width: '100%' }}>
                                   <input
                                     type="url"
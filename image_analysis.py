@@ -0,0 +1,485 @@
+"""
+Pixel analysis pipelines for the screenshot-based verify endpoints.
+
+Each ``analyze_*`` function takes a decoded (H, W, 3) uint8 RGB frame and
+returns a small dict of plain Python values, so it can run in a worker
+process (see image_pool) and send back only its result.
+"""
+import io
+import os
+from functools import cached_property, partial
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from image_kernels import (
+    DELTA_E,
+    color_histogram,
+    histogram_bin_colors,
+    median_cut,
+    quantized_histogram,
+    rgb_to_lab,
+    unpack_rgb,
+    match_histogram,
+    rgb_to_hex,
+    dark_pixel_mask,
+    light_pixel_mask,
+    mask_fraction,
+)
+from pixel_sampling import SAMPLING_BATCH, SAMPLING_MIN_PIXELS, sample_share, stratified_points
+
+# Perceptual colour matching, overridable through the environment: a colour
+# matches a target when its Delta E is at most COLOR_TOLERANCE
+COLOR_METRIC = os.getenv('DBIM_COLOR_METRIC', 'ciede2000')
+COLOR_TOLERANCE = float(os.getenv('DBIM_COLOR_TOLERANCE', '5'))
+# Palette census (guideline 1): pages are sampled down to about CENSUS_WIDTH
+# pixels across, CENSUS_STRIP_ROWS source rows at a time, into a 15-bit colour
+# histogram that is then quantized to at most CENSUS_CLUSTERS colours
+CENSUS_WIDTH = int(os.getenv('DBIM_CENSUS_WIDTH', '320'))
+CENSUS_STRIP_ROWS = int(os.getenv('DBIM_CENSUS_STRIP_ROWS', '1024'))
+CENSUS_CLUSTERS = int(os.getenv('DBIM_CENSUS_CLUSTERS', '12'))
+CENSUS_TOLERANCE = float(os.getenv('DBIM_CENSUS_TOLERANCE', '10'))
+CENSUS_MIN_SHARE = float(os.getenv('DBIM_CENSUS_MIN_SHARE', '0.02'))
+CENSUS_HISTOGRAM_BITS = 5
+# Colours with a Lab chroma below this are whites, greys and blacks, not palette colours
+NEUTRAL_CHROMA = 10.0
+# Histogram bins holding less than this share of the chromatic pixels are treated as
+# photo / gradient texture rather than flat UI colour and are left out of clustering
+CENSUS_MIN_BIN_SHARE = 0.002
+# Re-encode estimates (guideline 56): the qualities a well-optimized site would publish at
+REENCODE_WEBP_QUALITY = int(os.getenv('DBIM_REENCODE_WEBP_QUALITY', '80'))
+REENCODE_JPEG_QUALITY = int(os.getenv('DBIM_REENCODE_JPEG_QUALITY', '85'))
+
+if COLOR_METRIC not in DELTA_E:
+    raise ValueError(f"DBIM_COLOR_METRIC must be one of {sorted(DELTA_E)}, not {COLOR_METRIC!r}")
+
+
+_SHARPEN_KERNEL = np.array([[0, -1, 0], [-1, 5, -1], [0, -1, 0]], dtype=np.float32)
+# Marks are pixels more than 15 (Euclidean RGB distance) from the background
+MARK_DISTANCE = 15
+
+
+def enhance_frame(frame: np.ndarray) -> np.ndarray:
+    """Sharpen and equalize luminance to make marks stand out from the background."""
+    import cv2
+    yuv = cv2.cvtColor(cv2.filter2D(frame, -1, _SHARPEN_KERNEL), cv2.COLOR_RGB2YUV)
+    yuv[:, :, 0] = cv2.equalizeHist(yuv[:, :, 0])
+    return cv2.cvtColor(yuv, cv2.COLOR_YUV2RGB)
+
+
+def edge_background(frame: np.ndarray) -> np.ndarray:
+    """Mean colour of the 5-pixel border, taken as the background colour."""
+    top_edge = frame[0:5, :, :].reshape(-1, 3)
+    bottom_edge = frame[-5:, :, :].reshape(-1, 3)
+    left_edge = frame[:, 0:5, :].reshape(-1, 3)
+    right_edge = frame[:, -5:, :].reshape(-1, 3)
+    background_pixels = np.concatenate((top_edge, bottom_edge, left_edge, right_edge), axis=0)
+    return np.mean(background_pixels, axis=0)
+
+
+def foreground_mask(pixels: np.ndarray, bg_rgb: np.ndarray) -> np.ndarray:
+    """
+    True where an (..., 3) uint8 pixel is more than MARK_DISTANCE from the
+    background colour (rounded to integers). Squared distances are summed
+    channel by channel in int32, so no float or 3-channel temporaries are made.
+    """
+    distance = np.zeros(pixels.shape[:-1], dtype=np.int32)
+    for channel, background in enumerate(np.rint(bg_rgb).astype(np.int32)):
+        difference = pixels[..., channel].astype(np.int32)
+        difference -= background
+        difference *= difference
+        distance += difference
+    return distance > MARK_DISTANCE * MARK_DISTANCE
+
+
+def foreground_pixels(frame: np.ndarray, bg_rgb: np.ndarray) -> np.ndarray:
+    """Pixels further than MARK_DISTANCE from the background colour, as an (N, 3) array."""
+    return frame[foreground_mask(frame, bg_rgb)]
+
+
+class MarkFrame:
+    """
+    The preprocessing shared by the logo (10) and emblem (12) checks: the
+    enhanced frame, its edge background and the mark (foreground) pixels,
+    each computed once however many statistics read them.
+    """
+
+    def __init__(self, frame: np.ndarray):
+        self.enhanced = enhance_frame(frame)
+        self.bg_rgb = edge_background(self.enhanced)
+        self.total = self.enhanced.shape[0] * self.enhanced.shape[1]
+
+    @cached_property
+    def marks(self) -> np.ndarray:
+        return foreground_pixels(self.enhanced, self.bg_rgb)
+
+    @property
+    def mark_share(self) -> float:
+        return len(self.marks) / self.total if self.total > 0 else 0
+
+    @cached_property
+    def mark_rgb(self) -> Optional[np.ndarray]:
+        return np.mean(self.marks, axis=0) if len(self.marks) > 0 else None
+
+
+def _hex_targets(targets: Sequence[str]) -> np.ndarray:
+    return np.array([[int(t.lstrip('#')[i:i + 2], 16) for i in (0, 2, 4)] for t in targets], dtype=np.uint8)
+
+
+def _tolerance_match(colors: np.ndarray, counts: np.ndarray, targets: Sequence[str],
+                     tolerance: float, metric: str) -> Dict[str, Any]:
+    """Dominant colour of a histogram, its nearest target and the share of pixels within tolerance."""
+    match = match_histogram(colors, counts, _hex_targets(targets), tolerance, metric)
+    top = int(np.argmax(counts))
+    dominant = [int(c) for c in unpack_rgb(colors[top:top + 1])[0]]
+    return {
+        "rgb": dominant,
+        "hex": rgb_to_hex(dominant),
+        "nearest_target": targets[int(match['nearest'][top])].upper(),
+        "delta_e": round(float(match['delta_e'][top]), 2),
+        "within_tolerance": bool(match['delta_e'][top] <= tolerance),
+        "share_within_tolerance": match['share'],
+        "target_shares": {t.upper(): share for t, share in zip(targets, match['target_shares'])},
+        "tolerance": tolerance,
+        "metric": metric,
+    }
+
+
+def analyze_footer_color(frame: np.ndarray, targets: Sequence[str], tolerance: float = COLOR_TOLERANCE,
+                         metric: str = COLOR_METRIC) -> Dict[str, Any]:
+    """
+    Guideline 4: the most common colour of a footer screenshot, matched
+    against ``targets`` (the darkest palette tones) within ``tolerance``.
+    """
+    colors, counts = color_histogram(frame)
+    return _tolerance_match(colors, counts, targets, tolerance, metric)
+
+
+def analyze_text_color(frame: np.ndarray, targets: Sequence[str], tolerance: float = COLOR_TOLERANCE,
+                       metric: str = COLOR_METRIC) -> Dict[str, Any]:
+    """
+    Guideline 9: the most common colour among the text-like pixels, matched
+    against ``targets`` within ``tolerance``.
+    """
+    gray = np.dot(frame[..., :3], [0.299, 0.587, 0.114])  # Convert to grayscale
+    mean_gray = np.mean(gray)
+    # If mostly dark, look for light pixels (text); if mostly light, look for dark pixels (text)
+    if mean_gray < 128:
+        # Mostly dark background, look for light text
+        threshold = mean_gray + (255 - mean_gray) * 0.5  # Midway to white
+        mask = gray > threshold
+    else:
+        # Mostly light background, look for dark text
+        threshold = mean_gray * 0.5
+        mask = gray < threshold
+    colors, counts = color_histogram(frame, mask)
+    if counts.size == 0:
+        # fallback: just use the most common color
+        colors, counts = color_histogram(frame)
+    return _tolerance_match(colors, counts, targets, tolerance, metric)
+
+
+def logo_lockup_stats(marks: MarkFrame) -> Dict[str, Any]:
+    """Guideline 10 from preprocessed marks: share of logo pixels that are black."""
+    return {
+        "background_hex": '#%02x%02x%02x' % tuple(int(x) for x in marks.bg_rgb),
+        "logo_hex": '#%02x%02x%02x' % tuple(int(x) for x in marks.mark_rgb) if marks.mark_rgb is not None else None,
+        "percent_logo": marks.mark_share,
+        # Logo pixels close to black (all channels <= 40)
+        "percent_black": mask_fraction(dark_pixel_mask(marks.marks, 40)),
+    }
+
+
+def background_tone(bg_rgb: np.ndarray) -> str:
+    brightness = np.mean(bg_rgb)
+    return "White" if brightness > 180 else "Black" if brightness < 80 else "Gray"
+
+
+def state_emblem_stats(marks: MarkFrame) -> Dict[str, Any]:
+    """Guideline 12 from preprocessed marks: background tone and the dark/light share of emblem pixels."""
+    return {
+        "background_color": background_tone(marks.bg_rgb),
+        "background_rgb": [float(x) for x in marks.bg_rgb],
+        "emblem_rgb": [float(x) for x in marks.mark_rgb] if marks.mark_rgb is not None else None,
+        "percent_emblem": marks.mark_share,
+        "percent_dark": mask_fraction(dark_pixel_mask(marks.marks, 60)),
+        "percent_light": mask_fraction(light_pixel_mask(marks.marks, 200)),
+    }
+
+
+def analyze_logo_lockup(frame: np.ndarray) -> Dict[str, Any]:
+    """Guideline 10: share of logo pixels that are black."""
+    return logo_lockup_stats(MarkFrame(frame))
+
+
+def analyze_state_emblem(frame: np.ndarray) -> Dict[str, Any]:
+    """Guideline 12: background tone and the dark/light share of emblem pixels."""
+    return state_emblem_stats(MarkFrame(frame))
+
+
+def analyze_marks(frame: np.ndarray) -> Dict[str, Dict[str, Any]]:
+    """
+    Guidelines 10 and 12 from one preprocessing pass. The upload cache keys
+    results by kernel and bytes, so an image checked as both logo and
+    emblem in one audit is preprocessed once.
+    """
+    marks = MarkFrame(frame)
+    return {"logo": logo_lockup_stats(marks), "emblem": state_emblem_stats(marks)}
+
+
+def equalize_lut(luma: np.ndarray) -> np.ndarray:
+    """The lookup table cv2.equalizeHist would build from these luma values."""
+    hist = np.bincount(luma.ravel(), minlength=256)
+    cdf = np.cumsum(hist)
+    lowest = hist[np.flatnonzero(hist)[0]] if cdf[-1] else 0
+    if cdf[-1] == lowest:
+        return np.arange(256, dtype=np.uint8)
+    return np.clip(np.rint((cdf - lowest) * (255.0 / (cdf[-1] - lowest))), 0, 255).astype(np.uint8)
+
+
+def _reflect(index: np.ndarray, size: int) -> np.ndarray:
+    # cv2.BORDER_REFLECT_101: -1 -> 1, size -> size - 2
+    index = np.abs(index)
+    return np.clip(np.where(index >= size, 2 * (size - 1) - index, index), 0, size - 1)
+
+
+def enhance_points(frame: np.ndarray, rows: np.ndarray, cols: np.ndarray,
+                   lut: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    enhance_frame evaluated at (rows, cols) only: the sharpened pixels there,
+    equalized with ``lut`` (an equalize_lut of the sampled luma). Returns the
+    enhanced (N, 3) pixels and the sharpened luma used to build a lut.
+    """
+    import cv2
+    height, width = frame.shape[:2]
+    centre = frame[rows, cols].astype(np.int16)
+    neighbours = (frame[_reflect(rows - 1, height), cols].astype(np.int16)
+                  + frame[_reflect(rows + 1, height), cols] + frame[rows, _reflect(cols - 1, width)]
+                  + frame[rows, _reflect(cols + 1, width)])
+    sharpened = np.clip(5 * centre - neighbours, 0, 255).astype(np.uint8)
+    yuv = cv2.cvtColor(sharpened.reshape(-1, 1, 3), cv2.COLOR_RGB2YUV)
+    luma = yuv[:, 0, 0].copy()
+    if lut is not None:
+        yuv[:, 0, 0] = lut[luma]
+    return cv2.cvtColor(yuv, cv2.COLOR_YUV2RGB).reshape(-1, 3), luma
+
+
+def _border_points(height: int, width: int) -> Tuple[np.ndarray, np.ndarray]:
+    # The same 5-pixel border edge_background reads
+    rows, cols = np.indices((height, width))
+    bands = (np.s_[0:5, :], np.s_[-5:, :], np.s_[:, 0:5], np.s_[:, -5:])
+    return (np.concatenate([rows[band].ravel() for band in bands]),
+            np.concatenate([cols[band].ravel() for band in bands]))
+
+
+def _sample_marks(frame: np.ndarray, seed: int, statistic, threshold: Optional[float]) -> Dict[str, Any]:
+    """
+    Sampled enhance_frame / edge_background / foreground_pixels: the
+    background colour from the (exact) border, and from stratified samples
+    the foreground share, mean foreground colour and the share of
+    foreground pixels matching ``statistic(bg_rgb)``'s mask, drawn until
+    that share is decided against ``threshold``.
+    """
+    height, width = frame.shape[:2]
+    rng = np.random.default_rng(seed)
+    _, pilot_luma = enhance_points(frame, *stratified_points(height, width, SAMPLING_BATCH, rng))
+    lut = equalize_lut(pilot_luma)
+    bg_rgb = np.mean(enhance_points(frame, *_border_points(height, width), lut)[0], axis=0)
+    mask = statistic(bg_rgb)
+    # stratified_points returns about, not exactly, the requested count
+    sampled = {'pixels': 0, 'rgb_sum': np.zeros(3)}
+
+    def draw(count: int) -> Tuple[int, int]:
+        pixels = enhance_points(frame, *stratified_points(height, width, count, rng), lut)[0]
+        marks = pixels[foreground_mask(pixels, bg_rgb)]
+        sampled['pixels'] += len(pixels)
+        sampled['rgb_sum'] += marks.sum(axis=0)
+        return (int(np.count_nonzero(mask(marks))) if mask is not None else 0), len(marks)
+
+    share, _ = sample_share(draw, threshold if mask is not None else None)
+    return {
+        'bg_rgb': bg_rgb,
+        'mark_rgb': sampled['rgb_sum'] / share.trials if share.trials else None,
+        'percent_marks': share.trials / sampled['pixels'] if sampled['pixels'] else 0,
+        'share': share,
+        'sampling': {**share.as_dict(), 'pixels_sampled': sampled['pixels'], 'pixels_total': height * width,
+                     'decided': threshold is not None and mask is not None and share.trials > 0
+                     and share.decided(threshold)},
+    }
+
+
+def _exact(result: Dict[str, Any]) -> Dict[str, Any]:
+    return {**result, "sampling": None}
+
+
+def sample_logo_lockup(frame: np.ndarray, threshold: float, seed: int = 0) -> Dict[str, Any]:
+    """
+    Guideline 10 in sampling mode: analyze_logo_lockup's values estimated
+    from stratified samples, stopping once the black share is clearly above
+    or below ``threshold``. Small frames are scanned exactly.
+    """
+    if frame.shape[0] * frame.shape[1] < SAMPLING_MIN_PIXELS:
+        return _exact(analyze_logo_lockup(frame))
+    sampled = _sample_marks(frame, seed, lambda bg_rgb: partial(dark_pixel_mask, threshold=40), threshold)
+    return {
+        "background_hex": '#%02x%02x%02x' % tuple(int(x) for x in sampled['bg_rgb']),
+        "logo_hex": ('#%02x%02x%02x' % tuple(int(x) for x in sampled['mark_rgb'])
+                     if sampled['mark_rgb'] is not None else None),
+        "percent_logo": sampled['percent_marks'],
+        "percent_black": sampled['share'].estimate,
+        "sampling": sampled['sampling'],
+    }
+
+
+def _emblem_statistic(bg_rgb: np.ndarray):
+    # Dark marks on a white background, light marks on a black one; nothing to measure on grey
+    tone = background_tone(bg_rgb)
+    if tone == "White":
+        return partial(dark_pixel_mask, threshold=60)
+    if tone == "Black":
+        return partial(light_pixel_mask, threshold=200)
+    return None
+
+
+def sample_state_emblem(frame: np.ndarray, threshold: float, seed: int = 0) -> Dict[str, Any]:
+    """
+    Guideline 12 in sampling mode: analyze_state_emblem's values estimated
+    from stratified samples. Only the share that decides the check (dark
+    on white, light on black) is sampled to a confident verdict; the other
+    one is reported as None.
+    """
+    if frame.shape[0] * frame.shape[1] < SAMPLING_MIN_PIXELS:
+        return _exact(analyze_state_emblem(frame))
+    sampled = _sample_marks(frame, seed, _emblem_statistic, threshold)
+    bg_rgb = sampled['bg_rgb']
+    bg_color = background_tone(bg_rgb)
+    share = sampled['share'].estimate if bg_color != "Gray" else None
+    return {
+        "background_color": bg_color,
+        "background_rgb": [float(x) for x in bg_rgb],
+        "emblem_rgb": [float(x) for x in sampled['mark_rgb']] if sampled['mark_rgb'] is not None else None,
+        "percent_emblem": sampled['percent_marks'],
+        "percent_dark": share if bg_color == "White" else None,
+        "percent_light": share if bg_color == "Black" else None,
+        "sampling": sampled['sampling'],
+    }
+
+
+def census_stride(width: int, max_width: int = CENSUS_WIDTH) -> int:
+    """Sampling step that brings ``width`` down to at most ``max_width`` columns."""
+    return max(1, -(-width // max_width))
+
+
+def census_histogram(frame: np.ndarray, max_width: int = CENSUS_WIDTH,
+                     strip_rows: int = CENSUS_STRIP_ROWS) -> np.ndarray:
+    """
+    Guideline 1, first pass: sampled colour histogram of a (possibly very tall)
+    frame. Rows are processed in horizontal strips so temporaries stay bounded
+    by the strip size; strip histograms are summed.
+    """
+    step = census_stride(frame.shape[1], max_width)
+    strip_rows = max(step, strip_rows - strip_rows % step)
+    histogram = np.zeros(1 << (3 * CENSUS_HISTOGRAM_BITS), dtype=np.int64)
+    for top in range(0, frame.shape[0], strip_rows):
+        strip = frame[top:top + strip_rows:step, ::step]
+        histogram += quantized_histogram(strip, CENSUS_HISTOGRAM_BITS)
+    return histogram
+
+
+def analyze_palette_census(histogram: np.ndarray, palette: Sequence[str], groups: Sequence[str],
+                           clusters: int = CENSUS_CLUSTERS, tolerance: float = CENSUS_TOLERANCE,
+                           min_share: float = CENSUS_MIN_SHARE, metric: str = COLOR_METRIC) -> Dict[str, Any]:
+    """
+    Guideline 1, second pass: quantize a ``census_histogram`` and map each
+    flat chromatic cluster to its nearest palette colour. ``groups[i]`` names
+    the group of ``palette[i]``. Neutral colours and photo-like texture are
+    counted separately; cluster shares are relative to the flat colours.
+    """
+    histogram = np.asarray(histogram)
+    total = int(histogram.sum())
+    bins = np.flatnonzero(histogram)
+    bin_rgb = histogram_bin_colors(CENSUS_HISTOGRAM_BITS)[bins]
+    bin_lab = rgb_to_lab(bin_rgb)
+    chromatic = np.hypot(bin_lab[:, 1], bin_lab[:, 2]) >= NEUTRAL_CHROMA
+    chromatic_total = int(histogram[bins[chromatic]].sum())
+    flat = chromatic & (histogram[bins] >= CENSUS_MIN_BIN_SHARE * chromatic_total)
+    flat_total = int(histogram[bins[flat]].sum())
+
+    palette_lab = rgb_to_lab(_hex_targets(palette))
+    cluster_rows = []
+    group_shares: Dict[str, float] = {}
+    off_palette = 0.0
+    for mean_rgb, weight in median_cut(bin_rgb[flat], histogram[bins[flat]], clusters):
+        rgb = np.clip(np.rint(mean_rgb), 0, 255).astype(np.uint8)
+        dist = DELTA_E[metric](rgb_to_lab(rgb)[None, :], palette_lab)
+        nearest = int(np.argmin(dist))
+        share = weight / flat_total
+        matched = bool(dist[nearest] <= tolerance)
+        if matched:
+            group_shares[groups[nearest]] = group_shares.get(groups[nearest], 0.0) + share
+        else:
+            off_palette += share
+        cluster_rows.append({
+            "hex": rgb_to_hex(rgb),
+            "share": round(share, 4),
+            "nearest": palette[nearest].upper(),
+            "group": groups[nearest] if matched else None,
+            "delta_e": round(float(dist[nearest]), 2),
+        })
+
+    groups_used = sorted((g for g, share in group_shares.items() if share >= min_share),
+                         key=lambda g: -group_shares[g])
+    return {
+        "clusters": cluster_rows,
+        "group_shares": {g: round(share, 4) for g, share in sorted(group_shares.items(), key=lambda kv: -kv[1])},
+        "groups_used": groups_used,
+        "off_palette_share": round(off_palette, 4),
+        "neutral_share": round(1 - chromatic_total / total, 4) if total else 0.0,
+        "textured_share": round((chromatic_total - flat_total) / total, 4) if total else 0.0,
+        "sampled_pixels": total,
+        "tolerance": tolerance,
+        "metric": metric,
+    }
+
+
+def analyze_palette_census_frame(frame: np.ndarray, palette: Sequence[str], groups: Sequence[str],
+                                 **options) -> Dict[str, Any]:
+    """Guideline 1 for a single uploaded screenshot: both census passes."""
+    return analyze_palette_census(census_histogram(frame), palette, groups, **options)
+
+
+def estimate_reencode_sizes(frame: np.ndarray, target_width: int, target_height: int,
+                            webp_quality: int = REENCODE_WEBP_QUALITY,
+                            jpeg_quality: int = REENCODE_JPEG_QUALITY) -> Dict[str, Any]:
+    """
+    Encoded sizes of a decoded image (RGB, or RGBA when it has transparency)
+    resized to its display size and saved as WebP and, without an alpha
+    channel, as progressive JPEG.
+    """
+    from PIL import Image
+    image = Image.fromarray(frame)
+    if (target_width, target_height) != image.size:
+        image = image.resize((target_width, target_height), Image.LANCZOS)
+    sizes: Dict[str, Any] = {'target_width': target_width, 'target_height': target_height}
+    encodings = [('webp', 'WEBP', {'quality': webp_quality, 'method': 4})]
+    if frame.ndim == 2 or frame.shape[2] == 3:
+        encodings.append(('jpeg', 'JPEG', {'quality': jpeg_quality, 'optimize': True, 'progressive': True}))
+    for name, image_format, options in encodings:
+        buffer = io.BytesIO()
+        image.save(buffer, image_format, **options)
+        sizes[f'{name}_bytes'] = buffer.tell()
+    return sizes
+
+
+def count_white_pixels(frame: np.ndarray, threshold: int = 245) -> Dict[str, int]:
+    """Pixels whose mean channel value is at least ``threshold``, and the total pixel count."""
+    white = frame.sum(axis=2, dtype=np.uint16) >= 3 * threshold
+    return {'white': int(np.count_nonzero(white)), 'total': int(white.size)}
+
+
+def sample_white_pixels(frame: np.ndarray, count: int, threshold: int = 245, seed: int = 0) -> Dict[str, int]:
+    """count_white_pixels over about ``count`` stratified samples instead of every pixel."""
+    rows, cols = stratified_points(frame.shape[0], frame.shape[1], count, np.random.default_rng(seed))
+    white = frame[rows, cols].sum(axis=1, dtype=np.uint16) >= 3 * threshold
+    return {'white': int(np.count_nonzero(white)), 'sampled': int(white.size),
+            'total': frame.shape[0] * frame.shape[1]}
@@ -0,0 +1,169 @@
+"""
+Image format and pixel dimensions from the first bytes of a file.
+
+Reads only magic numbers and headers (PNG IHDR, JPEG SOF, WebP
+VP8/VP8L/VP8X, GIF, BMP, AVIF/HEIF ``ispe`` and the SVG root element), so a
+Range request for the first few KB of an image is enough to know what it
+really is and how many pixels it has.
+"""
+import re
+import struct
+from typing import NamedTuple, Optional
+
+
+class ImageHeader(NamedTuple):
+    format: Optional[str]
+    width: Optional[int]
+    height: Optional[int]
+    # False while more bytes could still yield the format or the dimensions
+    complete: bool
+
+
+UNKNOWN = ImageHeader(None, None, None, True)
+
+# JPEG start-of-frame markers carry the dimensions; C4 (DHT), C8 (JPG) and CC (DAC) do not
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+_JPEG_STANDALONE_MARKERS = {0x01, *range(0xD0, 0xD8)}
+
+_AVIF_BRANDS = {b'avif', b'avis'}
+_HEIF_BRANDS = {b'heic', b'heix', b'heim', b'heis', b'hevc', b'hevx', b'mif1', b'msf1'}
+
+_SVG_TAG_RE = re.compile(r'<svg\b[^>]*>', re.IGNORECASE | re.DOTALL)
+_SVG_LENGTH_RE = r'\b{}\s*=\s*["\']\s*([\d.]+)\s*(px)?\s*["\']'
+_SVG_VIEWBOX_RE = re.compile(r'\bviewBox\s*=\s*["\']\s*[-\d.]+[\s,]+[-\d.]+[\s,]+([\d.]+)[\s,]+([\d.]+)',
+                             re.IGNORECASE)
+
+
+def _png(data: bytes) -> ImageHeader:
+    if len(data) < 24:
+        return ImageHeader('png', None, None, False)
+    if data[12:16] != b'IHDR':
+        return ImageHeader('png', None, None, True)
+    width, height = struct.unpack('>II', data[16:24])
+    return ImageHeader('png', width, height, True)
+
+
+def _gif(data: bytes) -> ImageHeader:
+    if len(data) < 10:
+        return ImageHeader('gif', None, None, False)
+    width, height = struct.unpack('<HH', data[6:10])
+    return ImageHeader('gif', width, height, True)
+
+
+def _bmp(data: bytes) -> ImageHeader:
+    if len(data) < 26:
+        return ImageHeader('bmp', None, None, False)
+    width, height = struct.unpack('<ii', data[18:26])
+    return ImageHeader('bmp', abs(width), abs(height), True)
+
+
+def _jpeg(data: bytes) -> ImageHeader:
+    """Walk the marker segments up to the first start-of-frame."""
+    i, n = 2, len(data)
+    while True:
+        # Markers are 0xFF followed by a code; extra 0xFF bytes are fill
+        while i < n and data[i] != 0xFF:
+            i += 1
+        while i < n and data[i] == 0xFF:
+            i += 1
+        if i >= n:
+            return ImageHeader('jpeg', None, None, False)
+        marker = data[i]
+        i += 1
+        if marker in _JPEG_STANDALONE_MARKERS:
+            continue
+        if marker in (0xD9, 0xDA):  # end of image or start of scan before any frame header
+            return ImageHeader('jpeg', None, None, True)
+        if i + 2 > n:
+            return ImageHeader('jpeg', None, None, False)
+        length = struct.unpack('>H', data[i:i + 2])[0]
+        if marker in _JPEG_SOF_MARKERS:
+            if i + 7 > n:
+                return ImageHeader('jpeg', None, None, False)
+            height, width = struct.unpack('>HH', data[i + 3:i + 7])
+            return ImageHeader('jpeg', width, height, True)
+        i += length
+
+
+def _webp(data: bytes) -> ImageHeader:
+    if len(data) < 30:
+        return ImageHeader('webp', None, None, False)
+    chunk = data[12:16]
+    if chunk == b'VP8 ':
+        # Key frame: 3-byte frame tag, start code 9d 01 2a, then 14-bit width and height
+        width, height = struct.unpack('<HH', data[26:30])
+        return ImageHeader('webp', width & 0x3FFF, height & 0x3FFF, True)
+    if chunk == b'VP8L':
+        bits = int.from_bytes(data[21:25], 'little')
+        return ImageHeader('webp', (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1, True)
+    if chunk == b'VP8X':
+        width = int.from_bytes(data[24:27], 'little') + 1
+        height = int.from_bytes(data[27:30], 'little') + 1
+        return ImageHeader('webp', width, height, True)
+    return ImageHeader('webp', None, None, True)
+
+
+def _isobmff(data: bytes) -> ImageHeader:
+    """AVIF / HEIF: the brand is in ``ftyp``, the size in the first ``ispe`` property."""
+    box_size = struct.unpack('>I', data[0:4])[0]
+    brands = {data[8:12]} | {data[j:j + 4] for j in range(16, min(box_size, len(data)) - 3, 4)}
+    if brands & _AVIF_BRANDS:
+        image_format = 'avif'
+    elif brands & _HEIF_BRANDS:
+        image_format = 'heif'
+    else:
+        return UNKNOWN
+    ispe = data.find(b'ispe')
+    if ispe == -1 or ispe + 16 > len(data):
+        return ImageHeader(image_format, None, None, False)
+    # 'ispe' is a full box: 4 bytes version/flags, then 32-bit width and height
+    width, height = struct.unpack('>II', data[ispe + 8:ispe + 16])
+    return ImageHeader(image_format, width, height, True)
+
+
+def _svg_length(tag: str, name: str) -> Optional[int]:
+    match = re.search(_SVG_LENGTH_RE.format(name), tag, re.IGNORECASE)
+    return round(float(match.group(1))) if match else None
+
+
+def _svg(data: bytes) -> ImageHeader:
+    """Text formats: an SVG root element, sized by width/height or its viewBox."""
+    text = data.decode('utf-8', errors='ignore').lstrip('\ufeff \t\r\n')
+    if not text.startswith('<'):
+        return UNKNOWN
+    tag = _SVG_TAG_RE.search(text)
+    if tag is None:
+        # Still inside an XML declaration, doctype or comment; HTML error pages stop here
+        lowered = text[:512].lower()
+        if '<html' in lowered or '<body' in lowered:
+            return UNKNOWN
+        return ImageHeader(None, None, None, False)
+    tag = tag.group(0)
+    width, height = _svg_length(tag, 'width'), _svg_length(tag, 'height')
+    if not (width and height):
+        viewbox = _SVG_VIEWBOX_RE.search(tag)
+        if viewbox:
+            width, height = round(float(viewbox.group(1))), round(float(viewbox.group(2)))
+    return ImageHeader('svg', width or None, height or None, True)
+
+
+def parse_image_header(data: bytes) -> ImageHeader:
+    """
+    Identify an image from its leading bytes. ``complete`` is False when
+    the format or dimensions may still be found in more bytes.
+    """
+    if len(data) < 12:
+        return ImageHeader(None, None, None, False)
+    if data.startswith(b'\x89PNG\r\n\x1a\n'):
+        return _png(data)
+    if data.startswith(b'\xff\xd8\xff'):
+        return _jpeg(data)
+    if data.startswith((b'GIF87a', b'GIF89a')):
+        return _gif(data)
+    if data.startswith(b'RIFF') and data[8:12] == b'WEBP':
+        return _webp(data)
+    if data[4:8] == b'ftyp':
+        return _isobmff(data)
+    if data.startswith(b'BM'):
+        return _bmp(data)
+    return _svg(data)
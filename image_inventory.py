@@ -0,0 +1,369 @@
+"""
+Image inventory shared by the image checks (guidelines 32-36).
+
+A page's images are collected once from ``<img>`` (``src`` and ``srcset``),
+``<picture>`` sources, inline ``style`` backgrounds and stylesheet
+backgrounds, probed concurrently for size, true format and pixel
+dimensions (asset_probe.probe_image_headers), and classified by
+role (background, banner, thumbnail) from their markup and their declared
+or natural geometry. Each guideline is then a cheap evaluation of one limit
+over the cached inventory. Rendered sizes are only ever applied to a
+per-call copy (with_render_snapshot), so roles never depend on whether a
+render of the page happened to be cached. The alt-text checks (37, 38)
+only read markup and use img_alt_texts, which probes nothing.
+"""
+import base64
+import copy
+import logging
+import os
+import re
+from pathlib import PurePosixPath
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import unquote_to_bytes, urljoin, urlsplit
+
+from bs4 import BeautifulSoup, Tag
+
+from asset_probe import IMAGE_HEADER_BYTES, probe_image_headers
+from css_index import background_image_urls, parse_declarations
+from fetcher import AsyncLRUCache, get_page, normalize_url
+from image_headers import parse_image_header
+from render_snapshot import RenderSnapshot
+from stylesheets import load_stylesheet_index
+
+logger = logging.getLogger(__name__)
+
+# Inventory cache and classification settings, overridable through the environment
+IMAGE_INVENTORY_TTL = float(os.getenv('DBIM_IMAGE_INVENTORY_TTL', '300'))
+IMAGE_INVENTORY_MAX_ENTRIES = int(os.getenv('DBIM_IMAGE_INVENTORY_MAX_ENTRIES', '64'))
+THUMBNAIL_MAX_DIMENSION = int(os.getenv('DBIM_THUMBNAIL_MAX_DIMENSION', '300'))
+BANNER_MIN_WIDTH = int(os.getenv('DBIM_BANNER_MIN_WIDTH', '1000'))
+
+IMAGE_SIZE_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (compatible; ImageSizeBot/1.0)'
+}
+
+# Class / id fragments that mark an image (or its container) as a banner or a thumbnail
+BANNER_HINTS = ('banner', 'hero', 'slider', 'carousel', 'masthead', 'jumbotron', 'slide')
+THUMBNAIL_HINTS = ('thumb', 'avatar', 'icon', 'card-img')
+HINT_ANCESTOR_DEPTH = 3
+
+_SRCSET_CANDIDATE_RE = re.compile(r'(\S+)(?:\s+[^,]*)?(?:,|$)')
+
+# Size limits per guideline: (role the limit applies to, or None for every image; max bytes)
+IMAGE_SIZE_LIMITS: Dict[int, Tuple[Optional[str], int]] = {
+    32: ('background', 2 * 1024 * 1024),
+    33: ('banner', 2 * 1024 * 1024),
+    34: ('thumbnail', 100 * 1024),
+    36: (None, 5 * 1024 * 1024),
+}
+
+CONTENT_TYPE_FORMATS = {
+    'image/jpeg': 'jpeg', 'image/jpg': 'jpeg', 'image/pjpeg': 'jpeg', 'image/png': 'png',
+    'image/webp': 'webp', 'image/gif': 'gif', 'image/svg+xml': 'svg', 'image/avif': 'avif',
+    'image/bmp': 'bmp', 'image/x-icon': 'ico', 'image/vnd.microsoft.icon': 'ico', 'image/tiff': 'tiff',
+}
+EXTENSION_FORMATS = {
+    '.jpg': 'jpeg', '.jpeg': 'jpeg', '.jfif': 'jpeg', '.png': 'png', '.webp': 'webp', '.gif': 'gif',
+    '.svg': 'svg', '.avif': 'avif', '.bmp': 'bmp', '.ico': 'ico', '.tif': 'tiff', '.tiff': 'tiff',
+}
+
+
+class InventoryImage:
+    """One unique image URL on the page and everything the image checks know about it."""
+
+    def __init__(self, url: str, source: str):
+        self.url = url
+        self.source = source
+        self.roles = set()
+        # Alt text of every <img> element that shows this image (None when the attribute is missing)
+        self.alt_texts: List[Optional[str]] = []
+        self.declared_width: Optional[int] = None
+        self.declared_height: Optional[int] = None
+        self.natural_width: Optional[int] = None
+        self.natural_height: Optional[int] = None
+        self.rendered_width: Optional[float] = None
+        self.rendered_height: Optional[float] = None
+        self.size_bytes: Optional[int] = None
+        self.content_type = ''
+        # Format read from the file's own header bytes, when they could be identified
+        self.detected_format: Optional[str] = None
+        self.error: Optional[str] = None
+
+    @property
+    def format(self) -> str:
+        if self.detected_format:
+            return self.detected_format
+        mime = self.content_type.split(';')[0].strip().lower()
+        if mime in CONTENT_TYPE_FORMATS:
+            return CONTENT_TYPE_FORMATS[mime]
+        suffix = PurePosixPath(urlsplit(self.url).path).suffix.lower()
+        return EXTENSION_FORMATS.get(suffix, 'unknown')
+
+    def set_header(self, image_format: Optional[str], width: Optional[int], height: Optional[int]) -> None:
+        self.detected_format = image_format
+        self.natural_width = width or self.natural_width
+        self.natural_height = height or self.natural_height
+
+    @property
+    def display_width(self) -> Optional[float]:
+        return self.rendered_width or self.declared_width or self.natural_width
+
+    @property
+    def display_height(self) -> Optional[float]:
+        return self.rendered_height or self.declared_height or self.natural_height
+
+    def as_dict(self) -> Dict[str, Any]:
+        entry: Dict[str, Any] = {
+            'source': self.source,
+            'image_url': self.url[:70],
+            'format': self.format,
+            'roles': sorted(self.roles),
+        }
+        if self.error is not None:
+            entry['error'] = self.error
+        else:
+            entry.update({
+                'size_bytes': self.size_bytes,
+                'size_KB': round(self.size_bytes / 1024, 2),
+                'size_MB': round(self.size_bytes / 1024 / 1024, 2),
+            })
+        if self.alt_texts:
+            entry['alt'] = self.alt_texts[0] or ''
+        geometry = {k: v for k, v in (('declared_width', self.declared_width),
+                                      ('declared_height', self.declared_height),
+                                      ('natural_width', self.natural_width),
+                                      ('natural_height', self.natural_height),
+                                      ('rendered_width', self.rendered_width),
+                                      ('rendered_height', self.rendered_height)) if v}
+        if geometry:
+            entry['geometry'] = geometry
+        return entry
+
+
+class ImageInventory:
+    """Every image on a page, in document order, keyed by absolute URL."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.images: Dict[str, InventoryImage] = {}
+        self.rendered = False
+
+    def add(self, url: str, source: str) -> Optional[InventoryImage]:
+        url = url.strip()
+        if not url:
+            return None
+        absolute = url if url.startswith('data:') else urljoin(self.url, url)
+        image = self.images.get(absolute)
+        if image is None:
+            image = self.images[absolute] = InventoryImage(absolute, source)
+        return image
+
+    def with_role(self, role: Optional[str]) -> List[InventoryImage]:
+        return [image for image in self.images.values() if role is None or role in image.roles]
+
+
+def img_alt_texts(soup: BeautifulSoup, base_url: str) -> List[Tuple[str, Optional[str]]]:
+    """``(url, alt)`` for every ``<img>`` element with a ``src``, in document order, without probing."""
+    images = []
+    for element in soup.find_all('img'):
+        src = (element.get('src') or '').strip()
+        if src:
+            images.append((src if src.startswith('data:') else urljoin(base_url, src), element.get('alt')))
+    return images
+
+
+def _int_attr(value: Optional[str]) -> Optional[int]:
+    value = (value or '').strip().lower().removesuffix('px')
+    return int(value) if value.isdigit() else None
+
+
+def _srcset_urls(srcset: str) -> List[str]:
+    """Candidate URLs of a ``srcset`` attribute (each ``url [descriptor]``, comma separated)."""
+    # A candidate URL runs to the next whitespace, so data: URIs may contain commas
+    return [url.rstrip(',') for url in _SRCSET_CANDIDATE_RE.findall(srcset) if url.rstrip(',')]
+
+
+def _hint_text(element: Tag) -> str:
+    """Class and id names of ``element`` and its nearest ancestors, lower-cased."""
+    names = []
+    node = element
+    for _ in range(HINT_ANCESTOR_DEPTH + 1):
+        if node is None or not getattr(node, 'name', None) or node.name == '[document]':
+            break
+        names.extend(node.get('class', []))
+        names.append(node.get('id', ''))
+        node = node.parent
+    return ' '.join(names).lower()
+
+
+def _data_uri_info(url: str) -> Tuple[int, str, bytes]:
+    """Decoded size, media type and leading bytes of a ``data:`` URI, without any network access."""
+    header, _, payload = url[5:].partition(',')
+    media_type = header.split(';')[0] or 'text/plain'
+    if header.endswith(';base64'):
+        payload = ''.join(payload.split())
+        data = base64.b64decode(payload + '=' * (-len(payload) % 4), validate=False)
+    else:
+        data = unquote_to_bytes(payload)
+    return len(data), media_type, data[:IMAGE_HEADER_BYTES]
+
+
+def collect_images(soup: BeautifulSoup, inventory: ImageInventory, stylesheet_backgrounds) -> None:
+    """Add every image referenced by ``soup`` and its stylesheets to ``inventory``."""
+    for element in soup.find_all(True):
+        if element.name == 'img':
+            image = inventory.add(element.get('src') or '', 'img_tag')
+            hints = _hint_text(element)
+            if image is not None:
+                image.alt_texts.append(element.get('alt'))
+                image.declared_width = image.declared_width or _int_attr(element.get('width'))
+                image.declared_height = image.declared_height or _int_attr(element.get('height'))
+                _classify_by_hints(image, hints)
+            for url in _srcset_urls(element.get('srcset', '')):
+                candidate = inventory.add(url, 'srcset')
+                if candidate is not None:
+                    _classify_by_hints(candidate, hints)
+        elif element.name == 'source' and element.parent is not None and element.parent.name == 'picture':
+            hints = _hint_text(element.parent)
+            for url in _srcset_urls(element.get('srcset', '')):
+                candidate = inventory.add(url, 'picture_source')
+                if candidate is not None:
+                    _classify_by_hints(candidate, hints)
+        style = element.get('style')
+        if style:
+            declarations, _ = parse_declarations(style)
+            for url in background_image_urls(declarations):
+                image = inventory.add(url, 'background_image')
+                if image is not None:
+                    image.roles.add('background')
+                    _classify_by_hints(image, _hint_text(element))
+
+    for url, href, selector in stylesheet_backgrounds:
+        base = href or inventory.url
+        image = inventory.add(url if url.startswith('data:') else urljoin(base, url), 'stylesheet_background')
+        if image is not None:
+            image.roles.add('background')
+            _classify_by_hints(image, selector.lower())
+
+
+def _classify_by_hints(image: InventoryImage, hints: str) -> None:
+    if any(hint in hints for hint in BANNER_HINTS):
+        image.roles.add('banner')
+    elif any(hint in hints for hint in THUMBNAIL_HINTS):
+        image.roles.add('thumbnail')
+
+
+def _classify_by_geometry(image: InventoryImage) -> None:
+    width, height = image.display_width, image.display_height
+    if not width:
+        return
+    if width >= BANNER_MIN_WIDTH:
+        image.roles.add('banner')
+        image.roles.discard('thumbnail')
+    elif 'banner' not in image.roles and height and max(width, height) <= THUMBNAIL_MAX_DIMENSION:
+        image.roles.add('thumbnail')
+
+
+def with_render_snapshot(inventory: ImageInventory, snapshot: RenderSnapshot) -> ImageInventory:
+    """
+    A copy of ``inventory`` with rendered sizes (and any natural size the
+    header probe missed) from a render snapshot; the cached inventory is left as is.
+    """
+    inventory = copy.deepcopy(inventory)
+    inventory.rendered = True
+    for rendered in snapshot.images:
+        image = inventory.images.get(rendered.get('src') or '')
+        if image is None:
+            continue
+        image.natural_width = image.natural_width or rendered.get('width')
+        image.natural_height = image.natural_height or rendered.get('height')
+        image.rendered_width = rendered.get('rendered_width') or image.rendered_width
+        image.rendered_height = rendered.get('rendered_height') or image.rendered_height
+    return inventory
+
+
+async def build_image_inventory(url: str) -> ImageInventory:
+    """Collect and probe every image on ``url``."""
+    page = await get_page(url)
+    page.raise_for_status()
+    # Role hints come from the containers around an image, so this needs the full tree
+    soup = page.soup
+    index = await load_stylesheet_index(soup, page.url)
+    inventory = ImageInventory(page.url)
+    collect_images(soup, inventory, index.background_images)
+
+    remote = []
+    for image in inventory.images.values():
+        if image.url.startswith('data:'):
+            try:
+                image.size_bytes, image.content_type, payload = _data_uri_info(image.url)
+                image.set_header(*parse_image_header(payload)[:3])
+            except ValueError as e:
+                image.error = f'invalid data URI: {e}'
+        else:
+            remote.append(image.url)
+    probes = await probe_image_headers(remote, headers=IMAGE_SIZE_HEADERS)
+    for image_url in remote:
+        image = inventory.images[image_url]
+        probe = probes.get(image_url, {'error': 'not probed'})
+        if 'error' in probe:
+            image.error = probe['error']
+        elif not probe['size_bytes']:
+            # A chunked response without Content-Length / Content-Range gives no size
+            image.error = 'size unknown: no Content-Length or Content-Range'
+            image.content_type = probe.get('content_type', '')
+            image.set_header(probe['format'], probe['width'], probe['height'])
+        else:
+            image.size_bytes = probe['size_bytes']
+            image.content_type = probe.get('content_type', '')
+            image.set_header(probe['format'], probe['width'], probe['height'])
+
+    for image in inventory.images.values():
+        _classify_by_geometry(image)
+    return inventory
+
+
+image_inventory_cache = AsyncLRUCache(IMAGE_INVENTORY_TTL, IMAGE_INVENTORY_MAX_ENTRIES)
+
+
+async def get_image_inventory(url: str) -> ImageInventory:
+    """Return the image inventory for ``url``, building and probing it at most once per TTL."""
+    key = normalize_url(url)
+    return await image_inventory_cache.get_or_fetch(key, lambda: build_image_inventory(key))
+
+
+def evaluate_size_limit(inventory: ImageInventory, guideline_id: int) -> Dict[str, Any]:
+    """Check the images a guideline covers against its size limit in IMAGE_SIZE_LIMITS."""
+    role, limit = IMAGE_SIZE_LIMITS[guideline_id]
+    images = inventory.with_role(role)
+    details = []
+    oversized = unverified = 0
+    for image in images:
+        entry = image.as_dict()
+        if image.size_bytes:
+            entry['within_limit'] = image.size_bytes <= limit
+            oversized += not entry['within_limit']
+        else:
+            # The probe failed or found no size; the image may or may not be within the limit
+            unverified += 1
+        details.append(entry)
+    kind = f'{role} images' if role else 'images'
+    limit_label = f'{limit // (1024 * 1024)} MB' if limit >= 1024 * 1024 else f'{limit // 1024} KB'
+    if oversized:
+        message = f'{oversized} of {len(images)} {kind} exceed {limit_label}.'
+    elif unverified:
+        message = f'No {kind} measured exceed {limit_label}.'
+    else:
+        message = f'All {len(images)} {kind} are within {limit_label}.'
+    if unverified:
+        message += f' {unverified} of {len(images)} could not be measured.'
+    return {
+        'success': oversized == 0 and unverified == 0,
+        'message': message,
+        'limit_bytes': limit,
+        'total_images': len(inventory.images),
+        'checked_images': len(images),
+        'oversized_images': oversized,
+        'unverified_images': unverified,
+        'details': details,
+    }
@@ -0,0 +1,275 @@
+"""Vectorized NumPy kernels for the screenshot-based verify endpoints."""
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Pixels are packed and counted this many at a time, so temporaries stay
+# bounded by the chunk rather than the frame
+HISTOGRAM_CHUNK_PIXELS = 1 << 20
+
+
+def pack_rgb(pixels: np.ndarray) -> np.ndarray:
+    """Pack an (..., 3) uint8 RGB array into a flat uint32 array of 0xRRGGBB values."""
+    flat = np.ascontiguousarray(pixels, dtype=np.uint8).reshape(-1, 3)
+    packed = flat[:, 0].astype(np.uint32) << 16
+    packed |= flat[:, 1].astype(np.uint32) << 8
+    packed |= flat[:, 2]
+    return packed
+
+
+def unpack_rgb(packed: np.ndarray) -> np.ndarray:
+    """Inverse of ``pack_rgb``: uint32 0xRRGGBB values to an (N, 3) uint8 array."""
+    packed = np.asarray(packed, dtype=np.uint32)
+    return np.stack([(packed >> 16) & 0xFF, (packed >> 8) & 0xFF, packed & 0xFF], axis=-1).astype(np.uint8)
+
+
+def rgb_to_hex(rgb) -> str:
+    """Format an RGB triple as an upper-case ``#RRGGBB`` string."""
+    return ('#%02x%02x%02x' % tuple(int(x) for x in rgb)).upper()
+
+
+def color_histogram(pixels: np.ndarray, mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Distinct colours of an (..., 3) RGB array as packed 0xRRGGBB values, with
+    their pixel counts. ``mask`` selects the pixels to count and must match
+    the array's leading dimensions.
+    """
+    pixels = np.asarray(pixels)
+    if mask is not None:
+        pixels = pixels[mask]
+    flat = pixels.reshape(-1, 3)
+    if flat.shape[0] <= HISTOGRAM_CHUNK_PIXELS:
+        return np.unique(pack_rgb(flat), return_counts=True)
+    # Per-chunk histograms, merged over their (far fewer) distinct colours
+    chunks = [np.unique(pack_rgb(flat[start:start + HISTOGRAM_CHUNK_PIXELS]), return_counts=True)
+              for start in range(0, flat.shape[0], HISTOGRAM_CHUNK_PIXELS)]
+    colors, merged = np.unique(np.concatenate([c for c, _ in chunks]), return_inverse=True)
+    counts = np.bincount(merged, weights=np.concatenate([n for _, n in chunks]), minlength=colors.size)
+    return colors, counts.astype(np.int64)
+
+
+def top_colors(colors: np.ndarray, counts: np.ndarray, top_k: int = 1) -> List[Tuple[Tuple[int, int, int], int]]:
+    """The ``top_k`` most frequent entries of a ``color_histogram``, most frequent first."""
+    if counts.size == 0:
+        return []
+    k = min(top_k, counts.size)
+    if k == 1:
+        top = np.array([np.argmax(counts)])
+    else:
+        top = np.argpartition(counts, -k)[-k:]
+        top = top[np.argsort(-counts[top], kind='stable')]
+    return [(tuple(int(c) for c in rgb), int(count))
+            for rgb, count in zip(unpack_rgb(colors[top]), counts[top])]
+
+
+def dominant_colors(pixels: np.ndarray, mask: Optional[np.ndarray] = None,
+                    top_k: int = 1) -> List[Tuple[Tuple[int, int, int], int]]:
+    """
+    Return the ``top_k`` most frequent colours of an (..., 3) RGB array as
+    ``[((r, g, b), count), ...]``, most frequent first. ``mask`` selects the
+    pixels to count and must match the array's leading dimensions.
+    """
+    return top_colors(*color_histogram(pixels, mask), top_k=top_k)
+
+
+def dominant_color(pixels: np.ndarray, mask: Optional[np.ndarray] = None) -> Optional[Tuple[int, int, int]]:
+    """Return the most frequent RGB colour, or None if no pixels are selected."""
+    top = dominant_colors(pixels, mask, top_k=1)
+    return top[0][0] if top else None
+
+
+def dark_pixel_mask(pixels: np.ndarray, threshold: int) -> np.ndarray:
+    """True where every channel of an (..., 3) array is at most ``threshold``."""
+    pixels = np.asarray(pixels)
+    # Element-wise across channels; a reduction over a length-3 axis is much slower
+    return np.maximum(np.maximum(pixels[..., 0], pixels[..., 1]), pixels[..., 2]) <= threshold
+
+
+def light_pixel_mask(pixels: np.ndarray, threshold: int) -> np.ndarray:
+    """True where every channel of an (..., 3) array is at least ``threshold``."""
+    pixels = np.asarray(pixels)
+    return np.minimum(np.minimum(pixels[..., 0], pixels[..., 1]), pixels[..., 2]) >= threshold
+
+
+def mask_fraction(mask: np.ndarray) -> float:
+    """Share of True values in ``mask``; 0 for an empty mask."""
+    return float(np.count_nonzero(mask)) / mask.size if mask.size else 0
+
+
+def _srgb_to_linear(values: np.ndarray) -> np.ndarray:
+    values = values / 255.0
+    return np.where(values <= 0.04045, values / 12.92, ((values + 0.055) / 1.055) ** 2.4)
+
+
+# sRGB companding is the costly part of a Lab conversion; for 8-bit input it is a table lookup
+SRGB_TO_LINEAR = _srgb_to_linear(np.arange(256, dtype=np.float64))
+SRGB_TO_LINEAR.flags.writeable = False
+
+# Linear sRGB to CIE XYZ, normalized to the D65 white point
+_RGB_TO_XYZ = np.array([
+    [0.4124564, 0.3575761, 0.1804375],
+    [0.2126729, 0.7151522, 0.0721750],
+    [0.0193339, 0.1191920, 0.9503041],
+]) / np.array([0.95047, 1.0, 1.08883])[:, None]
+
+
+def rgb_to_lab(pixels: np.ndarray) -> np.ndarray:
+    """Convert an (..., 3) sRGB array (0-255) to CIELAB (D65), as float64."""
+    pixels = np.asarray(pixels)
+    if pixels.dtype == np.uint8:
+        linear = SRGB_TO_LINEAR[pixels]
+    else:
+        linear = _srgb_to_linear(np.clip(pixels, 0, 255).astype(np.float64))
+    xyz = linear @ _RGB_TO_XYZ.T
+    f = np.where(xyz > (6 / 29) ** 3, np.cbrt(xyz), xyz / (3 * (6 / 29) ** 2) + 4 / 29)
+    lab = np.empty(f.shape, dtype=np.float64)
+    lab[..., 0] = 116 * f[..., 1] - 16
+    lab[..., 1] = 500 * (f[..., 0] - f[..., 1])
+    lab[..., 2] = 200 * (f[..., 1] - f[..., 2])
+    return lab
+
+
+def delta_e_cie76(lab1: np.ndarray, lab2: np.ndarray) -> np.ndarray:
+    """CIE76 colour difference (Euclidean distance in Lab); broadcasts over leading axes."""
+    diff = np.asarray(lab1) - np.asarray(lab2)
+    return np.sqrt(np.einsum('...i,...i->...', diff, diff))
+
+
+def delta_e_ciede2000(lab1: np.ndarray, lab2: np.ndarray) -> np.ndarray:
+    """CIEDE2000 colour difference (kL = kC = kH = 1); broadcasts over leading axes."""
+    lab1, lab2 = np.broadcast_arrays(np.asarray(lab1, dtype=np.float64), np.asarray(lab2, dtype=np.float64))
+    L1, a1, b1 = lab1[..., 0], lab1[..., 1], lab1[..., 2]
+    L2, a2, b2 = lab2[..., 0], lab2[..., 1], lab2[..., 2]
+
+    C_mean = (np.hypot(a1, b1) + np.hypot(a2, b2)) / 2
+    C_mean7 = C_mean ** 7
+    G = 0.5 * (1 - np.sqrt(C_mean7 / (C_mean7 + 25.0 ** 7)))
+    a1p, a2p = a1 * (1 + G), a2 * (1 + G)
+    C1p, C2p = np.hypot(a1p, b1), np.hypot(a2p, b2)
+    h1p = np.degrees(np.arctan2(b1, a1p)) % 360
+    h2p = np.degrees(np.arctan2(b2, a2p)) % 360
+
+    dLp = L2 - L1
+    dCp = C2p - C1p
+    chroma_zero = (C1p * C2p) == 0
+    dhp = h2p - h1p
+    dhp = np.where(dhp > 180, dhp - 360, np.where(dhp < -180, dhp + 360, dhp))
+    dhp = np.where(chroma_zero, 0, dhp)
+    dHp = 2 * np.sqrt(C1p * C2p) * np.sin(np.radians(dhp) / 2)
+
+    Lp_mean = (L1 + L2) / 2
+    Cp_mean = (C1p + C2p) / 2
+    hp_sum = h1p + h2p
+    hp_mean = np.where(np.abs(h1p - h2p) > 180,
+                       np.where(hp_sum < 360, hp_sum + 360, hp_sum - 360), hp_sum) / 2
+    hp_mean = np.where(chroma_zero, hp_sum, hp_mean)
+
+    T = (1 - 0.17 * np.cos(np.radians(hp_mean - 30)) + 0.24 * np.cos(np.radians(2 * hp_mean))
+         + 0.32 * np.cos(np.radians(3 * hp_mean + 6)) - 0.20 * np.cos(np.radians(4 * hp_mean - 63)))
+    d_theta = 30 * np.exp(-(((hp_mean - 275) / 25) ** 2))
+    Cp_mean7 = Cp_mean ** 7
+    R_C = 2 * np.sqrt(Cp_mean7 / (Cp_mean7 + 25.0 ** 7))
+    S_L = 1 + (0.015 * (Lp_mean - 50) ** 2) / np.sqrt(20 + (Lp_mean - 50) ** 2)
+    S_C = 1 + 0.045 * Cp_mean
+    S_H = 1 + 0.015 * Cp_mean * T
+    R_T = -np.sin(np.radians(2 * d_theta)) * R_C
+
+    dL, dC, dH = dLp / S_L, dCp / S_C, dHp / S_H
+    return np.sqrt(dL ** 2 + dC ** 2 + dH ** 2 + R_T * dC * dH)
+
+
+DELTA_E = {
+    'cie76': delta_e_cie76,
+    'ciede2000': delta_e_ciede2000,
+}
+
+
+def match_histogram(colors: np.ndarray, counts: np.ndarray, targets: np.ndarray,
+                    tolerance: float, metric: str = 'ciede2000') -> Dict[str, Any]:
+    """
+    Classify a ``color_histogram`` against (T, 3) RGB target colours.
+
+    Each distinct colour is converted and compared once, so the cost depends on
+    the number of distinct colours rather than pixels. Returns the share of
+    pixels within ``tolerance`` (Delta E) of any target, the share per target,
+    and the Delta E of every distinct colour to its nearest target.
+    """
+    delta_e = DELTA_E[metric]
+    targets_lab = rgb_to_lab(np.asarray(targets, dtype=np.uint8).reshape(-1, 3))
+    total = int(counts.sum())
+    if total == 0:
+        return {'share': 0.0, 'target_shares': [0.0] * len(targets_lab),
+                'nearest': np.zeros(0, dtype=np.intp), 'delta_e': np.zeros(0)}
+
+    dist = delta_e(rgb_to_lab(unpack_rgb(colors))[:, None, :], targets_lab[None, :, :])
+    nearest = np.argmin(dist, axis=1)
+    nearest_de = dist[np.arange(dist.shape[0]), nearest]
+    within = nearest_de <= tolerance
+    per_target = np.bincount(nearest[within], weights=counts[within], minlength=len(targets_lab))
+    return {
+        'share': float(counts[within].sum()) / total,
+        'target_shares': [float(x) / total for x in per_target],
+        'nearest': nearest,
+        'delta_e': nearest_de,
+    }
+
+
+def quantized_histogram(pixels: np.ndarray, bits: int = 5) -> np.ndarray:
+    """
+    Histogram of an (..., 3) uint8 RGB array over a grid of ``bits`` bits per
+    channel, as a flat array of ``1 << 3 * bits`` counts. Histograms of
+    different strips of one image can simply be summed.
+    """
+    flat = np.asarray(pixels, dtype=np.uint8).reshape(-1, 3)
+    shift = 8 - bits
+    index = (flat[:, 0] >> shift).astype(np.intp) << (2 * bits)
+    index |= (flat[:, 1] >> shift).astype(np.intp) << bits
+    index |= flat[:, 2] >> shift
+    return np.bincount(index, minlength=1 << (3 * bits))
+
+
+def histogram_bin_colors(bits: int = 5) -> np.ndarray:
+    """RGB centre of every bin of a ``quantized_histogram``, shape (1 << 3 * bits, 3)."""
+    index = np.arange(1 << (3 * bits))
+    mask = (1 << bits) - 1
+    levels = np.stack([(index >> (2 * bits)) & mask, (index >> bits) & mask, index & mask], axis=-1)
+    return ((levels << (8 - bits)) + (1 << (7 - bits))).astype(np.uint8)
+
+
+def median_cut(colors: np.ndarray, weights: np.ndarray, max_colors: int) -> List[Tuple[np.ndarray, float]]:
+    """
+    Weighted median-cut quantization of (N, 3) colours.
+
+    Repeatedly splits the box with the largest (channel range x weight) at the
+    weighted median of its widest channel. Returns up to ``max_colors``
+    ``(mean_rgb, weight)`` pairs, heaviest first.
+    """
+    colors = np.asarray(colors, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64)
+    boxes = [np.flatnonzero(weights > 0)]
+    if boxes[0].size == 0:
+        return []
+
+    while len(boxes) < max_colors:
+        best, best_score, best_channel = -1, 0.0, 0
+        for i, idx in enumerate(boxes):
+            if idx.size < 2:
+                continue
+            box = colors[idx]
+            ranges = box.max(axis=0) - box.min(axis=0)
+            score = ranges.max() * weights[idx].sum()
+            if score > best_score:
+                best, best_score, best_channel = i, score, int(np.argmax(ranges))
+        if best < 0:
+            break
+        idx = boxes[best]
+        order = idx[np.argsort(colors[idx, best_channel], kind='stable')]
+        cumulative = np.cumsum(weights[order])
+        cut = int(np.searchsorted(cumulative, cumulative[-1] / 2)) + 1
+        cut = min(max(cut, 1), order.size - 1)
+        boxes[best] = order[:cut]
+        boxes.append(order[cut:])
+
+    clusters = [(np.average(colors[idx], axis=0, weights=weights[idx]), float(weights[idx].sum())) for idx in boxes]
+    clusters.sort(key=lambda c: -c[1])
+    return clusters
@@ -0,0 +1,239 @@
+"""
+Wasted-byte analysis for guideline 56 (images are optimized).
+
+Images from the page's inventory are downloaded concurrently and compared,
+in bytes per pixel, against the size they are displayed at. A worker
+process (image_pool) estimates what resizing to that size and re-encoding
+as WebP or JPEG would save. Estimates are cached by image URL and display
+size and revalidated with the image's ETag / Last-Modified, so repeat
+audits skip unchanged images.
+"""
+import asyncio
+import io
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+import numpy as np
+from PIL import Image
+
+from fetcher import AsyncLRUCache, http_client, normalize_url
+from image_analysis import estimate_reencode_sizes
+from image_inventory import IMAGE_SIZE_HEADERS, InventoryImage, get_image_inventory, with_render_snapshot
+from image_pool import image_pool
+from render_snapshot import render_snapshot_cache
+
+logger = logging.getLogger(__name__)
+
+# Analysis settings, overridable through the environment
+IMAGE_ANALYSIS_FRESH_SECONDS = float(os.getenv('DBIM_IMAGE_ANALYSIS_FRESH_SECONDS', '300'))
+IMAGE_ANALYSIS_CACHE_TTL = float(os.getenv('DBIM_IMAGE_ANALYSIS_CACHE_TTL', str(24 * 60 * 60)))
+IMAGE_ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv('DBIM_IMAGE_ANALYSIS_CACHE_MAX_ENTRIES', '2048'))
+IMAGE_ANALYSIS_MAX_BYTES = int(os.getenv('DBIM_IMAGE_ANALYSIS_MAX_BYTES', str(10 * 1024 * 1024)))
+IMAGE_ANALYSIS_MAX_PIXELS = int(os.getenv('DBIM_IMAGE_ANALYSIS_MAX_PIXELS', str(40_000_000)))
+IMAGE_ANALYSIS_MAX_IMAGES = int(os.getenv('DBIM_IMAGE_ANALYSIS_MAX_IMAGES', '60'))
+IMAGE_ANALYSIS_CONCURRENCY = int(os.getenv('DBIM_IMAGE_ANALYSIS_CONCURRENCY', '8'))
+IMAGE_ANALYSIS_TIMEOUT = float(os.getenv('DBIM_IMAGE_ANALYSIS_TIMEOUT', '20'))
+# Images may be up to this many times their CSS size before resizing counts as waste
+IMAGE_DEVICE_PIXEL_RATIO = float(os.getenv('DBIM_IMAGE_DEVICE_PIXEL_RATIO', '2'))
+# An image fails the check when it could shed at least this many bytes
+IMAGE_WASTE_MIN_BYTES = int(os.getenv('DBIM_IMAGE_WASTE_MIN_BYTES', str(20 * 1024)))
+IMAGE_REPORT_LIMIT = 20
+
+# Raster formats Pillow can decode and that re-encoding can meaningfully shrink
+ANALYZABLE_FORMATS = {'jpeg', 'png', 'webp', 'bmp', 'tiff'}
+
+
+class CachedImageAnalysis:
+    """A re-encode estimate and the validators needed to revalidate its image."""
+
+    def __init__(self, url: str, result: Dict[str, Any], etag: Optional[str], last_modified: Optional[str]):
+        self.url = url
+        self.result = result
+        self.etag = etag
+        self.last_modified = last_modified
+        self.validated_at = time.monotonic()
+
+    @property
+    def fresh(self) -> bool:
+        return time.monotonic() - self.validated_at < IMAGE_ANALYSIS_FRESH_SECONDS
+
+    def validators(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+def decode_for_reencode(data: bytes, target: Tuple[int, int]) -> np.ndarray:
+    """
+    Decode a downloaded image for re-encoding: RGBA when it has
+    transparency, RGB otherwise. JPEGs are decoded at the smallest DCT
+    scale that still covers ``target``.
+    """
+    image = Image.open(io.BytesIO(data))
+    if image.width * image.height > IMAGE_ANALYSIS_MAX_PIXELS:
+        raise ValueError(f"image larger than {IMAGE_ANALYSIS_MAX_PIXELS} pixels")
+    has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+    if image.format == 'JPEG':
+        image.draft('RGB', target)
+    return np.asarray(image.convert('RGBA' if has_alpha else 'RGB'))
+
+
+class ImageAnalysisCache(AsyncLRUCache):
+    """Shared cache of re-encode estimates keyed by image URL and target size."""
+
+    def __init__(self):
+        super().__init__(IMAGE_ANALYSIS_CACHE_TTL, IMAGE_ANALYSIS_CACHE_MAX_ENTRIES)
+        self.revalidated = 0
+
+    async def _analyze(self, url: str, target: Tuple[int, int],
+                       stale: Optional[CachedImageAnalysis]) -> CachedImageAnalysis:
+        headers = {**IMAGE_SIZE_HEADERS, **(stale.validators() if stale is not None else {})}
+        try:
+            async with http_client.stream('GET', url, headers=headers, timeout=IMAGE_ANALYSIS_TIMEOUT) as response:
+                if response.status_code == 304 and stale is not None:
+                    self.revalidated += 1
+                    stale.validated_at = time.monotonic()
+                    stale.etag = response.headers.get('etag', stale.etag)
+                    stale.last_modified = response.headers.get('last-modified', stale.last_modified)
+                    return stale
+                response.raise_for_status()
+                chunks: List[bytes] = []
+                received = 0
+                async for chunk in response.aiter_bytes():
+                    received += len(chunk)
+                    if received > IMAGE_ANALYSIS_MAX_BYTES:
+                        raise ValueError(f"image larger than {IMAGE_ANALYSIS_MAX_BYTES} bytes")
+                    chunks.append(chunk)
+                etag = response.headers.get('etag')
+                last_modified = response.headers.get('last-modified')
+        except (httpx.HTTPError, ValueError):
+            if stale is not None:
+                logger.warning(f"Revalidating image {url} failed; using the cached estimate")
+                return stale
+            raise
+        data = b''.join(chunks)
+        frame = await asyncio.to_thread(decode_for_reencode, data, target)
+        result = await image_pool.run(estimate_reencode_sizes, frame,
+                                      target_width=target[0], target_height=target[1])
+        result['size_bytes'] = len(data)
+        return CachedImageAnalysis(url, result, etag, last_modified)
+
+    async def get(self, url: str, target: Tuple[int, int]) -> Dict[str, Any]:
+        """Return the re-encode estimate for ``url`` at ``target``, revalidating a stale one."""
+        key = (url, target)
+        entry = self.peek(key)
+        if entry is not None and entry.fresh:
+            self.hits += 1
+            return entry.result
+        if entry is not None:
+            self.discard(key)
+        return (await self.get_or_fetch(key, lambda: self._analyze(url, target, entry))).result
+
+    def stats(self) -> Dict[str, int]:
+        stats = super().stats()
+        stats['revalidated'] = self.revalidated
+        return stats
+
+
+image_analysis_cache = ImageAnalysisCache()
+
+
+def display_target(image: InventoryImage) -> Tuple[int, int]:
+    """
+    The largest size the image needs: its display size (rendered, else
+    declared) times IMAGE_DEVICE_PIXEL_RATIO, never more than its natural size.
+    """
+    width, height = image.natural_width, image.natural_height
+    display_width = image.rendered_width or image.declared_width
+    display_height = image.rendered_height or image.declared_height
+    scales = [shown * IMAGE_DEVICE_PIXEL_RATIO / natural
+              for shown, natural in ((display_width, width), (display_height, height)) if shown]
+    scale = min(1.0, max(scales)) if scales else 1.0
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+async def _evaluate(image: InventoryImage, limit: asyncio.Semaphore) -> Dict[str, Any]:
+    target = display_target(image)
+    entry: Dict[str, Any] = {
+        'src': image.url[:100] + ('...' if len(image.url) > 100 else ''),
+        'format': image.format,
+        'width': image.natural_width,
+        'height': image.natural_height,
+        'size_bytes': image.size_bytes,
+        'bytes_per_pixel': round(image.size_bytes / (image.natural_width * image.natural_height), 3),
+    }
+    display_width = image.rendered_width or image.declared_width
+    display_height = image.rendered_height or image.declared_height
+    if display_width and display_height:
+        entry['display_width'] = round(display_width)
+        entry['display_height'] = round(display_height)
+        entry['bytes_per_display_pixel'] = round(image.size_bytes / (display_width * display_height), 3)
+    try:
+        async with limit:
+            estimate = await image_analysis_cache.get(image.url, target)
+    except Exception as e:
+        return {**entry, 'error': str(e), 'wasted_bytes': 0}
+    size = estimate['size_bytes']
+    options = {image.format: size}
+    for name in ('webp', 'jpeg'):
+        if f'{name}_bytes' in estimate:
+            options[name] = min(options.get(name, size), estimate[f'{name}_bytes'])
+    best_format = min(options, key=options.get)
+    wasted = size - options[best_format]
+    return {
+        **entry,
+        'size_bytes': size,
+        'target_width': target[0],
+        'target_height': target[1],
+        'webp_bytes': estimate.get('webp_bytes'),
+        'jpeg_bytes': estimate.get('jpeg_bytes'),
+        'best_format': best_format,
+        'wasted_bytes': wasted,
+        'wasted_percent': round(100 * wasted / size, 1) if size else 0.0,
+    }
+
+
+async def analyze_image_optimization(url: str) -> Dict[str, Any]:
+    """Rank the page's images by the bytes that resizing and re-encoding would save."""
+    inventory = await get_image_inventory(url)
+    try:
+        # Use rendered sizes when a render of this page is cached or already loading
+        snapshot = await render_snapshot_cache.join(normalize_url(url))
+        if snapshot is not None:
+            inventory = with_render_snapshot(inventory, snapshot)
+    except Exception as e:
+        logger.warning(f"Render snapshot unavailable for {url}; using declared image sizes: {e}")
+
+    # Inline data: images have no URL to download; they count as skipped
+    candidates = [image for image in inventory.images.values()
+                  if image.error is None and not image.url.startswith('data:')
+                  and image.format in ANALYZABLE_FORMATS
+                  and image.natural_width and image.natural_height and image.size_bytes]
+    candidates.sort(key=lambda image: image.size_bytes, reverse=True)
+    analyzed = candidates[:IMAGE_ANALYSIS_MAX_IMAGES]
+    limit = asyncio.Semaphore(IMAGE_ANALYSIS_CONCURRENCY)
+    results = await asyncio.gather(*(_evaluate(image, limit) for image in analyzed))
+    results.sort(key=lambda r: r['wasted_bytes'], reverse=True)
+
+    wasteful = [r for r in results if r['wasted_bytes'] >= IMAGE_WASTE_MIN_BYTES]
+    total_wasted = sum(r['wasted_bytes'] for r in results)
+    if wasteful:
+        message = (f"{len(wasteful)} of {len(results)} images could save "
+                   f"{round(total_wasted / 1024)} KB by resizing or re-encoding.")
+    else:
+        message = "All images appear optimized."
+    return {
+        'success': not wasteful,
+        'message': message,
+        'image_count': len(results),
+        'skipped_images': len(inventory.images) - len(analyzed),
+        'total_bytes': sum(r['size_bytes'] or 0 for r in results),
+        'total_wasted_bytes': total_wasted,
+        'images': results[:IMAGE_REPORT_LIMIT],
+    }
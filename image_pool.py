@@ -0,0 +1,179 @@
+"""
+Process pool for CPU-bound image analysis.
+
+Decoded frames are copied once into shared memory; workers attach to the
+segment and wrap it in a NumPy view, so the pixel data is never pickled.
+Only the kernel name, the segment name and the small result cross the
+process boundary.
+"""
+import asyncio
+import io
+import logging
+import math
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Worker settings, overridable through the environment; 0 workers runs kernels in a thread
+IMAGE_WORKERS = int(os.getenv('DBIM_IMAGE_WORKERS', str(min(4, os.cpu_count() or 1))))
+IMAGE_QUEUE_LIMIT = int(os.getenv('DBIM_IMAGE_QUEUE_LIMIT', str(max(1, IMAGE_WORKERS) * 4)))
+# Images claiming more pixels than this are refused before decoding (decompression bombs)
+MAX_DECODE_PIXELS = int(os.getenv('DBIM_MAX_DECODE_PIXELS', str(80_000_000)))
+
+
+class ImageTooLarge(ValueError):
+    """An image with more bytes or pixels than the service will decode."""
+
+
+def working_size(width: int, height: int, max_pixels: int) -> Tuple[int, int]:
+    """``width`` x ``height`` scaled down, keeping the aspect ratio, to at most ``max_pixels``."""
+    if width * height <= max_pixels:
+        return width, height
+    scale = math.sqrt(max_pixels / (width * height))
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+def decode_image(image_bytes: bytes, max_pixels: Optional[int] = None) -> np.ndarray:
+    """
+    Decode image bytes into an (H, W, 3) uint8 RGB array. The pixel count
+    is read from the header and checked against MAX_DECODE_PIXELS before
+    anything is decoded. With ``max_pixels`` the frame is brought down to
+    at most that many pixels: JPEGs decode at a reduced DCT scale (draft
+    mode), and what is still too large is subsampled nearest-neighbour,
+    which keeps flat UI colours exact.
+    """
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        width, height = image.size
+        if width * height > MAX_DECODE_PIXELS:
+            raise ImageTooLarge(f"image is {width}x{height}, more than {MAX_DECODE_PIXELS} pixels")
+        if max_pixels is None or width * height <= max_pixels:
+            return np.asarray(image.convert('RGB'))
+        size = working_size(width, height, max_pixels)
+        if image.format == 'JPEG':
+            image.draft('RGB', size)
+        frame = image.convert('RGB')
+        if frame.width * frame.height > max_pixels:
+            frame = frame.resize(size, Image.NEAREST)
+        return np.asarray(frame)
+
+
+def _attach_untracked(name: str) -> shared_memory.SharedMemory:
+    """Attach to a segment owned by the parent without registering it for cleanup here."""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args, **kwargs: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+def _run_on_shared_frame(kernel: Callable[..., Any], name: str, shape: Tuple[int, ...],
+                         dtype: str, kwargs: Dict[str, Any]) -> Any:
+    """Worker entry point: view the shared frame and run ``kernel`` on it."""
+    shm = _attach_untracked(name)
+    try:
+        frame = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        frame.flags.writeable = False
+        result = kernel(frame, **kwargs)
+        del frame
+        return result
+    finally:
+        shm.close()
+
+
+def _free_shared(shm: shared_memory.SharedMemory) -> None:
+    shm.close()
+    shm.unlink()
+
+
+class ImageWorkerPool:
+    """
+    Managed process pool for image kernels with a bound on queued work.
+    Submissions beyond ``queue_limit`` wait, keeping memory use bounded.
+    """
+
+    def __init__(self, workers: int = IMAGE_WORKERS, queue_limit: int = IMAGE_QUEUE_LIMIT):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.pending = 0
+        self.completed = 0
+
+    def _bind_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._slots = asyncio.Semaphore(self.queue_limit)
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn keeps workers free of the parent's event loop and threads
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+        return self._executor
+
+    async def decode(self, image_bytes: bytes, max_pixels: Optional[int] = None) -> np.ndarray:
+        """Decode an upload in a thread so the event loop stays responsive."""
+        return await asyncio.to_thread(decode_image, image_bytes, max_pixels)
+
+    async def run(self, kernel: Callable[..., Any], frame: np.ndarray, **kwargs) -> Any:
+        """Run ``kernel(frame, **kwargs)`` in a worker process and return its result."""
+        self._bind_loop()
+        async with self._slots:
+            self.pending += 1
+            try:
+                if self.workers <= 0:
+                    return await asyncio.to_thread(kernel, frame, **kwargs)
+                return await self._run_shared(kernel, np.ascontiguousarray(frame), kwargs)
+            finally:
+                self.pending -= 1
+                self.completed += 1
+
+    async def _run_shared(self, kernel: Callable[..., Any], frame: np.ndarray, kwargs: Dict[str, Any]) -> Any:
+        shm = shared_memory.SharedMemory(create=True, size=max(1, frame.nbytes))
+        future = None
+        try:
+            np.ndarray(frame.shape, dtype=frame.dtype, buffer=shm.buf)[...] = frame
+            future = self.executor.submit(_run_on_shared_frame, kernel, shm.name, frame.shape, frame.dtype.str, kwargs)
+            return await asyncio.wrap_future(future, loop=self._loop)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM); start a fresh pool for the next request
+            logger.error("Image worker pool broke; restarting it")
+            self.shutdown()
+            raise
+        finally:
+            if future is None or future.done() or future.cancel():
+                _free_shared(shm)
+            else:
+                # Cancelled while a worker is still reading the frame: free it when the worker is done
+                future.add_done_callback(lambda _: _free_shared(shm))
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'workers': self.workers,
+            'queue_limit': self.queue_limit,
+            'pending': self.pending,
+            'completed': self.completed,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+image_pool = ImageWorkerPool()
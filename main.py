@@ -1,5 +1,5 @@
 import uvicorn
-import requests
+import httpx
 from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
@@ -9,15 +9,16 @@ from pydantic import BaseModel, HttpUrl
 from typing import List, Dict, Optional, Any, Tuple
 from pathlib import Path
 from bs4 import BeautifulSoup
+import os
 import re
 import logging
+from functools import partial
 
 from testcases import dbim_checklist
-from fastapi import File, UploadFile
+from fastapi import File, Form, UploadFile
 from PIL import Image
 import io
 import numpy as np
-from collections import Counter
 from datetime import datetime
 from utils import GOVERNMENT_COLOR_GROUPS,DARKEST_TONE_LIST
 
@@ -30,8 +31,47 @@ from utils import (
     get_footer_background_color,
     get_button_elements,
     get_button_background_color,
-    is_color_in_palette
+    is_color_in_palette,
+    nearest_palette_colors,
+    closest_palette_group,
+    PALETTE_INDEX
+)
+from fetcher import AsyncLRUCache, get_page, http_client
+from browser_pool import browser_pool
+from render_snapshot import DESKTOP_VIEWPORT, NAVIGATION_TIMEOUT_MS, get_render_snapshot
+from audit import AuditCheck, run_audit
+from image_pool import ImageTooLarge, image_pool
+from upload_cache import upload_cache
+from upload_ingest import UPLOAD_MAX_REQUEST_BYTES, read_upload
+from stylesheets import load_stylesheet_index, stylesheet_cache
+from image_inventory import evaluate_size_limit, get_image_inventory, img_alt_texts
+from image_optimization import analyze_image_optimization, image_analysis_cache
+from screenshots import (
+    MAIN_CONTENT_SELECTORS,
+    PRIMARY_BACKGROUND_REGION,
+    SCREENSHOT_MAX_HEIGHT,
+    SCREENSHOT_TILE_HEIGHT,
+    central_clip,
+    element_clip,
+    iter_tiles,
+    page_size,
+)
+from image_analysis import (
+    COLOR_METRIC,
+    COLOR_TOLERANCE,
+    analyze_footer_color,
+    analyze_text_color,
+    analyze_marks,
+    CENSUS_MIN_SHARE,
+    census_histogram,
+    analyze_palette_census,
+    analyze_palette_census_frame,
+    count_white_pixels,
+    sample_logo_lockup,
+    sample_state_emblem,
+    sample_white_pixels,
 )
+from pixel_sampling import PIXEL_SAMPLING, SAMPLING_BATCH, SampledShare
 
 # Suppress BeautifulSoup warnings
 import warnings
@@ -58,85 +98,145 @@ async def log_requests(request: Request, call_next):
     logger.info(f"Response status: {response.status_code}")
     return response
 
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    """Refuse uploads whose declared size is over the limit before reading the body."""
+    length = request.headers.get("content-length")
+    if request.method == "POST" and length and length.isdigit() and int(length) > UPLOAD_MAX_REQUEST_BYTES:
+        logger.warning(f"Refused {length}-byte request to {request.url.path}")
+        return JSONResponse(status_code=413, content={"error": f"Request body is larger than {UPLOAD_MAX_REQUEST_BYTES} bytes"})
+    return await call_next(request)
+
+def upload_error(e: Exception) -> JSONResponse:
+    """Error response for an upload endpoint: 413 for oversized uploads, 400 otherwise."""
+    return JSONResponse(status_code=413 if isinstance(e, ImageTooLarge) else 400, content={"error": str(e)})
+
+@app.on_event("startup")
+async def start_browser_pool():
+    try:
+        await browser_pool.start()
+    except Exception as e:
+        # Browser checks will retry the launch on first use
+        logger.error(f"Could not pre-warm browser pool: {e}")
+
+@app.on_event("shutdown")
+async def close_shared_clients():
+    await http_client.aclose()
+    await browser_pool.close()
+    image_pool.shutdown()
+
 class VerificationResult(BaseModel):
     success: bool
     message: str
     timestamp: str
     details: Optional[Dict[str, Any]] = None
 
+class AuditResult(BaseModel):
+    audit_id: str
+    url: str
+    success: bool
+    message: str
+    timestamp: str
+    duration_ms: float
+    results: Dict[int, VerificationResult]
+    skipped: List[int]
+    resource_timings_ms: Dict[str, float]
+    check_timings_ms: Dict[int, float]
+
 # In-memory storage for verification results
 verification_results: Dict[int, VerificationResult] = {}
+# Per-audit verification results, keyed by audit id; the oldest are evicted
+# past AUDIT_RESULTS_MAX_ENTRIES or AUDIT_RESULTS_TTL seconds
+AUDIT_RESULTS_TTL = float(os.getenv('DBIM_AUDIT_RESULTS_TTL', str(24 * 60 * 60)))
+AUDIT_RESULTS_MAX_ENTRIES = int(os.getenv('DBIM_AUDIT_RESULTS_MAX_ENTRIES', '256'))
+audit_results = AsyncLRUCache(AUDIT_RESULTS_TTL, AUDIT_RESULTS_MAX_ENTRIES)
+
+async def rendered_element(url: str, name: str) -> Dict[str, Any]:
+    """An element-clipped capture (see render_snapshot.ELEMENT_CAPTURES) from the shared render of ``url``."""
+    snapshot = await get_render_snapshot(url)
+    element = snapshot.elements.get(name)
+    if element is None:
+        raise ValueError(f"No {name} was found on the page")
+    return element
+
+def sampling_note(sampling: Optional[Dict[str, Any]]) -> str:
+    """Confidence bounds of a sampled share, for the result message."""
+    if not sampling:
+        return ""
+    return (f" (sampled: {sampling['lower']*100:.0f}-{sampling['upper']*100:.0f}% "
+            f"at {sampling['confidence']*100:g}% confidence)")
+
+def with_capture_details(result: VerificationResult, element: Dict[str, Any]) -> VerificationResult:
+    result.details = {**(result.details or {}), "source": "capture",
+                      "selector": element["selector"], "clip": element["clip"]}
+    return result
 
 #testcase_4
+async def footer_color_result(image_bytes: bytes) -> VerificationResult:
+    # Most common color, matched to the darkest tones within a Delta E tolerance
+    # (in a worker process, unless cached)
+    analysis = await upload_cache.analyze(4, image_bytes, analyze_footer_color,
+                                          targets=tuple(DARKEST_TONE_LIST),
+                                          tolerance=COLOR_TOLERANCE, metric=COLOR_METRIC)
+    hex_color = analysis["hex"]
+    details = dict(analysis)
+    if analysis["within_tolerance"]:
+        return VerificationResult(
+            success=True,
+            message=f"Tone of the colour palette {hex_color} (matches {analysis['nearest_target']}, \u0394E {analysis['delta_e']})",
+            timestamp=datetime.utcnow().isoformat(),
+            details=details)
+    else:
+        return VerificationResult(
+            success=False,
+            message=f"Tone of the colour palette {hex_color} NOT matched with palette (nearest {analysis['nearest_target']}, \u0394E {analysis['delta_e']})",
+            timestamp=datetime.utcnow().isoformat(),
+            details=details
+)
+
 @app.post("/api/verify/footer-color", response_model=VerificationResult)
 async def verify_footer_color(file: UploadFile = File(...)):
     try:
-        image_bytes = await file.read()
-        img = Image.open(io.BytesIO(image_bytes)).convert('RGB')
-        arr = np.array(img)
-        # Flatten to a list of RGB tuples
-        pixels = arr.reshape(-1, 3)
-        # Count most common color
-        most_common = Counter(map(tuple, pixels)).most_common(1)[0][0]
-        most_common_list = [int(x) for x in most_common]
-        # Convert to hex
-        hex_color = '#%02x%02x%02x' % tuple(most_common_list)
-        hex_color = hex_color.upper()
-        if str(hex_color) in DARKEST_TONE_LIST:
-            # return {"rgb": most_common_list, "hex": hex_color}
-            return VerificationResult(
-                success=True,
-                message=f"Tone of the colour palette {hex_color}",
-                timestamp=datetime.utcnow().isoformat(),
-                details={"rgb": most_common_list, "hex": hex_color})
-        else:
-            return VerificationResult(
-                success=False,
-                message=f"Tone of the colour palette {hex_color} NOT matched with palette",
-                timestamp=datetime.utcnow().isoformat(),
-                details={"rgb": most_common_list, "hex": hex_color}
-)
+        image_bytes = await read_upload(file)
+        return await footer_color_result(image_bytes)
+    except Exception as e:
+        return upload_error(e)
+
+@app.get("/api/verify/footer-color", response_model=VerificationResult)
+async def verify_footer_color_url(url: str = Query(..., description="URL of the website to verify")):
+    """Footer colour (guideline 4) from the page's footer, captured in the shared render."""
+    try:
+        element = await rendered_element(url, "footer")
+        return with_capture_details(await footer_color_result(element["png"]), element)
     except Exception as e:
-        return JSONResponse(status_code=400, content={"error": str(e)}) 
+        return VerificationResult(success=False, message=f"Error capturing the footer: {str(e)}",
+                                  timestamp=get_timestamp(), details={"error": str(e)})
 
 #testcase_9
+REQUIRED_TEXT_COLOR = '#150202'
+
 @app.post("/api/verify/text-color", response_model=VerificationResult)
 async def verify_text_color(file: UploadFile = File(...)):
     try:
-        image_bytes = await file.read()
-        img = Image.open(io.BytesIO(image_bytes)).convert('RGB')
-        arr = np.array(img)
-        gray = np.dot(arr[...,:3], [0.299, 0.587, 0.114])  # Convert to grayscale
-        mean_gray = np.mean(gray)
-        # If mostly dark, look for light pixels (text); if mostly light, look for dark pixels (text)
-        if mean_gray < 128:
-            # Mostly dark background, look for light text
-            threshold = mean_gray + (255 - mean_gray) * 0.5  # Midway to white
-            mask = gray > threshold
-        else:
-            # Mostly light background, look for dark text
-            threshold = mean_gray * 0.5
-            mask = gray < threshold
-        text_pixels = arr[mask]
-        if len(text_pixels) == 0:
-            # fallback: just use the most common color
-            pixels = arr.reshape(-1, 3)
-            most_common = Counter(map(tuple, pixels)).most_common(1)[0][0]
-        else:
-            most_common = Counter(map(tuple, text_pixels)).most_common(1)[0][0]
-        most_common_list = [int(x) for x in most_common]
-        hex_color = '#%02x%02x%02x' % tuple(most_common_list)
-        hex_color = hex_color.upper()
-        target_color = '#150202'.upper()
-        is_match = (hex_color == target_color)
+        image_bytes = await read_upload(file)
+        # Most common text-like color, matched within a Delta E tolerance
+        # (in a worker process, unless cached)
+        analysis = await upload_cache.analyze(9, image_bytes, analyze_text_color,
+                                              targets=(REQUIRED_TEXT_COLOR,),
+                                              tolerance=COLOR_TOLERANCE, metric=COLOR_METRIC)
+        hex_color = analysis["hex"]
+        is_match = analysis["within_tolerance"]
+        share = round(analysis["share_within_tolerance"] * 100)
         return VerificationResult(
             success=is_match,
-            message=f"Detected text color: {hex_color}. {'Matches required color.' if is_match else 'Does NOT match required color #150202.'}",
+            message=(f"Detected text color: {hex_color}. "
+                     f"{'Matches required color.' if is_match else 'Does NOT match required color #150202.'} "
+                     f"(\u0394E {analysis['delta_e']}, {share}% of text pixels within tolerance)"),
             timestamp=datetime.utcnow().isoformat(),
-            details={"rgb": most_common_list, "hex": hex_color}
+            details=dict(analysis)
         )
     except Exception as e:
-        return JSONResponse(status_code=400, content={"error": str(e)})
+        return upload_error(e)
 
 # API Endpoints
 @app.get("/api/guidelines")
@@ -146,22 +246,93 @@ async def get_guidelines() -> List[Dict[str, Any]]:
         {"id": gid, "description": desc} for gid, desc in dbim_checklist.items()
     ]
 
+# Full-page captures for the palette census are taken this many CSS pixels at a
+# time, up to CENSUS_MAX_HEIGHT, so each decoded strip stays small
+CENSUS_CAPTURE_STRIP = 2000
+CENSUS_MAX_HEIGHT = int(os.getenv('DBIM_CENSUS_MAX_HEIGHT', '20000'))
+
+async def capture_census_histogram(url: str) -> Tuple[np.ndarray, int]:
+    """Screenshot ``url`` strip by strip and merge the strips' census histograms."""
+    histogram = None
+    async with browser_pool.page() as page:
+        await page.set_viewport_size(DESKTOP_VIEWPORT)
+        await page.goto(url, wait_until='networkidle', timeout=NAVIGATION_TIMEOUT_MS)
+        height = min((await page_size(page))[1], CENSUS_MAX_HEIGHT)
+        clip = {"x": 0, "y": 0, "width": DESKTOP_VIEWPORT["width"], "height": max(height, 1)}
+        # PNG keeps flat colours exact for the histogram
+        async for strip in iter_tiles(page, clip, image_type="png", tile_height=CENSUS_CAPTURE_STRIP,
+                                      max_height=CENSUS_MAX_HEIGHT):
+            partial_histogram = await image_pool.run(census_histogram, strip)
+            histogram = partial_histogram if histogram is None else histogram + partial_histogram
+    return histogram, height
+
+def palette_census_result(analysis: Dict[str, Any], source: str) -> VerificationResult:
+    """Build the guideline 1 result from a palette census."""
+    groups_used = analysis["groups_used"]
+    if not groups_used:
+        success, status = False, "no_palette_colors"
+        message = "No colours from the government palette were found"
+    elif len(groups_used) == 1:
+        success, status = True, "valid"
+        message = f"Only one colour palette is used: {groups_used[0]}"
+    else:
+        success, status = False, "multiple_palettes"
+        message = f"{len(groups_used)} colour palettes are used: {', '.join(groups_used)}"
+    if analysis["off_palette_share"] >= CENSUS_MIN_SHARE:
+        message += f" ({round(analysis['off_palette_share'] * 100)}% of flat colours are off-palette)"
+    details = dict(analysis)
+    details.update({
+        "colors": [c["hex"] for c in analysis["clusters"]],
+        "source": source,
+        "status": status,
+    })
+    return VerificationResult(success=success, message=message, timestamp=get_timestamp(), details=details)
+
+def census_options() -> Dict[str, Any]:
+    return {"palette": PALETTE_INDEX.hexes, "groups": PALETTE_INDEX.groups}
+
 @app.get("/api/verify/color-palette-selection", response_model=VerificationResult)
-async def verify_color_palette_selection():
-    """Verify color palette selection guideline"""
-    result = VerificationResult(
-        success=True,
-        message="Color palette selection verified successfully",
-        timestamp=get_timestamp(),
-        details={
-            "colors": ["#0056b3", "#1a6bc4", "#3381d6", "#4d97e8", "#66adfa"],
-            "gradients": 5,
-            "status": "valid"
-        }
-    )
+async def verify_color_palette_selection(url: Optional[str] = Query(None, description="URL of the website to verify")):
+    """
+    Verify color palette selection guideline: capture the full page, quantize
+    its colours and check that only one palette group is used.
+    """
+    if not url:
+        result = VerificationResult(
+            success=False,
+            message="Provide a URL, or upload a screenshot, to run the palette census",
+            timestamp=get_timestamp(),
+            details={"status": "input_required"}
+        )
+        verification_results[1] = result
+        return result
+    try:
+        histogram, height = await capture_census_histogram(url)
+        analysis = await image_pool.run(analyze_palette_census, histogram, **census_options())
+        result = palette_census_result(analysis, source="capture")
+        result.details["captured_height"] = height
+    except Exception as e:
+        result = VerificationResult(
+            success=False,
+            message=f"Error capturing the page for the palette census: {str(e)}",
+            timestamp=get_timestamp(),
+            details={"status": "error", "error": str(e)}
+        )
     verification_results[1] = result
     return result
 
+@app.post("/api/verify/color-palette-selection", response_model=VerificationResult)
+async def verify_color_palette_selection_upload(file: UploadFile = File(...)):
+    """Palette census (guideline 1) for an uploaded full-page screenshot."""
+    try:
+        image_bytes = await read_upload(file)
+        analysis = await upload_cache.analyze(1, image_bytes, analyze_palette_census_frame, **census_options())
+        result = palette_census_result(analysis, source="upload")
+        verification_results[1] = result
+        return result
+    except Exception as e:
+        return upload_error(e)
+
 @app.get("/api/verify/government-entity-color", response_model=VerificationResult)
 async def verify_government_entity_color():
     """Verify government entity color guideline"""
@@ -205,18 +376,13 @@ async def verify_cta_buttons(url: str = Query(..., description="URL of the websi
         VerificationResult with details about CTA button colors
     """
     try:
-        # Fetch the webpage
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        if not url.startswith(('http://', 'https://')):
-            url = 'https://' + url
-            
-        response = requests.get(url, headers=headers, timeout=15, allow_redirects=True)
-        response.raise_for_status()
+        # Fetch the webpage (shared with the other URL-based checks)
+        page = await get_page(url)
+        page.raise_for_status()
         
-        soup = BeautifulSoup(response.text, 'html.parser')
+        soup = page.soup
+        # Linked stylesheets are fetched (or revalidated from the shared cache) once per page
+        await load_stylesheet_index(soup, page.url)
         
         # Find all button-like elements
         buttons = get_button_elements(soup)
@@ -238,15 +404,17 @@ async def verify_cta_buttons(url: str = Query(..., description="URL of the websi
         invalid_buttons = []
         
         for button in buttons:
+            # Resolved once per button and memoized on the record
             color_info = get_button_background_color(button, soup)
-            # print("color_info: ", color_info)
             
             if color_info.get('status') != 'success':
                 # Skip buttons where we can't determine the color
+                button['is_valid'] = None
                 continue
                 
             color = color_info['color']
             is_valid = is_color_in_palette(color)
+            button['is_valid'] = is_valid
             
             result = {
                 'text': button['text'],
@@ -269,7 +437,7 @@ async def verify_cta_buttons(url: str = Query(..., description="URL of the websi
         # Prepare list of all found buttons with their details
         all_buttons = []
         for button in buttons:
-            color_info = get_button_background_color(button, soup)
+            color_info = button['color_info']
             button_info = {
                 'text': button['text'][:100] + ('...' if len(button['text']) > 100 else ''),
                 'element': button['element'],
@@ -278,7 +446,7 @@ async def verify_cta_buttons(url: str = Query(..., description="URL of the websi
                 'color_status': color_info.get('status', 'unknown'),
                 'color': color_info.get('color', None),
                 'source': color_info.get('source', 'unknown'),
-                'is_valid': is_color_in_palette(color_info.get('color', '')) if color_info.get('status') == 'success' else None
+                'is_valid': button['is_valid']
             }
             all_buttons.append(button_info)
         
@@ -323,7 +491,7 @@ async def verify_cta_buttons(url: str = Query(..., description="URL of the websi
         verification_results[5] = result
         return result
         
-    except requests.RequestException as e:
+    except httpx.HTTPError as e:
         return VerificationResult(
             success=False,
             message=f"Failed to fetch the webpage: {str(e)}",
@@ -362,19 +530,50 @@ async def verify_highlight_backgrounds():
     verification_results[6] = result
     return result
 
+# Used when no brand colours are supplied, so the check still demonstrates a match
+EXAMPLE_BRAND_COLORS = ("#0056b3", "#1a6bc4")
+
 @app.get("/api/verify/brand-color-consideration", response_model=VerificationResult)
-async def verify_brand_color_consideration():
-    """Verify brand color consideration guideline"""
-    result = VerificationResult(
-        success=True,
-        message="Brand color considerations are properly applied",
-        timestamp=get_timestamp(),
-        details={
-            "brand_colors": ["#0056b3", "#1a6bc4"],
-            "nearest_palette_match": "#0056b3",
-            "status": "match_found"
-        }
-    )
+async def verify_brand_color_consideration(
+        brand_colors: Optional[str] = Query(None, description="Comma-separated brand colours, e.g. #0056b3,#1a6bc4")):
+    """
+    Verify brand color consideration guideline: find the palette group closest
+    (lowest mean Delta E) to the entity's established brand colours.
+    """
+    try:
+        colors = [c.strip() for c in (brand_colors or '').split(',') if c.strip()]
+        source = "query"
+        if not colors:
+            colors = list(EXAMPLE_BRAND_COLORS)
+            source = "example"
+        colors = [c if c.startswith('#') else f'#{c}' for c in colors]
+
+        matches = nearest_palette_colors(colors)
+        closest = closest_palette_group(colors)
+        result = VerificationResult(
+            success=True,
+            message=(f"Closest palette to the brand colours is {closest['group']} "
+                     f"(mean \u0394E {closest['mean_delta_e']})"),
+            timestamp=get_timestamp(),
+            details={
+                "brand_colors": [m['color'] for m in matches],
+                "brand_colors_source": source,
+                "nearest_palette_match": matches[0]['nearest'],
+                "matches": matches,
+                "closest_group": closest['group'],
+                "closest_group_darkest_tone": closest['darkest_tone'],
+                "mean_delta_e": closest['mean_delta_e'],
+                "group_ranking": closest['ranking'],
+                "status": "match_found"
+            }
+        )
+    except ValueError as e:
+        result = VerificationResult(
+            success=False,
+            message=f"Invalid brand colour: {str(e)}",
+            timestamp=get_timestamp(),
+            details={"brand_colors": brand_colors, "status": "invalid_color", "error": str(e)}
+        )
     verification_results[7] = result
     return result
 
@@ -395,129 +594,141 @@ async def verify_digital_use_only():
     return result
 
 #testcase_10
+LOGO_BLACK_SHARE = 0.75
+
+async def logo_lockup_result(image_bytes: bytes, sampling: bool = PIXEL_SAMPLING) -> VerificationResult:
+    # Enhancement, background detection and pixel classification run in a worker
+    # process; re-uploads of the same screenshot are served from the result cache
+    if sampling:
+        analysis = await upload_cache.analyze(10, image_bytes, sample_logo_lockup, threshold=LOGO_BLACK_SHARE)
+    else:
+        # Shared with guideline 12, so an image checked as both is preprocessed once
+        analysis = (await upload_cache.analyze(10, image_bytes, analyze_marks))["logo"]
+    bg_hex = analysis["background_hex"]
+    logo_hex = analysis["logo_hex"]
+    percent_logo = analysis["percent_logo"]
+    percent_black = analysis["percent_black"]
+
+    # Pass if at least 75% of logo pixels are black
+    if percent_black >= LOGO_BLACK_SHARE:
+        status = "valid"
+        success = True
+        message = f"Logo lockups are sufficiently black (>=75% black pixels). ({int(percent_black*100)}% black)"
+    else:
+        status = "invalid"
+        success = False
+        message = f"Logo lockups are not compliant. Only {int(percent_black*100)}% of logo pixels are black."
+    message += sampling_note(analysis.get("sampling"))
+
+    result = VerificationResult(
+        success=success,
+        message=message,
+        timestamp=get_timestamp(),
+        details={
+            "background_hex": bg_hex,
+            "logo_hex": logo_hex,
+            "percent_logo_pixels": int(percent_logo*100),
+            "percent_black_logo_pixels": int(percent_black*100),
+            "sampling": analysis.get("sampling"),
+            "status": status
+        }
+    )
+    verification_results[10] = result
+    return result
+
+def logo_lockup_error(e: Exception) -> VerificationResult:
+    result = VerificationResult(
+        success=False,
+        message=f"Error processing logo lockup image: {str(e)}",
+        timestamp=get_timestamp(),
+        details={"error": str(e)}
+    )
+    verification_results[10] = result
+    return result
+
 @app.post("/api/verify/logo-lockups", response_model=VerificationResult)
-async def verify_logo_lockups(file: UploadFile = File(...)):
+async def verify_logo_lockups(file: UploadFile = File(...), sampling: bool = PIXEL_SAMPLING):
     """
     Verify logo lockups guideline:
     - All logo lockups must be in black (#000000) on any background.
     Accepts a screenshot image upload.
     """
     try:
-        image_bytes = await file.read()
-        image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-        image_np = np.array(image)
-
-        # --- Image Enhancement (optional, improves detection) ---
-        import cv2
-        sharpen_kernel = np.array([[0, -1, 0], [-1, 5,-1], [0, -1, 0]])
-        sharpened = cv2.filter2D(image_np, -1, sharpen_kernel)
-        img_yuv = cv2.cvtColor(sharpened, cv2.COLOR_RGB2YUV)
-        img_yuv[:,:,0] = cv2.equalizeHist(img_yuv[:,:,0])
-        enhanced = cv2.cvtColor(img_yuv, cv2.COLOR_YUV2RGB)
-        image_np = enhanced
-
-        # 1. Detect background color from edges
-        top_edge = image_np[0:5, :, :].reshape(-1, 3)
-        bottom_edge = image_np[-5:, :, :].reshape(-1, 3)
-        left_edge = image_np[:, 0:5, :].reshape(-1, 3)
-        right_edge = image_np[:, -5:, :].reshape(-1, 3)
-        background_pixels = np.concatenate((top_edge, bottom_edge, left_edge, right_edge), axis=0)
-        bg_rgb = np.mean(background_pixels, axis=0)
-        bg_hex = '#%02x%02x%02x' % tuple(int(x) for x in bg_rgb)
-
-        # 2. Mask out background-like pixels (Euclidean distance < 15)
-        flat_img = image_np.reshape(-1, 3)
-        bg_rgb_arr = np.array(bg_rgb).reshape(1, 3)
-        dist = np.linalg.norm(flat_img - bg_rgb_arr, axis=1)
-        logo_pixels = flat_img[dist > 15]
-        percent_logo = len(logo_pixels) / len(flat_img) if len(flat_img) > 0 else 0
-
-        # 3. For logo pixels, check if they are close to black (all channels <= 40)
-        black_pixels = [px for px in logo_pixels if all(c <= 40 for c in px)]
-        percent_black = len(black_pixels) / len(logo_pixels) if len(logo_pixels) > 0 else 0
-
-        # Calculate hex code for logo
-        if len(logo_pixels) > 0:
-            logo_rgb = np.mean(logo_pixels, axis=0)
-            logo_hex = '#%02x%02x%02x' % tuple(int(x) for x in logo_rgb)
-        else:
-            logo_hex = None
-
-        # Pass if at least 80% of logo pixels are black
-        if percent_black >= 0.75:
-            status = "valid"
-            success = True
-            message = f"Logo lockups are sufficiently black (>=75% black pixels). ({int(percent_black*100)}% black)"
-        else:
-            status = "invalid"
-            success = False
-            message = f"Logo lockups are not compliant. Only {int(percent_black*100)}% of logo pixels are black."
+        image_bytes = await read_upload(file)
+        return await logo_lockup_result(image_bytes, sampling)
+    except ImageTooLarge as e:
+        return upload_error(e)
+    except Exception as e:
+        return logo_lockup_error(e)
 
-        result = VerificationResult(
-            success=success,
-            message=message,
-            timestamp=get_timestamp(),
-            details={
-                "background_hex": bg_hex,
-                "logo_hex": logo_hex,
-                "percent_logo_pixels": int(percent_logo*100),
-                "percent_black_logo_pixels": int(percent_black*100),
-                "status": status
-            }
-        )
-        verification_results[10] = result
-        return result
+@app.get("/api/verify/logo-lockups", response_model=VerificationResult)
+async def verify_logo_lockups_url(url: str = Query(..., description="URL of the website to verify"),
+                                  sampling: bool = PIXEL_SAMPLING):
+    """Logo lockups (guideline 10) from the header logo, captured in the shared render."""
+    try:
+        element = await rendered_element(url, "logo")
+        return with_capture_details(await logo_lockup_result(element["png"], sampling), element)
     except Exception as e:
-        result = VerificationResult(
-            success=False,
-            message=f"Error processing logo lockup image: {str(e)}",
-            timestamp=get_timestamp(),
-            details={"error": str(e)}
-        )
-        verification_results[10] = result
-        return result
+        return logo_lockup_error(e)
 
 #tescase_11
-@app.get("/api/verify/primary-backgrounds", response_model=VerificationResult)
-async def verify_primary_backgrounds(url: str = Query(..., description="URL to check")):
-    """Verify primary backgrounds guideline by capturing a screenshot and checking the central region for white background."""
-    import tempfile
-    import numpy as np
-    from PIL import Image
-    from playwright.async_api import async_playwright
+PRIMARY_WHITE_SHARE = 0.5
 
+@app.get("/api/verify/primary-backgrounds", response_model=VerificationResult)
+async def verify_primary_backgrounds(url: str = Query(..., description="URL to check"),
+                                     sampling: bool = PIXEL_SAMPLING):
+    """
+    Verify primary backgrounds guideline by capturing a screenshot and checking the central region for white background.
+    With ``sampling``, each tile is sampled instead of scanned, and capture stops once
+    the share of white is confidently above or below the threshold.
+    """
     try:
-        # Step 1: Capture full-page screenshot using Playwright
-        async with async_playwright() as p:
-            browser = await p.chromium.launch()
-            page = await browser.new_page()
-            await page.goto(url, timeout=60000)
-            await page.wait_for_load_state('networkidle')
-            with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmpfile:
-                screenshot_path = tmpfile.name
-                await page.screenshot(path=screenshot_path, full_page=True)
-            await browser.close()
-
-        # Step 2: Open screenshot and focus on central 60% region
-        image = Image.open(screenshot_path).convert("RGB")
-        img_np = np.array(image)
-        h, w, _ = img_np.shape
-        y1, y2 = int(0.2 * h), int(0.8 * h)
-        x1, x2 = int(0.2 * w), int(0.8 * w)
-        central_region = img_np[y1:y2, x1:x2, :]
-        total_pixels = central_region.shape[0] * central_region.shape[1]
-
-        # Step 3: Count pixels close to white (#FFFFFF)
+        # Step 1: Capture only the main content region, in memory and tile by tile
         white_thresh = 245  # Allow a little tolerance
-        white_pixels = np.mean(central_region, axis=2) >= white_thresh
-
-        percent_white = np.sum(white_pixels) / total_pixels
+        white_pixels = total_pixels = 0
+        sampled = SampledShare()
+        coverage = 1.0
+        async with browser_pool.page() as page:
+            await page.set_viewport_size(DESKTOP_VIEWPORT)
+            await page.goto(url, wait_until='networkidle', timeout=NAVIGATION_TIMEOUT_MS)
+            width, height = await page_size(page)
+
+            # Step 2: The central 60% of the page, or (opt-in) its <main> landmark if it has one
+            landmark = None
+            if PRIMARY_BACKGROUND_REGION == "landmark":
+                landmark = await element_clip(page, MAIN_CONTENT_SELECTORS,
+                                              min_width=DESKTOP_VIEWPORT["width"] // 2, min_height=200)
+            region, clip = landmark if landmark else ("central_60_percent", central_clip(width, height))
+
+            # Step 3: Count pixels close to white (#FFFFFF) in each tile
+            region_pixels = clip["width"] * (min(clip["y"] + clip["height"], SCREENSHOT_MAX_HEIGHT) - clip["y"])
+            async for tile in iter_tiles(page, clip):
+                if not sampling:
+                    counts = await image_pool.run(count_white_pixels, tile, threshold=white_thresh)
+                    white_pixels += counts["white"]
+                    total_pixels += counts["total"]
+                    continue
+                # Samples in proportion to tile area keep the pooled share self-weighting
+                count = max(1, round(SAMPLING_BATCH * tile.shape[0] / SCREENSHOT_TILE_HEIGHT))
+                counts = await image_pool.run(sample_white_pixels, tile, count=count, threshold=white_thresh)
+                sampled.add(counts["white"], counts["sampled"])
+                total_pixels += counts["total"]
+                # Tiles not yet captured could be any colour
+                coverage = min(1.0, total_pixels / region_pixels) if region_pixels else 1.0
+                if sampled.decided(PRIMARY_WHITE_SHARE, coverage):
+                    break
+
+        if sampling:
+            percent_white = sampled.estimate
+        else:
+            percent_white = white_pixels / total_pixels if total_pixels else 0.0
 
         # Step 4: Prepare response
-        status = "valid" if percent_white >= 0.5 else "invalid"
-        success = percent_white >= 0.5
+        status = "valid" if percent_white >= PRIMARY_WHITE_SHARE else "invalid"
+        success = percent_white >= PRIMARY_WHITE_SHARE
         message = (
-            f"{int(percent_white*100)}% of the main background is white. "
+            f"{int(percent_white*100)}% of the main background is white"
+            + (sampling_note(sampled.as_dict(coverage)) if sampling else "") + ". "
             + ("Pass ✅" if success else "Fail ❌: At least 50% must be white.")
         )
         result = VerificationResult(
@@ -527,6 +738,8 @@ async def verify_primary_backgrounds(url: str = Query(..., description="URL to c
             details={
                 "background_hex": "#FFFFFF",
                 "percent_white_pixels": int(percent_white * 100),
+                "region": region,
+                "sampling": ({**sampled.as_dict(coverage), "coverage": round(coverage, 4)} if sampling else None),
                 "status": status
             }
         )
@@ -543,8 +756,92 @@ async def verify_primary_backgrounds(url: str = Query(..., description="URL to c
         return result
 
 #testcase_12
+EMBLEM_CONTRAST_SHARE = 0.2
+
+async def state_emblem_result(image_bytes: bytes, sampling: bool = PIXEL_SAMPLING) -> VerificationResult:
+    # Enhancement, background detection and pixel classification run in a worker
+    # process; re-uploads of the same screenshot are served from the result cache
+    if sampling:
+        analysis = await upload_cache.analyze(12, image_bytes, sample_state_emblem, threshold=EMBLEM_CONTRAST_SHARE)
+    else:
+        analysis = (await upload_cache.analyze(12, image_bytes, analyze_marks))["emblem"]
+    bg_color = analysis["background_color"]
+    bg_rgb = analysis["background_rgb"]
+    emblem_rgb = analysis["emblem_rgb"]
+    percent_emblem = analysis["percent_emblem"]
+
+    # 3. For emblem pixels, check for dark/light
+    if bg_color == "White":
+        percent_dark = analysis["percent_dark"]
+        if percent_dark >= EMBLEM_CONTRAST_SHARE:
+            status = "valid"
+            success = True
+            message = f"Emblem is sufficiently dark (black/dark gray) on white background (valid). {int(percent_dark*100)}% dark pixels."
+        else:
+            status = "invalid"
+            success = False
+            message = f"Emblem/background contrast not compliant. Only {int(percent_dark*100)}% dark emblem pixels."
+    elif bg_color == "Black":
+        percent_light = analysis["percent_light"]
+        if percent_light >= EMBLEM_CONTRAST_SHARE:
+            status = "valid"
+            success = True
+            message = f"Emblem is sufficiently light (white/light) on dark background (valid). {int(percent_light*100)}% light pixels."
+        else:
+            status = "invalid"
+            success = False
+            message = f"Emblem/background contrast not compliant. Only {int(percent_light*100)}% light emblem pixels."
+    else:
+        status = "invalid"
+        success = False
+        message = "Background is not clearly white or black."
+    if bg_color in ("White", "Black"):
+        message += sampling_note(analysis.get("sampling"))
+
+    # Calculate hex codes for swatch display
+    bg_hex = '#%02x%02x%02x' % tuple(int(x) for x in bg_rgb)
+    if emblem_rgb is not None:
+        emblem_hex = '#%02x%02x%02x' % tuple(int(x) for x in emblem_rgb)
+    else:
+        emblem_hex = None
+    # Strict emblem color check (must be gray/black or gray/white)
+    strict_emblem = False
+    emblem_color_type = None
+    if emblem_hex:
+        r, g, b = [int(x) for x in emblem_rgb]
+        grayness = max(abs(r-g), abs(g-b), abs(r-b))
+        # Looser gray check: allow grayness up to 18
+        if grayness <= 18:
+            if bg_color == "White" and max(r, g, b) <= 200:
+                strict_emblem = True
+                emblem_color_type = "gray/black"
+            elif bg_color == "Black" and min(r, g, b) >= 200:
+                strict_emblem = True
+                emblem_color_type = "light gray/white"
+    # If not strict, override to invalid
+    if not strict_emblem:
+        status = "invalid"
+        success = False
+        message = "Emblem color is not monochrome (gray/black for white bg or gray/white for black bg). Colored emblems are not allowed."
+    result = VerificationResult(
+        success=success,
+        message=message,
+        timestamp=get_timestamp(),
+        details={
+            "background_color": bg_color,
+            "background_hex": bg_hex,
+            "emblem_hex": emblem_hex,
+            "emblem_color_type": emblem_color_type,
+            "percent_emblem_pixels": int(percent_emblem*100),
+            "sampling": analysis.get("sampling"),
+            "status": status
+        }
+    )
+    verification_results[12] = result
+    return result
+
 @app.post("/api/verify/state-emblem-usage", response_model=VerificationResult)
-async def verify_state_emblem_usage(file: UploadFile = File(...)):
+async def verify_state_emblem_usage(file: UploadFile = File(...), sampling: bool = PIXEL_SAMPLING):
     """
     Verify state emblem usage guideline:
     - Emblem must be white (#FFFFFF) on dark background (#000000)
@@ -552,113 +849,46 @@ async def verify_state_emblem_usage(file: UploadFile = File(...)):
     Accepts a screenshot image upload.
     """
     try:
-        image_bytes = await file.read()
-        image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-        image_np = np.array(image)
-
-        # --- Image Enhancement ---
-        import cv2
-        sharpen_kernel = np.array([[0, -1, 0], [-1, 5,-1], [0, -1, 0]])
-        sharpened = cv2.filter2D(image_np, -1, sharpen_kernel)
-        img_yuv = cv2.cvtColor(sharpened, cv2.COLOR_RGB2YUV)
-        img_yuv[:,:,0] = cv2.equalizeHist(img_yuv[:,:,0])
-        enhanced = cv2.cvtColor(img_yuv, cv2.COLOR_YUV2RGB)
-        # Use enhanced image for all further processing
-        image_np = enhanced
-
-        # 1. Detect background color from edges
-        top_edge = image_np[0:5, :, :].reshape(-1, 3)
-        bottom_edge = image_np[-5:, :, :].reshape(-1, 3)
-        left_edge = image_np[:, 0:5, :].reshape(-1, 3)
-        right_edge = image_np[:, -5:, :].reshape(-1, 3)
-        background_pixels = np.concatenate((top_edge, bottom_edge, left_edge, right_edge), axis=0)
-        bg_rgb = np.mean(background_pixels, axis=0)
-        bg_brightness = np.mean(bg_rgb)
-        if bg_brightness > 180:
-            bg_color = "White"
-        elif bg_brightness < 80:
-            bg_color = "Black"
-        else:
-            bg_color = "Gray"
-
-        # 2. Mask out background-like pixels (Euclidean distance < 15)
-        flat_img = image_np.reshape(-1, 3)
-        bg_rgb_arr = np.array(bg_rgb).reshape(1, 3)
-        dist = np.linalg.norm(flat_img - bg_rgb_arr, axis=1)
-        emblem_pixels = flat_img[dist > 15]
-        percent_emblem = len(emblem_pixels) / len(flat_img) if len(flat_img) > 0 else 0
-
-        # 3. For emblem pixels, check for dark/light
-        if bg_color == "White":
-            dark_pixels = [px for px in emblem_pixels if all(c <= 60 for c in px)]
-            percent_dark = len(dark_pixels) / len(emblem_pixels) if len(emblem_pixels) > 0 else 0
-            if percent_dark >= 0.2:
-                status = "valid"
-                success = True
-                message = f"Emblem is sufficiently dark (black/dark gray) on white background (valid). {int(percent_dark*100)}% dark pixels."
-            else:
-                status = "invalid"
-                success = False
-                message = f"Emblem/background contrast not compliant. Only {int(percent_dark*100)}% dark emblem pixels."
-        elif bg_color == "Black":
-            light_pixels = [px for px in emblem_pixels if all(c >= 200 for c in px)]
-            percent_light = len(light_pixels) / len(emblem_pixels) if len(emblem_pixels) > 0 else 0
-            if percent_light >= 0.2:
-                status = "valid"
-                success = True
-                message = f"Emblem is sufficiently light (white/light) on dark background (valid). {int(percent_light*100)}% light pixels."
-            else:
-                status = "invalid"
-                success = False
-                message = f"Emblem/background contrast not compliant. Only {int(percent_light*100)}% light emblem pixels."
-        else:
-            status = "invalid"
-            success = False
-            message = "Background is not clearly white or black."
+        image_bytes = await read_upload(file)
+        return await state_emblem_result(image_bytes, sampling)
+    except Exception as e:
+        return upload_error(e)
 
-        # Calculate hex codes for swatch display
-        bg_hex = '#%02x%02x%02x' % tuple(int(x) for x in bg_rgb)
-        if len(emblem_pixels) > 0:
-            emblem_rgb = np.mean(emblem_pixels, axis=0)
-            emblem_hex = '#%02x%02x%02x' % tuple(int(x) for x in emblem_rgb)
-        else:
-            emblem_hex = None
-        # Strict emblem color check (must be gray/black or gray/white)
-        strict_emblem = False
-        emblem_color_type = None
-        if emblem_hex:
-            r, g, b = [int(x) for x in np.mean(emblem_pixels, axis=0)]
-            grayness = max(abs(r-g), abs(g-b), abs(r-b))
-            # Looser gray check: allow grayness up to 18
-            if grayness <= 18:
-                if bg_color == "White" and max(r, g, b) <= 200:
-                    strict_emblem = True
-                    emblem_color_type = "gray/black"
-                elif bg_color == "Black" and min(r, g, b) >= 200:
-                    strict_emblem = True
-                    emblem_color_type = "light gray/white"
-        # If not strict, override to invalid
-        if not strict_emblem:
-            status = "invalid"
-            success = False
-            message = "Emblem color is not monochrome (gray/black for white bg or gray/white for black bg). Colored emblems are not allowed."
-        result = VerificationResult(
-            success=success,
-            message=message,
-            timestamp=get_timestamp(),
-            details={
-                "background_color": bg_color,
-                "background_hex": bg_hex,
-                "emblem_hex": emblem_hex,
-                "emblem_color_type": emblem_color_type,
-                "percent_emblem_pixels": int(percent_emblem*100),
-                "status": status
-            }
-        )
-        verification_results[12] = result
-        return result
+@app.get("/api/verify/state-emblem-usage", response_model=VerificationResult)
+async def verify_state_emblem_usage_url(url: str = Query(..., description="URL of the website to verify"),
+                                        sampling: bool = PIXEL_SAMPLING):
+    """State emblem usage (guideline 12) from the emblem, captured in the shared render."""
+    try:
+        element = await rendered_element(url, "emblem")
+        return with_capture_details(await state_emblem_result(element["png"], sampling), element)
     except Exception as e:
-        return JSONResponse(status_code=400, content={"error": str(e)})
+        return VerificationResult(success=False, message=f"Error capturing the state emblem: {str(e)}",
+                                  timestamp=get_timestamp(), details={"error": str(e)})
+
+@app.get("/api/metrics/browser-pool")
+async def get_browser_pool_metrics() -> Dict[str, Any]:
+    """Report browser pool usage and saturation"""
+    return browser_pool.stats()
+
+@app.get("/api/metrics/image-pool")
+async def get_image_pool_metrics() -> Dict[str, Any]:
+    """Report image worker pool usage"""
+    return image_pool.stats()
+
+@app.get("/api/metrics/stylesheet-cache")
+async def get_stylesheet_cache_metrics() -> Dict[str, Any]:
+    """Report linked stylesheet cache usage"""
+    return stylesheet_cache.stats()
+
+@app.get("/api/metrics/image-analysis-cache")
+async def get_image_analysis_cache_metrics() -> Dict[str, Any]:
+    """Report image re-encode estimate cache usage"""
+    return image_analysis_cache.stats()
+
+@app.get("/api/metrics/upload-cache")
+async def get_upload_cache_metrics() -> Dict[str, Any]:
+    """Report upload result cache usage"""
+    return upload_cache.stats()
 
 # Get all verification results
 @app.get("/api/verifications")
@@ -670,303 +900,61 @@ from urllib.parse import urljoin
 import re
 
 # --- IMAGE VERIFICATION ENDPOINTS FOR GUIDELINES 32-38 ---
-from urllib.parse import urlparse
-
-def get_images_from_html(html, base_url):
-    soup = BeautifulSoup(html, 'html.parser')
-    images = []
-    for img in soup.find_all('img'):
-        src = img.get('src')
-        alt = img.get('alt', '')
-        if src:
-            img_url = urljoin(base_url, src)
-            images.append({'src': img_url, 'alt': alt})
-    return images
+# Every check is an evaluation over the page's shared image inventory (image_inventory.py)
 
-# Guideline 32
-@app.get('/api/verify/background-image-size')
-def verify_background_image_size(url: str = Query(...)):
-    """List all image URLs from the page (from <img> tags and background-image styles), get their sizes, truncate URLs to 50 chars, and return info."""
+async def verify_image_size_limit(guideline_id: int, url: str) -> Dict[str, Any]:
+    """Check the images a guideline covers against its size limit."""
     try:
-        r = requests.get(url, timeout=10)
-        r.raise_for_status()
-        soup = BeautifulSoup(r.text, 'html.parser')
-        results = []
-        seen_urls = set()
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (compatible; ImageSizeBot/1.0)'
-        }
-        # 1. Find all <img> tags
-        for img in soup.find_all('img'):
-            img_url = img.get('src')
-            if img_url:
-                full_url = urljoin(url, img_url)
-                if full_url in seen_urls:
-                    continue
-                seen_urls.add(full_url)
-                try:
-                    resp = requests.head(full_url, headers=headers, timeout=10)
-                    size = int(resp.headers.get('content-length', 0))
-                    # fallback to GET if HEAD fails to provide size
-                    if size == 0:
-                        resp = requests.get(full_url, headers=headers, stream=True, timeout=10)
-                        size = int(resp.headers.get('content-length', 0))
-                    results.append({
-                        'source': 'img_tag',
-                        'image_url': full_url[:70],
-                        'size_bytes': size,
-                        'size_KB': round(size / 1024, 2),
-                        'size_MB': round(size/1024/1024, 2)
-                    })
-                except Exception as e:
-                    results.append({
-                        'source': 'img_tag',
-                        'image_url': full_url[:70],
-                        'error': str(e)
-                    })
-        # 2. Find all background images in style attributes
-        for tag in soup.find_all(style=True):
-            style = tag['style']
-            m = re.search(r'background(-image)?:.*url\(([^)]+)\)', style)
-            if m:
-                img_url = m.group(2).strip('"\'')
-                full_url = urljoin(url, img_url)
-                if full_url in seen_urls:
-                    continue
-                seen_urls.add(full_url)
-                try:
-                    resp = requests.head(full_url, headers=headers, timeout=10)
-                    size = int(resp.headers.get('content-length', 0))
-                    if size == 0:
-                        resp = requests.get(full_url, headers=headers, stream=True, timeout=10)
-                        size = int(resp.headers.get('content-length', 0))
-                    results.append({
-                        'source': 'background_image',
-                        'image_url': full_url[:70],
-                        'size_bytes': size,
-                        'size_KB': round(size / 1024, 2),
-                        'size_MB': round(size/1024/1024, 2)
-                    })
-                except Exception as e:
-                    results.append({
-                        'source': 'background_image',
-                        'image_url': full_url[:70],
-                        'error': str(e)
-                    })
-        return {
-            'success': True,
-            'message': f'Found {len(results)} images on the page.',
-            'details': results,
-            'timestamp': get_timestamp()
-        }
+        inventory = await get_image_inventory(url)
+        return {**evaluate_size_limit(inventory, guideline_id), 'timestamp': get_timestamp()}
     except Exception as e:
         return {'success': False, 'message': str(e), 'timestamp': get_timestamp(), 'details': {}}
 
+# Guideline 32
+@app.get('/api/verify/background-image-size')
+async def verify_background_image_size(url: str = Query(...)):
+    """Guideline 32: Background images are maximum up to 2MB"""
+    return await verify_image_size_limit(32, url)
+
+
 # Guideline 33
 @app.get('/api/verify/banner-image-size')
-def verify_banner_image_size(url: str = Query(...)):
+async def verify_banner_image_size(url: str = Query(...)):
     """Guideline 33: Banner and header images are maximum up to 2MB"""
-    try:
-        r = requests.get(url, timeout=10)
-        r.raise_for_status()
-        soup = BeautifulSoup(r.text, 'html.parser')
-        results = []
-        seen_urls = set()
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (compatible; ImageSizeBot/1.0)'
-        }
-        # 1. Find all <img> tags
-        for img in soup.find_all('img'):
-            img_url = img.get('src')
-            if img_url:
-                full_url = urljoin(url, img_url)
-                if full_url in seen_urls:
-                    continue
-                seen_urls.add(full_url)
-                try:
-                    resp = requests.head(full_url, headers=headers, timeout=10)
-                    size = int(resp.headers.get('content-length', 0))
-                    # fallback to GET if HEAD fails to provide size
-                    if size == 0:
-                        resp = requests.get(full_url, headers=headers, stream=True, timeout=10)
-                        size = int(resp.headers.get('content-length', 0))
-                    results.append({
-                        'source': 'img_tag',
-                        'image_url': full_url[:70],
-                        'size_bytes': size,
-                        'size_KB': round(size / 1024, 2),
-                        'size_MB': round(size/1024/1024, 2)
-                    })
-                except Exception as e:
-                    results.append({
-                        'source': 'img_tag',
-                        'image_url': full_url[:70],
-                        'error': str(e)
-                    })
-        # 2. Find all background images in style attributes
-        for tag in soup.find_all(style=True):
-            style = tag['style']
-            m = re.search(r'background(-image)?:.*url\(([^)]+)\)', style)
-            if m:
-                img_url = m.group(2).strip('"\'')
-                full_url = urljoin(url, img_url)
-                if full_url in seen_urls:
-                    continue
-                seen_urls.add(full_url)
-                try:
-                    resp = requests.head(full_url, headers=headers, timeout=10)
-                    size = int(resp.headers.get('content-length', 0))
-                    if size == 0:
-                        resp = requests.get(full_url, headers=headers, stream=True, timeout=10)
-                        size = int(resp.headers.get('content-length', 0))
-                    results.append({
-                        'source': 'background_image',
-                        'image_url': full_url[:70],
-                        'size_bytes': size,
-                        'size_KB': round(size / 1024, 2),
-                        'size_MB': round(size/1024/1024, 2)
-                    })
-                except Exception as e:
-                    results.append({
-                        'source': 'background_image',
-                        'image_url': full_url[:70],
-                        'error': str(e)
-                    })
-        return {
-            'success': True,
-            'message': f'Found {len(results)} images on the page.',
-            'details': results,
-            'timestamp': get_timestamp()
-        }
-    except Exception as e:
-        return {'success': False, 'message': str(e), 'timestamp': get_timestamp(), 'details': {}}
+    return await verify_image_size_limit(33, url)
+
 
 # Guideline 34
 @app.get('/api/verify/thumbnail-image-size')
-def verify_thumbnail_image_size(url: str = Query(...)):
+async def verify_thumbnail_image_size(url: str = Query(...)):
     """Guideline 34: Thumbnail images are maximum up to 100 KB"""
-    try:
-        r = requests.get(url, timeout=10)
-        r.raise_for_status()
-        soup = BeautifulSoup(r.text, 'html.parser')
-        results = []
-        seen_urls = set()
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (compatible; ImageSizeBot/1.0)'
-        }
-        # 1. Find all <img> tags
-        for img in soup.find_all('img'):
-            img_url = img.get('src')
-            if img_url:
-                full_url = urljoin(url, img_url)
-                if full_url in seen_urls:
-                    continue
-                seen_urls.add(full_url)
-                try:
-                    resp = requests.head(full_url, headers=headers, timeout=10)
-                    size = int(resp.headers.get('content-length', 0))
-                    # fallback to GET if HEAD fails to provide size
-                    if size == 0:
-                        resp = requests.get(full_url, headers=headers, stream=True, timeout=10)
-                        size = int(resp.headers.get('content-length', 0))
-                    results.append({
-                        'source': 'img_tag',
-                        'image_url': full_url[:70],
-                        'size_bytes': size,
-                        'size_KB': round(size / 1024, 2),
-                        'size_MB': round(size/1024/1024, 2)
-                    })
-                except Exception as e:
-                    results.append({
-                        'source': 'img_tag',
-                        'image_url': full_url[:70],
-                        'error': str(e)
-                    })
-        # 2. Find all background images in style attributes
-        for tag in soup.find_all(style=True):
-            style = tag['style']
-            m = re.search(r'background(-image)?:.*url\(([^)]+)\)', style)
-            if m:
-                img_url = m.group(2).strip('"\'')
-                full_url = urljoin(url, img_url)
-                if full_url in seen_urls:
-                    continue
-                seen_urls.add(full_url)
-                try:
-                    resp = requests.head(full_url, headers=headers, timeout=10)
-                    size = int(resp.headers.get('content-length', 0))
-                    if size == 0:
-                        resp = requests.get(full_url, headers=headers, stream=True, timeout=10)
-                        size = int(resp.headers.get('content-length', 0))
-                    results.append({
-                        'source': 'background_image',
-                        'image_url': full_url[:70],
-                        'size_bytes': size,
-                        'size_KB': round(size / 1024, 2),
-                        'size_MB': round(size/1024/1024, 2)
-                    })
-                except Exception as e:
-                    results.append({
-                        'source': 'background_image',
-                        'image_url': full_url[:70],
-                        'error': str(e)
-                    })
-        return {
-            'success': True,
-            'message': f'Found {len(results)} images on the page.',
-            'details': results,
-            'timestamp': get_timestamp()
-        }
-    except Exception as e:
-        return {'success': False, 'message': str(e), 'timestamp': get_timestamp(), 'details': {}}
+    return await verify_image_size_limit(34, url)
 
 
 
 from collections import defaultdict
 # Guideline 35
 @app.get('/api/verify/image-format')
-def verify_image_format(url: str = Query(...)):
+async def verify_image_format(url: str = Query(...)):
     """Guideline 35: All images are in JPEG, PNG or WEBP format only"""
     try:
-        # Step 1: Get page HTML
-        r = requests.get(url, timeout=10)
-        r.raise_for_status()
-
-        # Step 2: Extract images from HTML
-        images = get_images_from_html(r.text, url)
-        allowed_ext = ['.jpg', '.jpeg', '.png', '.webp']
+        inventory = await get_image_inventory(url)
+        allowed_formats = ['jpeg', 'png', 'webp']
         results = []
         success = True
         format_counts = defaultdict(int)
 
-        for img in images:
-            src = img['src']
-            ext = Path(urlparse(src).path).suffix.lower()
-
-            # Step 3: Fallback - use Content-Type header if extension is missing
-            if not ext:
-                try:
-                    head = requests.head(src, timeout=5)
-                    content_type = head.headers.get("Content-Type", "")
-                    ext = {
-                        'image/jpeg': '.jpg',
-                        'image/png': '.png',
-                        'image/webp': '.webp'
-                    }.get(content_type, '')
-                except:
-                    ext = ''
-
-            # Step 4: Format check and results logging
-            ok = ext in allowed_ext
-            format_key = ext or 'unknown'
-            format_counts[format_key] += 1
-
+        # The format is read from each file's header bytes, then Content-Type, then the extension
+        for image in inventory.images.values():
+            image_format = image.format
+            ok = image_format in allowed_formats
+            format_counts[image_format] += 1
             results.append({
-                'img_url': src,
-                'format': format_key,
+                'img_url': image.url[:70],
+                'source': image.source,
+                'format': image_format,
                 'allowed': ok
             })
-
             if not ok:
                 success = False
 
@@ -989,113 +977,24 @@ def verify_image_format(url: str = Query(...)):
 
 # Guideline 36
 @app.get('/api/verify/high-res-image')
-def verify_high_res_image(url: str = Query(...)):
+async def verify_high_res_image(url: str = Query(...)):
     """Guideline 36: High resolution images are maximum up to 5 MB"""
-    try:
-        r = requests.get(url, timeout=10)
-        r.raise_for_status()
-        soup = BeautifulSoup(r.text, 'html.parser')
-        results = []
-        seen_urls = set()
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (compatible; ImageSizeBot/1.0)'
-        }
-        any_oversized = False  # Track oversized image
-
-        # 1. Find all <img> tags
-        for img in soup.find_all('img'):
-            img_url = img.get('src')
-            if img_url:
-                full_url = urljoin(url, img_url)
-                if full_url in seen_urls:
-                    continue
-                seen_urls.add(full_url)
-                try:
-                    resp = requests.head(full_url, headers=headers, timeout=10)
-                    size = int(resp.headers.get('content-length', 0))
-                    if size == 0:
-                        resp = requests.get(full_url, headers=headers, stream=True, timeout=10)
-                        size = int(resp.headers.get('content-length', 0))
-
-                    size_MB = round(size / 1024 / 1024, 2)
-                    if size_MB > 5:
-                        any_oversized = True
-
-                    results.append({
-                        'source': 'img_tag',
-                        'image_url': full_url[:70],
-                        'size_bytes': size,
-                        'size_KB': round(size / 1024, 2),
-                        'size_MB': size_MB
-                    })
-                except Exception as e:
-                    results.append({
-                        'source': 'img_tag',
-                        'image_url': full_url[:70],
-                        'error': str(e)
-                    })
-
-        # 2. Find all background images in style attributes
-        for tag in soup.find_all(style=True):
-            style = tag['style']
-            m = re.search(r'background(-image)?:.*url\(([^)]+)\)', style)
-            if m:
-                img_url = m.group(2).strip('"\'')
-                full_url = urljoin(url, img_url)
-                if full_url in seen_urls:
-                    continue
-                seen_urls.add(full_url)
-                try:
-                    resp = requests.head(full_url, headers=headers, timeout=10)
-                    size = int(resp.headers.get('content-length', 0))
-                    if size == 0:
-                        resp = requests.get(full_url, headers=headers, stream=True, timeout=10)
-                        size = int(resp.headers.get('content-length', 0))
-
-                    size_MB = round(size / 1024 / 1024, 2)
-                    if size_MB > 5:
-                        any_oversized = True
-
-                    results.append({
-                        'source': 'background_image',
-                        'image_url': full_url[:70],
-                        'size_bytes': size,
-                        'size_KB': round(size / 1024, 2),
-                        'size_MB': size_MB
-                    })
-                except Exception as e:
-                    results.append({
-                        'source': 'background_image',
-                        'image_url': full_url[:70],
-                        'error': str(e)
-                    })
+    return await verify_image_size_limit(36, url)
 
-        return {
-            'success': not any_oversized,  # Will be False if any image > 5MB
-            'message': f'Found {len(results)} images on the page.',
-            'details': results,
-            'timestamp': get_timestamp()
-        }
-    except Exception as e:
-        return {
-            'success': False,
-            'message': str(e),
-            'timestamp': get_timestamp(),
-            'details': {}
-        }
 # Guideline 37
 @app.get('/api/verify/alt-text')
-def verify_alt_text(url: str = Query(...)):
+async def verify_alt_text(url: str = Query(...)):
     """Guideline 37: Alternative text is provided for all images"""
     try:
-        r = requests.get(url, timeout=10)
-        r.raise_for_status()
-        images = get_images_from_html(r.text, url)
+        page = await get_page(url)
+        page.raise_for_status()
+        images = img_alt_texts(page.soup_for(('img',)), page.url)
         results = []
         success = True
-        for img in images:
-            has_alt = bool(img['alt'].strip())
-            results.append({'img_url': img['src'], 'alt': img['alt'], 'has_alt': has_alt})
+        for img_url, alt in images:
+            alt = alt or ''
+            has_alt = bool(alt.strip())
+            results.append({'img_url': img_url, 'alt': alt, 'has_alt': has_alt})
             if not has_alt:
                 success = False
         return {
@@ -1110,18 +1009,19 @@ def verify_alt_text(url: str = Query(...)):
 
 # Guideline 38:
 @app.get('/api/verify/alt-text-length')
-def verify_alt_text_length(url: str = Query(...)):
+async def verify_alt_text_length(url: str = Query(...)):
     """Guideline 38: Alternative text is maximum up to 100 characters"""
     try:
-        r = requests.get(url, timeout=10)
-        r.raise_for_status()
-        images = get_images_from_html(r.text, url)
+        page = await get_page(url)
+        page.raise_for_status()
+        images = img_alt_texts(page.soup_for(('img',)), page.url)
         results = []
         success = True
-        for img in images:
-            alt_len = len(img['alt'])
+        for img_url, alt in images:
+            alt = alt or ''
+            alt_len = len(alt)
             ok = alt_len <= 100
-            results.append({'img_url': img['src'], 'alt': img['alt'], 'alt_length': alt_len, 'under_100_chars': ok})
+            results.append({'img_url': img_url, 'alt': alt, 'alt_length': alt_len, 'under_100_chars': ok})
             if not ok:
                 success = False
         return {
@@ -1136,9 +1036,7 @@ def verify_alt_text_length(url: str = Query(...)):
 
 
 #testcase_20
-from playwright.async_api import async_playwright
 import os
-import requests
 import time
 from fastapi import BackgroundTasks
 
@@ -1147,7 +1045,7 @@ from fastapi import BackgroundTasks
 async def verify_server_response_time(url: str = Query(...)):
     try:
         start = time.time()
-        r = requests.get(url, timeout=10)
+        r = await http_client.get(url, timeout=10)
         elapsed = (time.time() - start) * 1000  # ms
         return {
             "success": elapsed < 800,
@@ -1166,8 +1064,8 @@ async def verify_server_response_time(url: str = Query(...)):
 @app.get("/api/verify/browser-caching")
 async def verify_browser_caching(url: str = Query(..., description="URL of the page to check caching headers")):
     try:
-        r = requests.get(url, timeout=10)
-        soup = BeautifulSoup(r.text, "html.parser")
+        page = await get_page(url)
+        soup = page.asset_soup
 
         # Extract static resource URLs
         static_urls = set()
@@ -1175,14 +1073,14 @@ async def verify_browser_caching(url: str = Query(..., description="URL of the p
         for tag in soup.find_all(["script", "link", "img"]):
             src = tag.get("src") or tag.get("href")
             if src:
-                full_url = urljoin(url, src)
+                full_url = urljoin(page.url, src)
                 if any(ext in full_url for ext in [".js", ".css", ".png", ".jpg", ".jpeg", ".svg", ".woff", ".woff2", ".ttf"]):
                     static_urls.add(full_url)
 
         results = []
         for static_url in static_urls:
             try:
-                res = requests.head(static_url, timeout=5)
+                res = await http_client.head(static_url, timeout=5)
                 headers = {k.lower(): v for k, v in res.headers.items()}
                 has_cache = any(h in headers for h in ['cache-control', 'expires', 'etag'])
                 results.append({
@@ -1213,30 +1111,7 @@ async def verify_browser_caching(url: str = Query(..., description="URL of the p
 @app.get("/api/verify/image-optimization")
 async def verify_image_optimization(url: str = Query(...)):
     try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch()
-            page = await browser.new_page()
-            await page.goto(url, wait_until='networkidle')
-            imgs = await page.evaluate('''() => Array.from(document.images).map(i => ({src: i.src, width: i.naturalWidth, height: i.naturalHeight, size: i.src.length}))''')
-            await browser.close()
-        optimized = all(img['width'] <= 1920 and img['height'] <= 1080 for img in imgs if img['width'] and img['height'])
-        # Truncate src for each image, add src_truncated flag
-        def truncate_img(img):
-            src = img.get('src', '')
-            maxlen = 100
-            truncated = len(src) > maxlen
-            return {
-                **img,
-                'src': src[:maxlen] + ('...' if truncated else ''),
-                # 'src_truncated': truncated
-            }
-        images_trunc = [truncate_img(img) for img in imgs[:10]]
-        return {
-            "success": optimized,
-            "image_count": len(imgs),
-            "message": "All images appear optimized." if optimized else "Some images may not be optimized.",
-            "images": images_trunc
-        }
+        return await analyze_image_optimization(url)
     except Exception as e:
         return {"success": False, "message": str(e)}
 
@@ -1250,21 +1125,8 @@ async def verify_js_optimization(url: str = Query(..., description="Website URL
     - Presence of inline scripts
     """
     try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch()
-            page = await browser.new_page()
-            await page.goto(url, wait_until='networkidle')
-            scripts = await page.evaluate('''() => 
-                Array.from(document.scripts).map(s => ({
-                    src: s.src, 
-                    inline: !s.src, 
-                    async: s.async, 
-                    defer: s.defer, 
-                    type: s.type, 
-                    length: s.innerText.length
-                }))
-            ''')
-            await browser.close()
+        snapshot = await get_render_snapshot(url)
+        scripts = snapshot.scripts
 
         total_external = 0
         minified_external = 0
@@ -1323,12 +1185,8 @@ async def verify_js_optimization(url: str = Query(..., description="Website URL
 @app.get("/api/verify/browser-preloading")
 async def verify_browser_preloading(url: str = Query(...)):
     try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch()
-            page = await browser.new_page()
-            await page.goto(url, wait_until='networkidle')
-            links = await page.evaluate('''() => Array.from(document.querySelectorAll('link[rel="preload"],link[rel="prefetch"]')).map(l => l.outerHTML)''')
-            await browser.close()
+        snapshot = await get_render_snapshot(url)
+        links = snapshot.preload_links
         return {
             "success": len(links) > 0,
             "preload_links": links,
@@ -1341,23 +1199,9 @@ async def verify_browser_preloading(url: str = Query(...)):
 @app.get("/api/verify/lazy-loading")
 async def verify_lazy_loading(url: str = Query(..., description="URL to check lazy loading usage")):
     try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch()
-            page = await browser.new_page()
-            await page.goto(url, wait_until='networkidle')
-
-            lazy_elements = await page.evaluate('''() => {
-                const lazyImages = Array.from(document.querySelectorAll('img[loading="lazy"], img.lazy, img[data-src]'));
-                const lazyIframes = Array.from(document.querySelectorAll('iframe[loading="lazy"], iframe.lazy, iframe[data-src]'));
-                const lazyVideos = Array.from(document.querySelectorAll('video[loading="lazy"], video.lazy, source[data-src]'));
-                return {
-                    image_count: lazyImages.length,
-                    iframe_count: lazyIframes.length,
-                    video_count: lazyVideos.length
-                };
-            }''')
-
-            await browser.close()
+        snapshot = await get_render_snapshot(url)
+        lazy_elements = snapshot.lazy
+
 
         total_lazy = lazy_elements["image_count"] + lazy_elements["iframe_count"] + lazy_elements["video_count"]
 
@@ -1390,45 +1234,9 @@ async def verify_resource_order(url: str = Query(...)):
     - Defer/async recommended
     """
     try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch()
-            page = await browser.new_page()
-            await page.goto(url, wait_until='networkidle')
-
-            resource_order = await page.evaluate('''() => {
-                const headChildren = Array.from(document.head.children);
-                let cssBeforeJs = true;
-                let foundCss = false;
-                let blockingJs = false;
-                let totalScripts = 0;
-                let deferScripts = 0;
-                let asyncScripts = 0;
-
-                for (let el of headChildren) {
-                    if (el.tagName === 'LINK' && el.rel === 'stylesheet') {
-                        foundCss = true;
-                    }
-                    if (el.tagName === 'SCRIPT') {
-                        totalScripts++;
-                        if (el.defer) deferScripts++;
-                        if (el.async) asyncScripts++;
-                        if (!el.defer && !el.async && (!el.type || el.type === 'text/javascript')) {
-                            if (!foundCss) cssBeforeJs = false;
-                            blockingJs = true;
-                        }
-                    }
-                }
-
-                return {
-                    cssBeforeJs,
-                    blockingJs,
-                    totalScripts,
-                    deferScripts,
-                    asyncScripts
-                };
-            }''')
+        snapshot = await get_render_snapshot(url)
+        resource_order = dict(snapshot.resource_order)
 
-            await browser.close()
 
         return {
             "success": resource_order["cssBeforeJs"] and not resource_order["blockingJs"],
@@ -1453,35 +1261,17 @@ async def verify_critical_resources(url: str = Query(...)):
     and optionally preloaded resources.
     """
     try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch()
-            page = await browser.new_page()
-            await page.goto(url, wait_until='networkidle')
-
-            # Check inline <style> blocks (usually critical CSS)
-            critical_css = await page.evaluate('''() => {
-                return Array.from(document.head.querySelectorAll('style'))
-                            .map(s => s.innerText.length)
-                            .reduce((a,b) => a+b, 0);
-            }''')
-
-            # Get above-the-fold images and their loading type
-            above_fold_imgs = await page.evaluate('''() => {
-                return Array.from(document.images)
-                    .filter(img => {
-                        const rect = img.getBoundingClientRect();
-                        return rect.top < window.innerHeight && rect.left < window.innerWidth;
-                    })
-                    .map(img => ({src: img.src, loading: img.loading}));
-            }''')
-
-            # Check preload links
-            preload_resources = await page.evaluate('''() => {
-                return Array.from(document.querySelectorAll('link[rel="preload"]'))
-                            .map(link => ({href: link.href, as: link.as}));
-            }''')
-
-            await browser.close()
+        snapshot = await get_render_snapshot(url)
+
+        # Inline <style> blocks in <head> (usually critical CSS)
+        critical_css = snapshot.critical_css
+
+        # Above-the-fold images and their loading type
+        above_fold_imgs = snapshot.above_fold_images
+
+        # Preload links
+        preload_resources = snapshot.preload_resources
+
 
         non_lazy_above_fold = [img for img in above_fold_imgs if img['loading'] != 'lazy']
         msg = (
@@ -1515,12 +1305,8 @@ async def verify_critical_resources(url: str = Query(...)):
 @app.get("/api/verify/async-scripts")
 async def verify_async_scripts(url: str = Query(...)):
     try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch()
-            page = await browser.new_page()
-            await page.goto(url, wait_until='networkidle')
-            async_scripts = await page.evaluate('''() => Array.from(document.scripts).filter(s => s.async || s.defer).map(s => s.src)''')
-            await browser.close()
+        snapshot = await get_render_snapshot(url)
+        async_scripts = [s['src'] for s in snapshot.scripts if s['async'] or s['defer']]
         return {
             "success": len(async_scripts) > 0,
             "async_scripts": async_scripts,
@@ -1533,15 +1319,9 @@ async def verify_async_scripts(url: str = Query(...)):
 @app.get("/api/verify/responsiveness")
 async def verify_responsiveness(url: str = Query(...)):
     try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch()
-            page = await browser.new_page()
-            await page.set_viewport_size({"width": 375, "height": 667})  # Mobile
-            await page.goto(url, wait_until='networkidle')
-            mobile_width = await page.evaluate('''() => document.body.scrollWidth''')
-            await page.set_viewport_size({"width": 1200, "height": 800})  # Desktop
-            desktop_width = await page.evaluate('''() => document.body.scrollWidth''')
-            await browser.close()
+        snapshot = await get_render_snapshot(url)
+        mobile_width = snapshot.mobile_width  # 375x667 viewport
+        desktop_width = snapshot.desktop_width  # 1200x800 viewport
         responsive = abs(mobile_width - desktop_width) > 50
         print("-----",mobile_width ,desktop_width)
         return {
@@ -1557,16 +1337,14 @@ async def verify_responsiveness(url: str = Query(...)):
 @app.get("/api/verify/cdn")
 async def verify_cdn(url: str = Query(...)):
     try:
-        import re
-        from bs4 import BeautifulSoup
-        r = requests.get(url, timeout=10)
+        page = await get_page(url)
         cdn_keywords = ["cloudflare", "akamai", "fastly", "cdn", "edgekey", "stackpath"]
-        server_header = r.headers.get('server', '').lower()
-        body = r.text.lower()
+        server_header = page.headers.get('server', '').lower()
+        body = page.text.lower()
         cdn_used = any(k in server_header or k in body for k in cdn_keywords)
 
         # Parse static asset URLs and check for CDN domains
-        soup = BeautifulSoup(r.text, 'html.parser')
+        soup = page.asset_soup
         static_urls = set()
         # Images
         static_urls.update(img.get('src','') for img in soup.find_all('img') if img.get('src'))
@@ -1588,7 +1366,7 @@ async def verify_cdn(url: str = Query(...)):
         return {
             "success": cdn_used or bool(cdn_asset_urls),
             "message": ("CDN detected." if cdn_used or cdn_asset_urls else "No CDN detected."),
-            "server_header": r.headers.get('server', ''),
+            "server_header": page.headers.get('server', ''),
             "cdn_asset_urls": truncated_cdn_asset_urls
         }
     except Exception as e:
@@ -1599,9 +1377,8 @@ async def verify_cdn(url: str = Query(...)):
 async def verify_cache_headers(url: str = Query(...)):
     try:
         import urllib.parse
-        from bs4 import BeautifulSoup
-        r = requests.get(url, timeout=10)
-        soup = BeautifulSoup(r.text, 'html.parser')
+        page = await get_page(url)
+        soup = page.asset_soup
         asset_urls = set()
         # Images
         asset_urls.update(img.get('src','') for img in soup.find_all('img') if img.get('src'))
@@ -1624,7 +1401,7 @@ async def verify_cache_headers(url: str = Query(...)):
         # for asset_url in normalized_urls[:10]:
         for asset_url in normalized_urls:  # limit to 10 assets
             try:
-                asset_resp = requests.head(asset_url, timeout=5, allow_redirects=True)
+                asset_resp = await http_client.head(asset_url, timeout=5, follow_redirects=True)
                 asset_cache_headers = {k.lower(): v for k, v in asset_resp.headers.items() if k.lower().startswith('cache') or k.lower() in ['etag', 'expires']}
                 has_cache = any(h in asset_cache_headers for h in ['cache-control', 'expires', 'etag'])
                 summary.append({
@@ -1645,158 +1422,223 @@ async def verify_cache_headers(url: str = Query(...)):
     except Exception as e:
         return {"success": False, "message": str(e)}
 #testcase_20
+def font_families_of(font_strings: List[str]) -> List[str]:
+    """Unique font family names in a list of font-family strings (handles quotes and spaces)."""
+    all_families = set()
+    for fam_str in font_strings:
+        # Split on commas, strip whitespace and quotes, lowercase
+        for fam in fam_str.split(','):
+            fam = fam.strip().strip('"').strip("'").lower()
+            if fam:
+                all_families.add(fam)
+    return sorted(all_families)
+
+async def static_noto_sans_check(url: str) -> Dict[str, Any]:
+    """
+    Static fallback for guideline 20 when the page cannot be rendered: cascade
+    font-family from the inline and linked stylesheets to every element that
+    holds text.
+    """
+    page = await get_page(url)
+    page.raise_for_status()
+    soup = page.soup
+    css_index = await load_stylesheet_index(soup, page.url)
+
+    # Each element that directly holds visible text, once
+    text_elements = []
+    seen = set()
+    for text in soup.find_all(string=True):
+        parent = text.parent
+        if (not text.strip() or parent is None or parent.name in ('script', 'style', 'noscript', 'title', '[document]')
+                or id(parent) in seen):
+            continue
+        seen.add(id(parent))
+        text_elements.append(parent)
+
+    font_strings = []
+    non_noto_elements = []
+    unresolved = 0
+    for elem in text_elements:
+        found = css_index.property_value(elem, 'font-family', inherit=True)
+        if not found:
+            unresolved += 1
+            continue
+        font, source = found
+        font_strings.append(font.lower())
+        if 'noto sans' not in font.lower():
+            non_noto_elements.append({
+                'tag': elem.name,
+                'text': elem.get_text(strip=True)[:100],
+                'font_family': font.lower(),
+                'source': source
+            })
+
+    uses_noto_sans_only = bool(font_strings) and not non_noto_elements
+    if uses_noto_sans_only:
+        message = 'All visible text uses Noto Sans.'
+    elif not font_strings:
+        message = 'No font-family declarations found for the page text.'
+    else:
+        message = f"{len(non_noto_elements)} elements do not use Noto Sans."
+    return {
+        "success": uses_noto_sans_only,
+        "all_text_noto_sans": uses_noto_sans_only,
+        "font_families_detected": font_families_of(font_strings),
+        "font_family_strings": sorted(set(font_strings)),
+        "non_noto_elements": non_noto_elements[:50],
+        "elements_checked": len(text_elements),
+        "elements_without_font": unresolved,
+        "stylesheets_indexed": len([href for href in css_index.stylesheets if href]),
+        "source": "static_css",
+        "message": message + " (static stylesheet analysis; the page could not be rendered)",
+        "timestamp": datetime.utcnow().isoformat(),
+    }
+
 @app.get("/api/verify/noto-sans")
 async def verify_noto_sans(url: str = Query(..., description="URL of the webpage to verify")):
     """
     Verify if all text on the webpage uses Noto Sans font (browser-accurate, Playwright-based).
+    Falls back to static stylesheet analysis when the page cannot be rendered.
     Args:
         url: The URL of the webpage to check
     Returns:
         dict: Verification result with details about font usage
     """
     try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch()
-            page = await browser.new_page()
-            await page.goto(url, wait_until='networkidle')
-
-            # DOM font-family check for Noto Sans
-            fonts_used = await page.evaluate("""
-                () => {
-                    const elements = Array.from(document.querySelectorAll("body *"));
-                    const fonts = new Set();
-                    elements.forEach(el => {
-                        const style = window.getComputedStyle(el);
-                        if (style && style.fontFamily) {
-                            fonts.add(style.fontFamily.toLowerCase());
-                        }
-                    });
-                    return Array.from(fonts);
-                }
-            """)
-            print("fonts_used============",fonts_used)
-            # Extract all unique font family names from the font-family strings (robust, handles quotes and spaces)
-            all_families = set()
-            for fam_str in fonts_used:
-                # Split on commas, strip whitespace and quotes, lowercase
-                for fam in fam_str.split(','):
-                    fam = fam.strip().strip('"').strip("'").lower()
-                    if fam:
-                        all_families.add(fam)
-            all_families_list = sorted(all_families)
-
-            noto_sans_used = all("noto sans" in font for font in fonts_used)
-            font_details = fonts_used
-
-            await browser.close()
-
-            return {
-                "success": noto_sans_used,
-                "all_text_noto_sans": noto_sans_used,
-                "font_families_detected": all_families_list,
-                "font_family_strings": font_details,
-                "message": "All visible text uses Noto Sans." if noto_sans_used else "Some elements do not use Noto Sans.",
-            }
-        
-        # Check for system font stack that might include Noto Sans on some systems
-        system_fonts_used = any(family.lower() in ['sans-serif', 'system-ui', '-apple-system', 'BlinkMacSystemFont', 
-                                                'Segoe UI', 'Roboto', 'Helvetica Neue', 'Arial'] 
-                             for family in font_families)
-        
-        # Determine the result
-        if noto_sans_loaded or uses_noto_sans:
-            message = "Noto Sans is being used on this page"
-            uses_noto_sans_only = True
-            success = True
-        elif google_fonts_used:
-            message = "Google Fonts detected. Manual verification recommended to confirm Noto Sans usage."
-            uses_noto_sans_only = None  # Can't be certain
-            success = False
-        elif system_fonts_used:
-            message = "System fonts detected. Noto Sans might be used as a fallback on some systems."
-            uses_noto_sans_only = None  # Can't be certain
-            success = False
-        else:
-            message = "No evidence of Noto Sans usage found"
-            uses_noto_sans_only = False
-            success = False
-        
-        # --- NEW LOGIC: Check all visible text for Noto Sans usage ---
-        # 1. Gather all style rules from <style> tags
-        style_rules = []
-        for style in soup.find_all('style'):
-            if style.string:
-                style_rules.append(style.string)
-        style_rules_text = '\n'.join(style_rules)
-
-        def get_font_from_style_attr(style_str):
-            match = re.search(r'font-family\s*:\s*([^;]+)', style_str, re.IGNORECASE)
-            if match:
-                return match.group(1).lower()
-            return None
-
-        def get_font_from_style_rules(tag, classes, id_):
-            # Check for matching CSS selectors in <style> blocks
-            selectors = [tag]
-            if classes:
-                selectors.extend([f'.{c}' for c in classes])
-            if id_:
-                selectors.append(f'#{id_}')
-            for sel in selectors:
-                # Look for e.g. 'p { font-family: ... }', '.class { font-family: ... }', '#id { font-family: ... }'
-                pattern = rf'{re.escape(sel)}\s*\{{[^}}]*font-family\s*:\s*([^;}}]+)'
-                match = re.search(pattern, style_rules_text, re.IGNORECASE)
-                if match:
-                    return match.group(1).lower()
-            return None
-
-        # 2. Walk all elements with text
-        elements_with_text = soup.find_all(lambda tag: tag.name not in ['script', 'style', 'noscript'] and tag.get_text(strip=True))
-        non_noto_elements = []
-        for elem in elements_with_text:
-            # a. Inline style
-            style_attr = elem.get('style', '')
-            font = get_font_from_style_attr(style_attr)
-            # b. Internal <style> rules
-            if not font:
-                font = get_font_from_style_rules(elem.name, elem.get('class', []), elem.get('id', None))
-            # c. If still not found, skip (can't reliably determine)
-            if not font:
-                continue
-            if 'noto sans' not in font:
-                non_noto_elements.append({
-                    'tag': elem.name,
-                    'text': elem.get_text(strip=True)[:100],
-                    'font_family': font
-                })
-        uses_noto_sans_only = len(non_noto_elements) == 0
-        success = uses_noto_sans_only
-        message = 'All visible text uses Noto Sans.' if uses_noto_sans_only else f"{len(non_noto_elements)} elements do not use Noto Sans."
+        try:
+            snapshot = await get_render_snapshot(url)
+        except Exception as e:
+            logger.warning(f"Rendering {url} failed ({e}); checking fonts from the stylesheets instead")
+            return await static_noto_sans_check(url)
 
-        response_data = {
-            'success': success,
-            'uses_noto_sans_only': uses_noto_sans_only,
-            'non_noto_elements': non_noto_elements,
-            'detected_fonts': {
-                'font_families': list(font_families),
-                'font_faces': font_faces,
-                'google_fonts_used': google_fonts_used,
-                'system_fonts_used': system_fonts_used
-            },
-            'message': message,
-            'timestamp': datetime.utcnow().isoformat(),
+        # DOM font-family check for Noto Sans
+        fonts_used = snapshot.fonts
+        all_families_list = font_families_of(fonts_used)
+
+        noto_sans_used = all("noto sans" in font for font in fonts_used)
+        font_details = fonts_used
+
+        return {
+            "success": noto_sans_used,
+            "all_text_noto_sans": noto_sans_used,
+            "font_families_detected": all_families_list,
+            "font_family_strings": font_details,
+            "message": "All visible text uses Noto Sans." if noto_sans_used else "Some elements do not use Noto Sans.",
         }
-        if font_families:
-            response_data['detected_fonts']['primary_fonts'] = list(font_families)[:3]
-            if len(font_families) > 3:
-                response_data['detected_fonts']['primary_fonts'].append(f'+{len(font_families)-3} more')
-        return response_data
         
-    except requests.RequestException as e:
+    except httpx.HTTPError as e:
         raise HTTPException(status_code=400, detail=f"Error fetching URL: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
+# --- ONE-SHOT FULL AUDIT ---
+import json
+import uuid
+
+AUDIT_RESOURCE_LOADERS = {
+    'html': get_page,
+    'render': get_render_snapshot,
+    'assets': get_image_inventory,
+}
+
+AUDIT_CHECKS = [
+    AuditCheck(1, verify_color_palette_selection, ('browser',)),
+    AuditCheck(2, verify_government_entity_color),
+    AuditCheck(3, verify_iconography_color),
+    AuditCheck(4, verify_footer_color, ('screenshot',), url_run=verify_footer_color_url),
+    AuditCheck(5, verify_cta_buttons, ('html',)),
+    AuditCheck(6, verify_highlight_backgrounds),
+    AuditCheck(7, partial(verify_brand_color_consideration, None)),
+    AuditCheck(8, verify_digital_use_only),
+    AuditCheck(9, verify_text_color, ('screenshot',)),
+    AuditCheck(10, verify_logo_lockups, ('screenshot',), url_run=verify_logo_lockups_url),
+    AuditCheck(11, verify_primary_backgrounds, ('browser',)),
+    AuditCheck(12, verify_state_emblem_usage, ('screenshot',), url_run=verify_state_emblem_usage_url),
+    AuditCheck(20, verify_noto_sans, ('render',)),
+    AuditCheck(32, verify_background_image_size, ('html', 'assets')),
+    AuditCheck(33, verify_banner_image_size, ('html', 'assets')),
+    AuditCheck(34, verify_thumbnail_image_size, ('html', 'assets')),
+    AuditCheck(35, verify_image_format, ('html', 'assets')),
+    AuditCheck(36, verify_high_res_image, ('html', 'assets')),
+    AuditCheck(37, verify_alt_text, ('html',)),
+    AuditCheck(38, verify_alt_text_length, ('html',)),
+    AuditCheck(54, verify_server_response_time, ('network',)),
+    AuditCheck(55, verify_browser_caching, ('html',)),
+    AuditCheck(56, verify_image_optimization, ('html', 'assets', 'render')),
+    AuditCheck(57, verify_js_optimization, ('render',)),
+    AuditCheck(58, verify_browser_preloading, ('render',)),
+    AuditCheck(59, verify_lazy_loading, ('render',)),
+    AuditCheck(60, verify_resource_order, ('render',)),
+    AuditCheck(61, verify_critical_resources, ('render',)),
+    AuditCheck(62, verify_async_scripts, ('render',)),
+    AuditCheck(63, verify_responsiveness, ('render',)),
+    AuditCheck(64, verify_cdn, ('html',)),
+    AuditCheck(65, verify_cache_headers, ('html',)),
+]
+
+def as_verification_result(result: Any) -> VerificationResult:
+    """Coerce the different shapes the verify endpoints return into a VerificationResult."""
+    if isinstance(result, VerificationResult):
+        return result
+    if isinstance(result, JSONResponse):
+        result = json.loads(result.body)
+        result.setdefault('message', result.get('error', ''))
+    result = dict(result)
+    success = bool(result.pop('success', False))
+    message = str(result.pop('message', ''))
+    timestamp = result.pop('timestamp', None) or get_timestamp()
+    return VerificationResult(success=success, message=message, timestamp=timestamp, details=result)
+
+@app.post("/api/audit", response_model=AuditResult)
+async def run_full_audit(
+    url: str = Form(..., description="URL of the website to audit"),
+    footer_screenshot: Optional[UploadFile] = File(None),
+    text_screenshot: Optional[UploadFile] = File(None),
+    logo_screenshot: Optional[UploadFile] = File(None),
+    emblem_screenshot: Optional[UploadFile] = File(None),
+):
+    """
+    Run every applicable DBIM check against one site in a single request.
+    Checks sharing a resource (page HTML, render snapshot, image probes)
+    reuse one fetch of it, and independent checks run concurrently.
+    Screenshot-based checks run only when their screenshot is uploaded.
+    """
+    uploads = {
+        gid: upload
+        for gid, upload in ((4, footer_screenshot), (9, text_screenshot),
+                            (10, logo_screenshot), (12, emblem_screenshot))
+        if upload is not None
+    }
+    audit = await run_audit(url, AUDIT_CHECKS, AUDIT_RESOURCE_LOADERS, uploads)
+
+    results = {gid: as_verification_result(r) for gid, r in sorted(audit['results'].items())}
+    audit_id = uuid.uuid4().hex
+    audit_results.put(audit_id, results)
+    verification_results.update(results)
+
+    failed = [gid for gid, r in results.items() if not r.success]
+    return AuditResult(
+        audit_id=audit_id,
+        url=url,
+        success=not failed,
+        message=(f"All {len(results)} checks passed." if not failed
+                 else f"{len(failed)} of {len(results)} checks failed: {', '.join(map(str, failed))}"),
+        timestamp=get_timestamp(),
+        duration_ms=audit['duration_ms'],
+        results=results,
+        skipped=audit['skipped'],
+        resource_timings_ms=audit['resource_timings_ms'],
+        check_timings_ms=audit['check_timings_ms'],
+    )
+
+@app.get("/api/audit/{audit_id}")
+async def get_audit_results(audit_id: str) -> Dict[int, Dict[str, Any]]:
+    """Get the verification results of one audit"""
+    results = audit_results.peek(audit_id)
+    if results is None:
+        raise HTTPException(status_code=404, detail="Audit not found")
+    return {k: v.dict() for k, v in results.items()}
+
 # Serve static files from the frontend build directory
 frontend_path = Path(__file__).parent / "frontend" / "build"
 if frontend_path.exists():
@@ -0,0 +1,116 @@
+"""
+Approximate pixel shares from stratified samples, with confidence bounds.
+
+The percent-white (guideline 11) and percent-black (guidelines 10 and 12)
+checks only need to know which side of a threshold a share of pixels lies
+on. In sampling mode they draw pixels a batch at a time, spread over a grid
+of strata in proportion to each cell's area, and stop as soon as the Wilson
+score interval around the share clears the threshold. Proportional
+allocation keeps the pooled sample self-weighting, so the interval is
+computed from the pooled counts.
+"""
+import math
+import os
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+# Sampling settings, overridable through the environment. The interval is
+# checked after every batch, so the default z (99.9% two-sided) is stricter
+# than a single look would need.
+PIXEL_SAMPLING = os.getenv('DBIM_PIXEL_SAMPLING', '0') == '1'
+SAMPLING_Z = float(os.getenv('DBIM_SAMPLING_Z', '3.29'))
+SAMPLING_BATCH = int(os.getenv('DBIM_SAMPLING_BATCH', '4096'))
+SAMPLING_MAX_SAMPLES = int(os.getenv('DBIM_SAMPLING_MAX_SAMPLES', '65536'))
+# Frames with fewer pixels than this are cheaper to scan exactly
+SAMPLING_MIN_PIXELS = int(os.getenv('DBIM_SAMPLING_MIN_PIXELS', str(4 * 65536)))
+# Strata: the frame is cut into at most SAMPLING_GRID x SAMPLING_GRID cells
+SAMPLING_GRID = 8
+
+
+def wilson_interval(hits: int, trials: int, z: float = SAMPLING_Z) -> Tuple[float, float]:
+    """Wilson score interval for a share of ``hits`` in ``trials``; (0, 1) with no trials."""
+    if trials == 0:
+        return 0.0, 1.0
+    share = hits / trials
+    denominator = 1 + z * z / trials
+    centre = (share + z * z / (2 * trials)) / denominator
+    half_width = z * math.sqrt(share * (1 - share) / trials + z * z / (4 * trials * trials)) / denominator
+    return max(0.0, centre - half_width), min(1.0, centre + half_width)
+
+
+def stratified_points(height: int, width: int, count: int, rng: np.random.Generator,
+                      grid: int = SAMPLING_GRID) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    About ``count`` random (row, column) positions in a ``height`` x ``width``
+    frame, each grid cell receiving a share proportional to its area.
+    """
+    row_edges = np.linspace(0, height, min(grid, height) + 1).astype(np.int64)
+    col_edges = np.linspace(0, width, min(grid, width) + 1).astype(np.int64)
+    cell_heights, cell_widths = np.diff(row_edges), np.diff(col_edges)
+    expected = np.outer(cell_heights, cell_widths).ravel() * (count / (height * width))
+    # Whole samples per cell, plus one more with probability equal to the remainder
+    per_cell = np.floor(expected).astype(np.int64)
+    per_cell += rng.random(per_cell.size) < expected - per_cell
+    cell_rows, cell_cols = np.divmod(np.repeat(np.arange(per_cell.size), per_cell), len(cell_widths))
+    rows = row_edges[cell_rows] + (rng.random(cell_rows.size) * cell_heights[cell_rows]).astype(np.int64)
+    cols = col_edges[cell_cols] + (rng.random(cell_cols.size) * cell_widths[cell_cols]).astype(np.int64)
+    return rows, cols
+
+
+class SampledShare:
+    """Running count of sampled pixels and of those meeting a condition."""
+
+    def __init__(self, z: float = SAMPLING_Z):
+        self.z = z
+        self.hits = 0
+        self.trials = 0
+
+    def add(self, hits: int, trials: int):
+        self.hits += int(hits)
+        self.trials += int(trials)
+
+    @property
+    def estimate(self) -> float:
+        return self.hits / self.trials if self.trials else 0.0
+
+    def bounds(self, coverage: float = 1.0) -> Tuple[float, float]:
+        """
+        Confidence bounds for the share over a whole region of which the
+        sample covers only ``coverage``; the rest could be anything.
+        """
+        lower, upper = wilson_interval(self.hits, self.trials, self.z)
+        return lower * coverage, upper * coverage + (1 - coverage)
+
+    def decided(self, threshold: float, coverage: float = 1.0) -> bool:
+        """True once the bounds lie entirely on one side of ``threshold``."""
+        lower, upper = self.bounds(coverage)
+        return lower >= threshold or upper < threshold
+
+    def as_dict(self, coverage: float = 1.0) -> Dict[str, Any]:
+        lower, upper = self.bounds(coverage)
+        return {
+            'estimate': round(self.estimate, 4),
+            'lower': round(lower, 4),
+            'upper': round(upper, 4),
+            'confidence': round(math.erf(self.z / math.sqrt(2)), 4),
+            'samples': self.trials,
+        }
+
+
+def sample_share(draw: Callable[[int], Tuple[int, int]], threshold: Optional[float],
+                 batch: int = SAMPLING_BATCH, max_samples: int = SAMPLING_MAX_SAMPLES) -> Tuple[SampledShare, int]:
+    """
+    Call ``draw(batch)`` -- which samples ``batch`` pixels and returns (hits,
+    trials) -- until the share is decided against ``threshold`` or
+    ``max_samples`` pixels were drawn. Without a threshold one batch is
+    drawn. Returns the share and the number of pixels drawn.
+    """
+    share = SampledShare()
+    drawn = 0
+    while drawn < max_samples:
+        share.add(*draw(batch))
+        drawn += batch
+        if threshold is None or (share.trials and share.decided(threshold)):
+            break
+    return share, drawn
@@ -0,0 +1,188 @@
+"""Single-navigation render snapshot shared by the browser-based verify endpoints."""
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from browser_pool import browser_pool
+from fetcher import AsyncLRUCache, normalize_url
+from screenshots import capture, element_clips, page_size
+
+logger = logging.getLogger(__name__)
+
+RENDER_SNAPSHOT_TTL = float(os.getenv('DBIM_RENDER_SNAPSHOT_TTL', '300'))
+RENDER_SNAPSHOT_MAX_ENTRIES = int(os.getenv('DBIM_RENDER_SNAPSHOT_MAX_ENTRIES', '32'))
+NAVIGATION_TIMEOUT_MS = int(os.getenv('DBIM_NAVIGATION_TIMEOUT_MS', '60000'))
+
+MOBILE_VIEWPORT = {"width": 375, "height": 667}
+DESKTOP_VIEWPORT = {"width": 1200, "height": 800}
+
+# Elements captured for the screenshot checks in URL mode (guidelines 4, 10 and 12):
+# name -> (selectors tried in order, padding in CSS pixels so the crop shows the surrounding background)
+ELEMENT_CAPTURES: Dict[str, Tuple[Tuple[str, ...], int]] = {
+    'footer': (('footer', '[role="contentinfo"]', '#footer', '.footer'), 0),
+    'logo': (('header img[alt*="logo" i]', 'header img[src*="logo" i]', 'header img[class*="logo" i]',
+              '[role="banner"] img[alt*="logo" i]', '.logo img', '.logo svg', '.navbar-brand img',
+              '#logo', '.logo', 'header img', '[role="banner"] img'), 8),
+    'emblem': (('img[alt*="emblem" i]', 'img[src*="emblem" i]', 'img[alt*="ashoka" i]', 'img[src*="ashoka" i]',
+                'img[alt*="satyamev" i]', 'img[src*="satyamev" i]', '[class*="emblem"] img', '[class*="emblem"]'), 8),
+}
+
+# Everything the guideline 20 and 56-63 checks read from the DOM, in one round-trip
+SNAPSHOT_SCRIPT = '''() => {
+    const viewportWidth = window.innerWidth;
+    const viewportHeight = window.innerHeight;
+
+    const images = Array.from(document.images).map(img => {
+        const rect = img.getBoundingClientRect();
+        return {
+            src: img.src,
+            width: img.naturalWidth,
+            height: img.naturalHeight,
+            size: img.src.length,
+            loading: img.loading,
+            alt: img.getAttribute('alt'),
+            rendered_width: rect.width,
+            rendered_height: rect.height,
+            above_fold: rect.top < viewportHeight && rect.left < viewportWidth
+        };
+    });
+
+    const scripts = Array.from(document.scripts).map(s => ({
+        src: s.src,
+        inline: !s.src,
+        async: s.async,
+        defer: s.defer,
+        type: s.type,
+        length: s.innerText.length
+    }));
+
+    let cssBeforeJs = true;
+    let foundCss = false;
+    let blockingJs = false;
+    let totalScripts = 0;
+    let deferScripts = 0;
+    let asyncScripts = 0;
+    for (let el of Array.from(document.head.children)) {
+        if (el.tagName === 'LINK' && el.rel === 'stylesheet') {
+            foundCss = true;
+        }
+        if (el.tagName === 'SCRIPT') {
+            totalScripts++;
+            if (el.defer) deferScripts++;
+            if (el.async) asyncScripts++;
+            if (!el.defer && !el.async && (!el.type || el.type === 'text/javascript')) {
+                if (!foundCss) cssBeforeJs = false;
+                blockingJs = true;
+            }
+        }
+    }
+
+    const preloadLinks = Array.from(document.querySelectorAll('link[rel="preload"],link[rel="prefetch"]'))
+        .map(l => l.outerHTML);
+    const preloadResources = Array.from(document.querySelectorAll('link[rel="preload"]'))
+        .map(link => ({href: link.href, as: link.as}));
+
+    const lazy = {
+        image_count: document.querySelectorAll('img[loading="lazy"], img.lazy, img[data-src]').length,
+        iframe_count: document.querySelectorAll('iframe[loading="lazy"], iframe.lazy, iframe[data-src]').length,
+        video_count: document.querySelectorAll('video[loading="lazy"], video.lazy, source[data-src]').length
+    };
+
+    const criticalCss = Array.from(document.head.querySelectorAll('style'))
+        .map(s => s.innerText.length)
+        .reduce((a, b) => a + b, 0);
+
+    const fonts = new Set();
+    document.querySelectorAll("body *").forEach(el => {
+        const style = window.getComputedStyle(el);
+        if (style && style.fontFamily) {
+            fonts.add(style.fontFamily.toLowerCase());
+        }
+    });
+
+    return {
+        images,
+        scripts,
+        resource_order: {cssBeforeJs, blockingJs, totalScripts, deferScripts, asyncScripts},
+        preload_links: preloadLinks,
+        preload_resources: preloadResources,
+        lazy,
+        critical_css: criticalCss,
+        fonts: Array.from(fonts)
+    };
+}'''
+
+
+class RenderSnapshot:
+    """The result of loading a page once in Chromium and reading its DOM."""
+
+    def __init__(self, url: str, data: Dict[str, Any], mobile_width: int, desktop_width: int,
+                 elements: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.url = url
+        self.images: List[Dict[str, Any]] = data['images']
+        self.scripts: List[Dict[str, Any]] = data['scripts']
+        self.resource_order: Dict[str, Any] = data['resource_order']
+        self.preload_links: List[str] = data['preload_links']
+        self.preload_resources: List[Dict[str, str]] = data['preload_resources']
+        self.lazy: Dict[str, int] = data['lazy']
+        self.critical_css: int = data['critical_css']
+        self.fonts: List[str] = data['fonts']
+        self.mobile_width = mobile_width
+        self.desktop_width = desktop_width
+        # name -> {'selector', 'clip', 'png'} for each ELEMENT_CAPTURES element found on the page
+        self.elements: Dict[str, Dict[str, Any]] = elements or {}
+
+    @property
+    def above_fold_images(self) -> List[Dict[str, Any]]:
+        return [{'src': img['src'], 'loading': img['loading']} for img in self.images if img['above_fold']]
+
+
+async def capture_elements(page) -> Dict[str, Dict[str, Any]]:
+    """
+    Element-clipped PNG screenshots of the ELEMENT_CAPTURES elements, at the
+    current viewport. All elements are located in one evaluate, without
+    waiting, and only those found are captured.
+    """
+    width, height = await page_size(page)
+    try:
+        found = await element_clips(page, {name: selectors for name, (selectors, _) in ELEMENT_CAPTURES.items()},
+                                    min_width=8, min_height=8)
+    except Exception as e:
+        logger.warning(f"Could not locate the captured elements: {e}")
+        return {}
+    elements = {}
+    for name, (selector, clip) in found.items():
+        padding = ELEMENT_CAPTURES[name][1]
+        try:
+            x, y = max(0, clip['x'] - padding), max(0, clip['y'] - padding)
+            clip = {'x': x, 'y': y,
+                    'width': min(width, clip['x'] + clip['width'] + padding) - x,
+                    'height': min(height, clip['y'] + clip['height'] + padding) - y}
+            # PNG keeps colours exact for the footer / logo / emblem analysis
+            elements[name] = {'selector': selector, 'clip': clip, 'png': await capture(page, clip, 'png')}
+        except Exception as e:
+            logger.warning(f"Could not capture the {name} element: {e}")
+    return elements
+
+
+async def capture_render_snapshot(url: str) -> RenderSnapshot:
+    """Navigate to ``url`` once and collect everything the browser checks need."""
+    async with browser_pool.page() as page:
+        await page.goto(url, wait_until='networkidle', timeout=NAVIGATION_TIMEOUT_MS)
+        data = await page.evaluate(SNAPSHOT_SCRIPT)
+        # Responsiveness: compare layout width across viewports without reloading
+        await page.set_viewport_size(MOBILE_VIEWPORT)
+        mobile_width = await page.evaluate('''() => document.body.scrollWidth''')
+        await page.set_viewport_size(DESKTOP_VIEWPORT)
+        desktop_width = await page.evaluate('''() => document.body.scrollWidth''')
+        elements = await capture_elements(page)
+    return RenderSnapshot(url, data, mobile_width, desktop_width, elements)
+
+
+render_snapshot_cache = AsyncLRUCache(RENDER_SNAPSHOT_TTL, RENDER_SNAPSHOT_MAX_ENTRIES)
+
+
+async def get_render_snapshot(url: str) -> RenderSnapshot:
+    """Return the render snapshot for ``url``, loading the page at most once per TTL."""
+    key = normalize_url(url)
+    return await render_snapshot_cache.get_or_fetch(key, lambda: capture_render_snapshot(key))
@@ -0,0 +1,113 @@
+"""
+In-memory, clipped and tiled screenshots for the pixel-based URL checks.
+
+Screenshots never touch the disk: each capture is clipped to the region a
+check looks at and returned as an encoded buffer, then decoded in a thread.
+Tall regions are captured in tiles of SCREENSHOT_TILE_HEIGHT CSS pixels,
+so memory use is bounded by one tile however long the page is.
+"""
+import logging
+import os
+from typing import Any, AsyncIterator, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from image_pool import image_pool
+
+logger = logging.getLogger(__name__)
+
+# Capture settings, overridable through the environment. JPEG buffers are
+# cheaper to encode and decode than PNG; colour-exact checks ask for 'png'.
+SCREENSHOT_FORMAT = os.getenv('DBIM_SCREENSHOT_FORMAT', 'jpeg')
+SCREENSHOT_QUALITY = int(os.getenv('DBIM_SCREENSHOT_QUALITY', '90'))
+SCREENSHOT_TILE_HEIGHT = int(os.getenv('DBIM_SCREENSHOT_TILE_HEIGHT', '2000'))
+SCREENSHOT_MAX_HEIGHT = int(os.getenv('DBIM_SCREENSHOT_MAX_HEIGHT', '20000'))
+
+# Content landmarks tried, in order, as the region of a page's primary background
+# when DBIM_PRIMARY_BACKGROUND_REGION is 'landmark'; by default ('central') the
+# central 60% of the page is measured
+MAIN_CONTENT_SELECTORS = ('main', '[role="main"]', '#main-content', '#content')
+PRIMARY_BACKGROUND_REGION = os.getenv('DBIM_PRIMARY_BACKGROUND_REGION', 'central')
+
+# For each name, the first rendered element (in selector order, then document
+# order) at least minWidth x minHeight, as a rect in page coordinates. Runs in
+# one round-trip and never waits for elements to appear.
+ELEMENT_RECTS_SCRIPT = '''([groups, minWidth, minHeight]) => {
+    const found = {};
+    for (const [name, selectors] of Object.entries(groups)) {
+        search: for (const selector of selectors) {
+            let elements;
+            try {
+                elements = document.querySelectorAll(selector);
+            } catch (e) {
+                continue;
+            }
+            for (const el of elements) {
+                const style = getComputedStyle(el);
+                if (style.visibility === 'hidden' || parseFloat(style.opacity) === 0) continue;
+                const rect = el.getBoundingClientRect();
+                if (rect.width < minWidth || rect.height < minHeight) continue;
+                found[name] = {
+                    selector,
+                    clip: {x: rect.left + window.scrollX, y: rect.top + window.scrollY,
+                           width: rect.width, height: rect.height},
+                };
+                break search;
+            }
+        }
+    }
+    return found;
+}'''
+
+Clip = Dict[str, float]
+
+
+async def page_size(page) -> Tuple[int, int]:
+    """Full scrollable width and height of the page in CSS pixels."""
+    width, height = await page.evaluate(
+        "[document.documentElement.scrollWidth, document.documentElement.scrollHeight]")
+    return int(width), int(height)
+
+
+def central_clip(width: int, height: int, margin: float = 0.2) -> Clip:
+    """The central region of a ``width`` x ``height`` page, ``margin`` in from each edge."""
+    x, y = int(margin * width), int(margin * height)
+    return {'x': x, 'y': y, 'width': max(1, width - 2 * x), 'height': max(1, height - 2 * y)}
+
+
+async def element_clips(page, groups: Dict[str, Sequence[str]], min_width: int = 1,
+                        min_height: int = 1) -> Dict[str, Tuple[str, Clip]]:
+    """
+    For each name in ``groups``, the selector and page-coordinate clip of the
+    first visible element matching one of its selectors that is at least
+    ``min_width`` x ``min_height``. Names with no such element are left out.
+    """
+    found = await page.evaluate(ELEMENT_RECTS_SCRIPT, [{name: list(selectors) for name, selectors in groups.items()},
+                                                       min_width, min_height])
+    return {name: (match['selector'], match['clip']) for name, match in (found or {}).items()}
+
+
+async def element_clip(page, selectors: Sequence[str], min_width: int = 1,
+                       min_height: int = 1) -> Optional[Tuple[str, Clip]]:
+    """element_clips for a single list of selectors."""
+    return (await element_clips(page, {'element': selectors}, min_width, min_height)).get('element')
+
+
+async def capture(page, clip: Clip, image_type: str = SCREENSHOT_FORMAT) -> bytes:
+    """Encoded screenshot of ``clip`` (page coordinates), held in memory."""
+    options: Dict[str, Any] = {'clip': clip, 'full_page': True, 'type': image_type}
+    if image_type == 'jpeg':
+        options['quality'] = SCREENSHOT_QUALITY
+    return await page.screenshot(**options)
+
+
+async def iter_tiles(page, clip: Clip, image_type: str = SCREENSHOT_FORMAT,
+                     tile_height: int = SCREENSHOT_TILE_HEIGHT,
+                     max_height: int = SCREENSHOT_MAX_HEIGHT) -> AsyncIterator[np.ndarray]:
+    """Capture ``clip`` top to bottom in tiles and yield each one decoded to an RGB frame."""
+    bottom = min(clip['y'] + clip['height'], max_height)
+    top = clip['y']
+    while top < bottom:
+        tile = {'x': clip['x'], 'y': top, 'width': clip['width'], 'height': min(tile_height, bottom - top)}
+        yield await image_pool.decode(await capture(page, tile, image_type))
+        top += tile_height
@@ -0,0 +1,166 @@
+"""
+Linked stylesheet fetching with a validator-aware shared cache.
+
+Stylesheets referenced by ``<link rel=stylesheet>`` are fetched
+concurrently and parsed once (css_index.ParsedStylesheet). Parsed sheets
+are cached by URL across pages and audits; once an entry is older than
+STYLESHEET_FRESH_SECONDS it is revalidated with If-None-Match /
+If-Modified-Since, and a 304 keeps the already-parsed rules.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, List, Optional
+from urllib.parse import urljoin
+
+import httpx
+from bs4 import BeautifulSoup
+
+from css_index import ParsedStylesheet, StylesheetIndex, set_stylesheet_index
+from fetcher import AsyncLRUCache, http_client
+
+logger = logging.getLogger(__name__)
+
+# Stylesheet cache settings, overridable through the environment
+STYLESHEET_FRESH_SECONDS = float(os.getenv('DBIM_STYLESHEET_FRESH_SECONDS', '300'))
+STYLESHEET_CACHE_TTL = float(os.getenv('DBIM_STYLESHEET_CACHE_TTL', str(24 * 60 * 60)))
+STYLESHEET_CACHE_MAX_ENTRIES = int(os.getenv('DBIM_STYLESHEET_CACHE_MAX_ENTRIES', '512'))
+STYLESHEET_CACHE_MAX_BYTES = int(os.getenv('DBIM_STYLESHEET_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+STYLESHEET_MAX_BYTES = int(os.getenv('DBIM_STYLESHEET_MAX_BYTES', str(2 * 1024 * 1024)))
+STYLESHEET_MAX_PER_PAGE = int(os.getenv('DBIM_STYLESHEET_MAX_PER_PAGE', '20'))
+STYLESHEET_TIMEOUT = float(os.getenv('DBIM_STYLESHEET_TIMEOUT', '10'))
+
+
+class CachedStylesheet:
+    """A parsed stylesheet and the validators needed to revalidate it."""
+
+    def __init__(self, url: str, sheet: ParsedStylesheet, etag: Optional[str], last_modified: Optional[str]):
+        self.url = url
+        self.sheet = sheet
+        self.etag = etag
+        self.last_modified = last_modified
+        self.validated_at = time.monotonic()
+
+    @property
+    def fresh(self) -> bool:
+        return time.monotonic() - self.validated_at < STYLESHEET_FRESH_SECONDS
+
+    def validators(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+def find_stylesheet_urls(soup: BeautifulSoup, base_url: str) -> Dict[str, str]:
+    """Map each ``<link rel=stylesheet>`` href to its absolute URL, in document order."""
+    links: Dict[str, str] = {}
+    for link in soup.find_all('link', href=True):
+        rel = link.get('rel') or []
+        rel = rel if isinstance(rel, list) else rel.split()
+        if 'stylesheet' not in [r.lower() for r in rel] or 'alternate' in [r.lower() for r in rel]:
+            continue
+        if (link.get('media') or '').strip().lower() == 'print':
+            continue
+        href = link['href']
+        if href.startswith('data:') or href in links:
+            continue
+        links[href] = urljoin(base_url, href)
+        if len(links) >= STYLESHEET_MAX_PER_PAGE:
+            break
+    return links
+
+
+class StylesheetCache(AsyncLRUCache):
+    """Shared cache of parsed stylesheets keyed by absolute URL."""
+
+    def __init__(self):
+        super().__init__(STYLESHEET_CACHE_TTL, STYLESHEET_CACHE_MAX_ENTRIES, STYLESHEET_CACHE_MAX_BYTES,
+                         sizeof=lambda entry: entry.sheet.size)
+        self.revalidated = 0
+        self.refetched = 0
+
+    async def _download(self, url: str, stale: Optional[CachedStylesheet]) -> CachedStylesheet:
+        headers = stale.validators() if stale is not None else {}
+        try:
+            async with http_client.stream('GET', url, headers=headers, timeout=STYLESHEET_TIMEOUT) as response:
+                if response.status_code == 304 and stale is not None:
+                    self.revalidated += 1
+                    stale.validated_at = time.monotonic()
+                    stale.etag = response.headers.get('etag', stale.etag)
+                    stale.last_modified = response.headers.get('last-modified', stale.last_modified)
+                    return stale
+                response.raise_for_status()
+                chunks: List[bytes] = []
+                received = 0
+                async for chunk in response.aiter_bytes():
+                    received += len(chunk)
+                    if received > STYLESHEET_MAX_BYTES:
+                        raise ValueError(f"stylesheet larger than {STYLESHEET_MAX_BYTES} bytes")
+                    chunks.append(chunk)
+                text = b''.join(chunks).decode(response.encoding or 'utf-8', errors='replace')
+                etag = response.headers.get('etag')
+                last_modified = response.headers.get('last-modified')
+        except (httpx.HTTPError, ValueError):
+            if stale is not None:
+                # Keep serving the last good copy if the origin is unavailable
+                logger.warning(f"Revalidating stylesheet {url} failed; using the cached copy")
+                return stale
+            raise
+        if stale is not None:
+            self.refetched += 1
+        # Parsing a large sheet is CPU-bound; keep it off the event loop
+        sheet = await asyncio.to_thread(ParsedStylesheet, text, url)
+        return CachedStylesheet(url, sheet, etag, last_modified)
+
+    async def get(self, url: str) -> CachedStylesheet:
+        """Return the parsed stylesheet for ``url``, revalidating it when it is no longer fresh."""
+        entry = self.peek(url)
+        if entry is not None and entry.fresh:
+            self.hits += 1
+            return entry
+        if entry is not None:
+            # Callers arriving during revalidation join it through the in-flight map
+            self.discard(url)
+        return await self.get_or_fetch(url, lambda: self._download(url, entry))
+
+    def stats(self) -> Dict[str, int]:
+        stats = super().stats()
+        stats['revalidated'] = self.revalidated
+        stats['refetched'] = self.refetched
+        return stats
+
+
+stylesheet_cache = StylesheetCache()
+
+
+async def fetch_stylesheets(links: Dict[str, str]) -> Dict[str, ParsedStylesheet]:
+    """Fetch ``{href: absolute_url}`` concurrently; failed sheets are skipped."""
+    async def fetch(href: str, url: str):
+        try:
+            return href, (await stylesheet_cache.get(url)).sheet
+        except Exception as e:
+            logger.warning(f"Could not load stylesheet {url}: {e}")
+            return href, None
+
+    results = await asyncio.gather(*(fetch(href, url) for href, url in links.items()))
+    return {href: sheet for href, sheet in results if sheet is not None}
+
+
+async def load_stylesheet_index(soup: BeautifulSoup, base_url: str) -> StylesheetIndex:
+    """
+    Build the page's stylesheet index from its ``<style>`` blocks and linked
+    stylesheets and attach it to ``soup``, so the synchronous colour and font
+    lookups in utils pick it up. Built once per parsed page.
+    """
+    index = soup.__dict__.get('_stylesheet_index')
+    if index is not None and soup.__dict__.get('_stylesheet_index_linked'):
+        return index
+    linked = await fetch_stylesheets(find_stylesheet_urls(soup, base_url))
+    index = StylesheetIndex.from_soup(soup, linked)
+    set_stylesheet_index(soup, index)
+    soup.__dict__['_stylesheet_index_linked'] = True
+    return index
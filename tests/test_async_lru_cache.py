@@ -0,0 +1,111 @@
+import asyncio
+import types
+
+import pytest
+
+import fetcher
+from fetcher import AsyncLRUCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(fetcher, 'time', types.SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+
+def test_concurrent_misses_share_one_fetch():
+    cache = AsyncLRUCache(ttl=60, max_entries=8)
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return 'page'
+
+    async def main():
+        return await asyncio.gather(*(cache.get_or_fetch('k', fetch) for _ in range(5)))
+
+    assert asyncio.run(main()) == ['page'] * 5
+    assert len(calls) == 1
+    assert cache.stats()['misses'] == 1 and cache.stats()['hits'] == 4
+
+
+def test_failed_fetch_reaches_every_waiter_and_is_not_cached():
+    cache = AsyncLRUCache(ttl=60, max_entries=8)
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise ValueError('boom')
+
+    async def main():
+        return await asyncio.gather(*(cache.get_or_fetch('k', fetch) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, ValueError) for r in results)
+    assert len(calls) == 1
+    assert cache.peek('k') is None
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = AsyncLRUCache(ttl=10, max_entries=8)
+    values = iter(['first', 'second'])
+
+    async def fetch():
+        return next(values)
+
+    assert asyncio.run(cache.get_or_fetch('k', fetch)) == 'first'
+    clock.now += 10
+    assert cache.peek('k') == 'first'
+    clock.now += 0.5
+    assert cache.peek('k') is None
+    assert asyncio.run(cache.get_or_fetch('k', fetch)) == 'second'
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = AsyncLRUCache(ttl=60, max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.peek('a') == 1
+    cache.put('c', 3)
+    assert cache.peek('b') is None
+    assert (cache.peek('a'), cache.peek('c')) == (1, 3)
+
+
+def test_byte_bound():
+    cache = AsyncLRUCache(ttl=60, max_entries=10, max_bytes=10, sizeof=len)
+    cache.put('a', 'xxxx')
+    cache.put('b', 'yyyy')
+    cache.put('c', 'zzzz')
+    assert cache.peek('a') is None
+    assert cache.stats()['bytes'] == 8
+    # A value larger than the whole budget is not stored
+    cache.put('d', 'w' * 11)
+    assert cache.peek('d') is None
+
+
+def test_join_waits_for_a_fetch_in_flight():
+    cache = AsyncLRUCache(ttl=60, max_entries=8)
+
+    async def fetch():
+        await asyncio.sleep(0.01)
+        return 'render'
+
+    async def main():
+        assert await cache.join('k') is None
+        task = asyncio.ensure_future(cache.get_or_fetch('k', fetch))
+        await asyncio.sleep(0)
+        joined = await cache.join('k')
+        return joined, await task
+
+    assert asyncio.run(main()) == ('render', 'render')
@@ -0,0 +1,61 @@
+import io
+import struct
+
+import pytest
+from PIL import Image
+
+from image_headers import parse_image_header
+
+
+def encode(image_format, size=(37, 21), **params):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (200, 30, 30)).save(buffer, image_format, **params)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize('image_format, expected, params', [
+    ('PNG', 'png', {}),
+    ('JPEG', 'jpeg', {}),
+    ('GIF', 'gif', {}),
+    ('BMP', 'bmp', {}),
+    ('WEBP', 'webp', {}),
+    ('WEBP', 'webp', {'lossless': True}),
+])
+def test_raster_formats(image_format, expected, params):
+    header = parse_image_header(encode(image_format, **params))
+    assert header == (expected, 37, 21, True)
+
+
+def test_jpeg_frame_header_after_large_segment():
+    data = encode('JPEG', exif=b'Exif\x00\x00' + b'\x00' * 20000)
+    assert parse_image_header(data) == ('jpeg', 37, 21, True)
+    # Cut inside the EXIF segment: the format is known, the size is not yet
+    assert parse_image_header(data[:4096]) == ('jpeg', None, None, False)
+
+
+def test_truncated_png_is_incomplete():
+    assert parse_image_header(encode('PNG')[:16]) == ('png', None, None, False)
+
+
+def test_too_short_to_identify():
+    assert parse_image_header(b'\x89PNG') == (None, None, None, False)
+
+
+def test_avif_ispe():
+    ftyp = struct.pack('>I', 24) + b'ftypavif' + b'\x00\x00\x00\x00' + b'mif1avif'
+    ispe = struct.pack('>I', 20) + b'ispe' + b'\x00\x00\x00\x00' + struct.pack('>II', 640, 480)
+    assert parse_image_header(ftyp + b'\x00' * 40 + ispe) == ('avif', 640, 480, True)
+    assert parse_image_header(ftyp) == ('avif', None, None, False)
+
+
+@pytest.mark.parametrize('markup, size', [
+    ('<svg xmlns="http://www.w3.org/2000/svg" width="120px" height="40">', (120, 40)),
+    ('<?xml version="1.0"?>\n<svg viewBox="0 0 300 150.4">', (300, 150)),
+])
+def test_svg_dimensions(markup, size):
+    assert parse_image_header(markup.encode()) == ('svg', *size, True)
+
+
+def test_html_error_page_is_not_an_image():
+    header = parse_image_header(b'<!DOCTYPE html><html><body>Not found</body></html>')
+    assert header.format is None and header.complete
@@ -0,0 +1,51 @@
+from bs4 import BeautifulSoup
+
+from image_inventory import ImageInventory, evaluate_size_limit, img_alt_texts
+
+KB = 1024
+
+
+def inventory_of(*images):
+    inventory = ImageInventory('https://example.gov.in/')
+    for name, roles, size, error in images:
+        image = inventory.add(f'/img/{name}', 'img_tag')
+        image.roles.update(roles)
+        image.size_bytes = size
+        image.error = error
+    return inventory
+
+
+def test_all_within_limit():
+    result = evaluate_size_limit(inventory_of(('a.png', {'thumbnail'}, 90 * KB, None),
+                                              ('b.png', set(), 900 * KB, None)), 34)
+    assert result['success']
+    assert (result['checked_images'], result['oversized_images'], result['unverified_images']) == (1, 0, 0)
+    assert result['message'] == 'All 1 thumbnail images are within 100 KB.'
+
+
+def test_oversized_image_fails():
+    result = evaluate_size_limit(inventory_of(('a.png', {'thumbnail'}, 90 * KB, None),
+                                              ('b.png', {'thumbnail'}, 101 * KB, None)), 34)
+    assert not result['success']
+    assert result['oversized_images'] == 1
+    assert [d['within_limit'] for d in result['details']] == [True, False]
+
+
+def test_images_without_a_size_are_unverified():
+    result = evaluate_size_limit(inventory_of(('a.jpg', set(), 1024 * KB, None),
+                                              ('b.jpg', set(), None, 'timed out'),
+                                              ('c.jpg', set(), 0, None)), 36)
+    assert not result['success']
+    assert (result['oversized_images'], result['unverified_images']) == (0, 2)
+    assert result['message'] == 'No images measured exceed 5 MB. 2 of 3 could not be measured.'
+    assert 'within_limit' not in result['details'][1]
+
+
+def test_alt_texts_in_document_order():
+    soup = BeautifulSoup('<img src="/a.png" alt="A"><img src=""><img src="b.png"><img src="/a.png" alt="">',
+                         'html.parser')
+    assert img_alt_texts(soup, 'https://example.gov.in/x/') == [
+        ('https://example.gov.in/a.png', 'A'),
+        ('https://example.gov.in/x/b.png', None),
+        ('https://example.gov.in/a.png', ''),
+    ]
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+import image_kernels
+from image_kernels import (DELTA_E, color_histogram, median_cut, pack_rgb, rgb_to_lab, top_colors,
+                           unpack_rgb)
+
+
+def test_pack_roundtrip():
+    pixels = np.array([[0, 0, 0], [255, 128, 1], [18, 52, 86]], dtype=np.uint8)
+    assert pack_rgb(pixels).tolist() == [0x000000, 0xFF8001, 0x123456]
+    assert np.array_equal(unpack_rgb(pack_rgb(pixels)), pixels)
+
+
+def test_color_histogram_counts_and_mask():
+    frame = np.zeros((4, 5, 3), dtype=np.uint8)
+    frame[0, :] = (255, 255, 255)
+    frame[1, :2] = (10, 20, 30)
+    colors, counts = color_histogram(frame)
+    assert dict(zip(colors.tolist(), counts.tolist())) == {0x000000: 13, 0x0A141E: 2, 0xFFFFFF: 5}
+
+    mask = np.zeros((4, 5), dtype=bool)
+    mask[:2] = True
+    colors, counts = color_histogram(frame, mask)
+    assert dict(zip(colors.tolist(), counts.tolist())) == {0x000000: 3, 0x0A141E: 2, 0xFFFFFF: 5}
+    assert top_colors(colors, counts, 2) == [((255, 255, 255), 5), ((0, 0, 0), 3)]
+
+
+def test_color_histogram_chunked_matches_single_pass(monkeypatch):
+    rng = np.random.default_rng(7)
+    frame = rng.integers(0, 4, size=(64, 50, 3), dtype=np.uint8) * 60
+    expected = color_histogram(frame)
+    monkeypatch.setattr(image_kernels, 'HISTOGRAM_CHUNK_PIXELS', 333)
+    colors, counts = color_histogram(frame)
+    assert np.array_equal(colors, expected[0])
+    assert np.array_equal(counts, expected[1])
+    assert counts.dtype == np.int64 and counts.sum() == 64 * 50
+
+
+def test_median_cut_separates_clusters():
+    colors = np.array([[250, 0, 0], [255, 5, 5], [0, 0, 250], [5, 5, 255]])
+    weights = np.array([3, 1, 2, 2])
+    clusters = median_cut(colors, weights, 2)
+    assert [weight for _, weight in clusters] == [4.0, 4.0]
+    means = sorted(tuple(np.round(mean, 2)) for mean, _ in clusters)
+    assert means == [(2.5, 2.5, 252.5), (251.25, 1.25, 1.25)]
+
+
+def test_median_cut_edge_cases():
+    assert median_cut(np.zeros((2, 3)), np.zeros(2), 4) == []
+    clusters = median_cut(np.array([[10, 10, 10]]), np.array([5]), 4)
+    assert len(clusters) == 1 and clusters[0][1] == 5.0
+
+
+def test_lab_reference_values():
+    lab = rgb_to_lab(np.array([[255, 255, 255], [0, 0, 0], [255, 0, 0]], dtype=np.uint8))
+    assert lab[0] == pytest.approx([100, 0, 0], abs=0.01)
+    assert lab[1] == pytest.approx([0, 0, 0], abs=0.01)
+    assert lab[2] == pytest.approx([53.24, 80.09, 67.20], abs=0.05)
+
+
+# Pairs from Sharma, Wu and Dalal, "The CIEDE2000 colour-difference formula" (2005)
+SHARMA_PAIRS = [
+    ((50.0, 2.6772, -79.7751), (50.0, 0.0, -82.7485), 2.0425),
+    ((50.0, 3.1571, -77.2803), (50.0, 0.0, -82.7485), 2.8615),
+    ((50.0, -1.3802, -84.2814), (50.0, 0.0, -82.7485), 1.0000),
+    ((50.0, 2.5, 0.0), (73.0, 25.0, -18.0), 27.1492),
+    ((50.0, 2.5, 0.0), (50.0, 0.0, -2.5), 4.3065),
+    ((60.2574, -34.0099, 36.2677), (60.4626, -34.1751, 39.4387), 1.2644),
+    ((2.0776, 0.0795, -1.1350), (0.9033, -0.0636, -0.5514), 0.9082),
+]
+
+
+def test_ciede2000_reference_pairs():
+    lab1 = np.array([pair[0] for pair in SHARMA_PAIRS])
+    lab2 = np.array([pair[1] for pair in SHARMA_PAIRS])
+    expected = [pair[2] for pair in SHARMA_PAIRS]
+    assert DELTA_E['ciede2000'](lab1, lab2) == pytest.approx(expected, abs=1e-4)
+    # Symmetric in its arguments
+    assert DELTA_E['ciede2000'](lab2, lab1) == pytest.approx(expected, abs=1e-4)
+
+
+def test_cie76_is_euclidean():
+    assert DELTA_E['cie76'](np.array([50.0, 0, 0]), np.array([53.0, 4.0, 0])) == pytest.approx(5.0)
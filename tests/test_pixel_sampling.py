@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from pixel_sampling import SampledShare, sample_share, stratified_points, wilson_interval
+
+
+def test_wilson_reference_values():
+    assert wilson_interval(50, 100, 1.96) == pytest.approx((0.4038, 0.5962), abs=1e-4)
+    assert wilson_interval(0, 10, 1.96) == pytest.approx((0.0, 0.2775), abs=1e-4)
+    assert wilson_interval(10, 10, 1.96) == pytest.approx((0.7225, 1.0), abs=1e-4)
+
+
+def test_wilson_without_trials_is_uninformative():
+    assert wilson_interval(0, 0) == (0.0, 1.0)
+
+
+def test_wilson_narrows_with_more_trials():
+    narrow = wilson_interval(300, 1000, 3.29)
+    wide = wilson_interval(30, 100, 3.29)
+    assert wide[0] < narrow[0] < 0.3 < narrow[1] < wide[1]
+
+
+def test_partial_coverage_widens_bounds():
+    share = SampledShare(z=1.96)
+    share.add(50, 100)
+    lower, upper = share.bounds(coverage=0.5)
+    assert lower == pytest.approx(0.4038 * 0.5, abs=1e-4)
+    assert upper == pytest.approx(0.5962 * 0.5 + 0.5, abs=1e-4)
+    assert share.decided(0.2) and not share.decided(0.5)
+
+
+def test_stratified_points_cover_every_cell():
+    rows, cols = stratified_points(800, 800, 6400, np.random.default_rng(1))
+    assert abs(rows.size - 6400) < 64
+    assert rows.min() >= 0 and rows.max() < 800 and cols.min() >= 0 and cols.max() < 800
+    cells = np.bincount((rows // 100) * 8 + cols // 100, minlength=64)
+    assert cells.min() >= 99
+
+
+def test_sample_share_stops_once_decided():
+    share, drawn = sample_share(lambda n: (n, n), threshold=0.5, batch=100, max_samples=10_000)
+    assert drawn == 100 and share.estimate == 1.0
+    share, drawn = sample_share(lambda n: (n // 2, n), threshold=0.5, batch=100, max_samples=1000)
+    assert drawn == 1000 and share.trials == 1000
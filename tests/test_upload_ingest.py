@@ -0,0 +1,42 @@
+import asyncio
+
+import pytest
+
+import upload_ingest
+from upload_ingest import UploadTooLarge, read_upload
+
+
+class FakeUpload:
+    def __init__(self, data, size=None):
+        self.data = data
+        self.size = size
+        self.offset = 0
+
+    async def read(self, n):
+        chunk = self.data[self.offset:self.offset + n]
+        self.offset += len(chunk)
+        return chunk
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(upload_ingest, 'UPLOAD_READ_CHUNK', 4)
+
+
+def test_reads_upload_within_limit():
+    assert asyncio.run(read_upload(FakeUpload(b'0123456789'), max_bytes=10)) == b'0123456789'
+
+
+def test_refuses_declared_size_before_reading():
+    upload = FakeUpload(b'0123456789', size=10)
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(read_upload(upload, max_bytes=9))
+    assert upload.offset == 0
+
+
+def test_refuses_undeclared_body_past_limit():
+    upload = FakeUpload(b'x' * 100)
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(read_upload(upload, max_bytes=9))
+    # Reading stopped at the chunk that crossed the limit
+    assert upload.offset == 12
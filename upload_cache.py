@@ -0,0 +1,168 @@
+"""
+Content-addressed result cache for the screenshot upload endpoints.
+
+Analyses are keyed by a SHA-256 of the uploaded bytes plus the analysis
+function, its parameters and the working size, so re-uploading the same
+screenshot -- or sending it to two checks sharing a kernel -- skips
+decoding and analysis entirely. Entries live in an in-memory LRU and,
+when DBIM_UPLOAD_CACHE_DIR is set, in an on-disk tier that survives
+restarts. An optional perceptual tier (DBIM_UPLOAD_CACHE_PHASH=1) also
+reuses results for screenshots that differ only by re-encoding; it keys on
+structure (dHash) and coarse colour, and serves only kernels whose results
+do not hinge on exact colours (PERCEPTUAL_KERNELS).
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from fetcher import AsyncLRUCache
+from image_pool import image_pool
+from upload_ingest import UPLOAD_WORKING_SIZES
+
+logger = logging.getLogger(__name__)
+
+# Cache settings, overridable through the environment
+UPLOAD_CACHE_TTL = float(os.getenv('DBIM_UPLOAD_CACHE_TTL', str(24 * 60 * 60)))
+UPLOAD_CACHE_MAX_ENTRIES = int(os.getenv('DBIM_UPLOAD_CACHE_MAX_ENTRIES', '512'))
+UPLOAD_CACHE_DIR = os.getenv('DBIM_UPLOAD_CACHE_DIR') or None
+UPLOAD_CACHE_DISK_MAX_ENTRIES = int(os.getenv('DBIM_UPLOAD_CACHE_DISK_MAX_ENTRIES', '4096'))
+UPLOAD_CACHE_PHASH = os.getenv('DBIM_UPLOAD_CACHE_PHASH', '0') == '1'
+
+# Bump when an analysis changes its output so stale disk entries are ignored
+ANALYSIS_VERSION = 3
+
+# Kernels whose results may be shared between similar-looking uploads. The
+# footer, text colour and palette kernels report exact colours matched within a
+# Delta E tolerance, so a re-encoded near-duplicate can flip their verdict; the
+# logo / emblem shares of dark and light pixels survive re-encoding.
+PERCEPTUAL_KERNELS = frozenset({'analyze_marks'})
+
+
+def perceptual_hash(frame: np.ndarray) -> str:
+    """64-bit difference hash (dHash) of a frame, as 16 hex digits."""
+    gray = Image.fromarray(frame).convert('L').resize((9, 8), Image.BILINEAR)
+    pixels = np.asarray(gray, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).ravel()
+    return '%016x' % int(''.join('1' if b else '0' for b in bits), 2)
+
+
+def colour_signature(frame: np.ndarray) -> str:
+    """
+    Coarse colour of a frame: a 4x4 RGB thumbnail with 16 levels per channel,
+    as 48 hex digits. Frames with the same dHash but different colours (any two
+    flat frames, say) get different signatures.
+    """
+    thumbnail = np.asarray(Image.fromarray(frame).resize((4, 4), Image.BOX), dtype=np.uint8)
+    return ''.join('%x' % level for level in (thumbnail >> 4).ravel())
+
+
+class DiskResultStore:
+    """One JSON file per result; the least recently used files are evicted past ``max_entries``."""
+
+    def __init__(self, directory: str, max_entries: int = UPLOAD_CACHE_DISK_MAX_ENTRIES):
+        self.directory = Path(directory)
+        self.max_entries = max_entries
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{hashlib.sha256(key.encode()).hexdigest()}.json"
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                value = json.load(f)
+            os.utime(path)  # mark as recently used
+            return value
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable upload cache entry {path}: {e}")
+            return None
+
+    def store(self, key: str, value: Dict[str, Any]) -> None:
+        path = self._path(key)
+        tmp = path.with_suffix('.tmp')
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(value, f)
+            os.replace(tmp, path)
+            self._evict()
+        except OSError as e:
+            logger.warning(f"Could not write upload cache entry {path}: {e}")
+
+    def _evict(self) -> None:
+        files = list(self.directory.glob('*.json'))
+        if len(files) <= self.max_entries:
+            return
+        files.sort(key=lambda p: p.stat().st_mtime)
+        for path in files[:len(files) - self.max_entries]:
+            path.unlink(missing_ok=True)
+
+
+class UploadResultCache(AsyncLRUCache):
+    """Memory (and optional disk / perceptual-hash) cache of upload analyses."""
+
+    def __init__(self, ttl: float = UPLOAD_CACHE_TTL, max_entries: int = UPLOAD_CACHE_MAX_ENTRIES,
+                 directory: Optional[str] = UPLOAD_CACHE_DIR, use_phash: bool = UPLOAD_CACHE_PHASH):
+        super().__init__(ttl, max_entries)
+        self.disk = DiskResultStore(directory) if directory else None
+        self.perceptual = AsyncLRUCache(ttl, max_entries) if use_phash else None
+        self.disk_hits = 0
+        self.perceptual_hits = 0
+
+    async def analyze(self, guideline_id: int, image_bytes: bytes,
+                      kernel: Callable[..., Dict[str, Any]], **params) -> Dict[str, Any]:
+        """
+        Return ``kernel(frame, **params)`` for the decoded upload, computing it
+        in the image pool only when no tier has a result for these bytes. The
+        upload is decoded at the guideline's working size (UPLOAD_WORKING_SIZES).
+        Results are keyed by kernel, parameters and working size rather than
+        by guideline, so checks sharing a kernel share its result.
+        """
+        max_pixels = UPLOAD_WORKING_SIZES.get(guideline_id)
+        check = (ANALYSIS_VERSION, kernel.__name__, tuple(sorted(params.items())), max_pixels)
+        key = f"{check!r}:{hashlib.sha256(image_bytes).hexdigest()}"
+
+        async def compute() -> Dict[str, Any]:
+            if self.disk is not None:
+                stored = await asyncio.to_thread(self.disk.load, key)
+                if stored is not None:
+                    self.disk_hits += 1
+                    return stored
+
+            frame = await image_pool.decode(image_bytes, max_pixels)
+            perceptual_key: Optional[Tuple] = None
+            if self.perceptual is not None and kernel.__name__ in PERCEPTUAL_KERNELS:
+                perceptual_key = (check, perceptual_hash(frame), colour_signature(frame))
+                similar = self.perceptual.peek(perceptual_key)
+                if similar is not None:
+                    self.perceptual_hits += 1
+                    return similar
+
+            result = await image_pool.run(kernel, frame, **params)
+            if perceptual_key is not None:
+                self.perceptual.put(perceptual_key, result)
+            if self.disk is not None:
+                await asyncio.to_thread(self.disk.store, key, result)
+            return result
+
+        return await self.get_or_fetch(key, compute)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        stats['disk_enabled'] = self.disk is not None
+        stats['disk_hits'] = self.disk_hits
+        stats['perceptual_enabled'] = self.perceptual is not None
+        stats['perceptual_hits'] = self.perceptual_hits
+        return stats
+
+
+upload_cache = UploadResultCache()
@@ -0,0 +1,54 @@
+"""
+Bounded ingestion of uploaded screenshots.
+
+Uploads are read in chunks and refused as soon as they pass
+UPLOAD_MAX_BYTES, and requests announcing a larger body are turned away
+before it is received. Decoding (image_pool.decode_image) checks the pixel
+count in the image header before decoding and produces at most the
+working size of the check the upload is for.
+"""
+import os
+from typing import Dict, Optional
+
+from fastapi import UploadFile
+
+from image_pool import ImageTooLarge
+
+# Ingestion settings, overridable through the environment
+UPLOAD_MAX_BYTES = int(os.getenv('DBIM_UPLOAD_MAX_BYTES', str(25 * 1024 * 1024)))
+UPLOAD_WORKING_PIXELS = int(os.getenv('DBIM_UPLOAD_WORKING_PIXELS', str(8_000_000)))
+UPLOAD_READ_CHUNK = 1024 * 1024
+# The audit endpoint takes up to four screenshots in one request
+UPLOAD_MAX_REQUEST_BYTES = 4 * UPLOAD_MAX_BYTES + 1024 * 1024
+
+# Working size per guideline, in pixels; None decodes at full resolution. Text
+# colour (9) reads thin anti-aliased glyphs, which subsampling would skip.
+UPLOAD_WORKING_SIZES: Dict[int, Optional[int]] = {
+    1: UPLOAD_WORKING_PIXELS,
+    4: UPLOAD_WORKING_PIXELS,
+    9: None,
+    10: UPLOAD_WORKING_PIXELS,
+    12: UPLOAD_WORKING_PIXELS,
+}
+
+
+class UploadTooLarge(ImageTooLarge):
+    """An upload over UPLOAD_MAX_BYTES."""
+
+
+async def read_upload(file: UploadFile, max_bytes: int = UPLOAD_MAX_BYTES) -> bytes:
+    """The bytes of ``file``, read in chunks and refused past ``max_bytes``."""
+    size = getattr(file, 'size', None)
+    if size is not None and size > max_bytes:
+        raise UploadTooLarge(f"upload is {size} bytes, more than {max_bytes}")
+    chunks = []
+    received = 0
+    while True:
+        chunk = await file.read(UPLOAD_READ_CHUNK)
+        if not chunk:
+            break
+        received += len(chunk)
+        if received > max_bytes:
+            raise UploadTooLarge(f"upload is more than {max_bytes} bytes")
+        chunks.append(chunk)
+    return b''.join(chunks)
@@ -1,11 +1,18 @@
 """Utility functions for the DBIM Toolkit."""
 import re
-import requests
-from typing import Dict, List, Optional, Any, Tuple
+import httpx
+from types import MappingProxyType
+from typing import Dict, List, Optional, Any, Sequence, Tuple, Union
 import colorsys
 import logging
 from datetime import datetime
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, Tag
+import numpy as np
+
+from fetcher import get_page
+from css_index import get_stylesheet_index
+from stylesheets import load_stylesheet_index
+from image_kernels import SRGB_TO_LINEAR, rgb_to_lab, delta_e_cie76
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -50,10 +57,9 @@ def hex_to_rgb(hex_color: str) -> Tuple[int, int, int]:
 
 def get_luminance(rgb: Tuple[int, int, int]) -> float:
     """Calculate the relative luminance of an RGB color."""
-    r, g, b = [x / 255.0 for x in rgb]
-    r = r / 12.92 if r <= 0.03928 else ((r + 0.055) / 1.055) ** 2.4
-    g = g / 12.92 if g <= 0.03928 else ((g + 0.055) / 1.055) ** 2.4
-    b = b / 12.92 if b <= 0.03928 else ((b + 0.055) / 1.055) ** 2.4
+    # Linearize through the shared 8-bit lookup table (same result as the
+    # 0.03928 WCAG threshold for every 8-bit channel value)
+    r, g, b = (float(SRGB_TO_LINEAR[int(x)]) for x in rgb)
     return 0.2126 * r + 0.7152 * g + 0.0722 * b
 
 def get_contrast_ratio(color1: str, color2: str) -> float:
@@ -68,68 +74,174 @@ def get_contrast_ratio(color1: str, color2: str) -> float:
     darker = min(l1, l2)
     return (lighter + 0.05) / (darker + 0.05)
 
+class PaletteIndex:
+    """
+    Read-only lookup tables compiled once from a palette definition:
+    hex -> group, group -> darkest tone, and the palette in CIELAB for
+    nearest-colour queries. Groups are stored contiguously in ``lab``.
+    """
+
+    def __init__(self, groups: Dict[str, List[str]]):
+        hex_to_group: Dict[str, str] = {}
+        group_darkest: Dict[str, str] = {}
+        hexes: List[str] = []
+        names: List[str] = []
+        rgbs: List[Tuple[int, int, int]] = []
+        group_starts: List[int] = []
+
+        for group_name, colors in groups.items():
+            group_starts.append(len(hexes))
+            tones = []
+            for color in colors:
+                color = color.upper()
+                hex_to_group.setdefault(color, group_name)
+                try:
+                    rgb = hex_to_rgb(color)
+                except ValueError:
+                    logger.warning(f"Palette colour {color} in {group_name} is not a valid hex colour; "
+                                   "it is excluded from nearest-colour matching")
+                    continue
+                hexes.append(color)
+                names.append(group_name)
+                rgbs.append(rgb)
+                tones.append((get_luminance(rgb), color))
+            group_darkest[group_name] = min(tones)[1]
+
+        self.hex_to_group = MappingProxyType(hex_to_group)
+        self.group_darkest = MappingProxyType(group_darkest)
+        self.group_names = tuple(groups)
+        self.hexes = tuple(hexes)
+        self.groups = tuple(names)
+        self.lab = rgb_to_lab(np.array(rgbs, dtype=np.uint8))
+        self.lab.flags.writeable = False
+        self._group_starts = np.array(group_starts)
+
+    def group_of(self, color: str) -> Optional[str]:
+        return self.hex_to_group.get(color.upper())
+
+    def distances(self, colors: Union[np.ndarray, Sequence[str]]) -> np.ndarray:
+        """Delta E (CIE76) from each colour to every palette colour, shape (N, palette size)."""
+        if len(colors) and isinstance(colors[0], str):
+            colors = np.array([hex_to_rgb(c) for c in colors], dtype=np.uint8)
+        lab = rgb_to_lab(np.asarray(colors).reshape(-1, 3))
+        return delta_e_cie76(lab[:, None, :], self.lab[None, :, :])
+
+    def nearest(self, colors: Union[np.ndarray, Sequence[str]]) -> Tuple[np.ndarray, np.ndarray]:
+        """Index into ``hexes`` of the closest palette colour and its Delta E, for each colour."""
+        dist = self.distances(colors)
+        nearest = np.argmin(dist, axis=1)
+        return nearest, dist[np.arange(dist.shape[0]), nearest]
+
+    def group_distances(self, colors: Union[np.ndarray, Sequence[str]]) -> np.ndarray:
+        """Delta E from each colour to the closest tone of every group, shape (N, groups)."""
+        return np.minimum.reduceat(self.distances(colors), self._group_starts, axis=1)
+
+
+PALETTE_INDEX = PaletteIndex(GOVERNMENT_COLOR_GROUPS)
+
+
 def find_color_group(color: str) -> Optional[str]:
     """Find which color group the given color belongs to."""
-    # Normalize the input color
-    color = color.upper()
-    
-    # Check each color group
-    for group_name, colors in GOVERNMENT_COLOR_GROUPS.items():
-        if color in [c.upper() for c in colors]:
-            return group_name
-    return None
+    return PALETTE_INDEX.group_of(color)
 
 def is_darkest_in_group(color: str, group_name: str) -> bool:
     """Check if the given color is the darkest in its group."""
-    if group_name not in GOVERNMENT_COLOR_GROUPS:
-        return False
-        
-    group_colors = GOVERNMENT_COLOR_GROUPS[group_name]
-    # The colors are ordered from lightest to darkest in each group
-    return group_colors[-1].upper() == color.upper()
+    darkest = PALETTE_INDEX.group_darkest.get(group_name)
+    return darkest is not None and darkest == color.upper()
 
-def get_button_elements(soup: BeautifulSoup) -> List[Dict[str, Any]]:
+def nearest_palette_colors(colors: Sequence[str]) -> List[Dict[str, Any]]:
     """
-    Find all button-like elements in the page.
-    Returns a list of button elements with their details.
+    Match each hex colour to its closest palette colour in one batched query.
+    Returns one dict per input with the palette colour, its group and the Delta E.
     """
-    button_selectors = [
-        'button',
-        'input[type="button"]',
-        'input[type="submit"]',
-        'a[role="button"]',
-        '.btn',
-        '.button',
-        'a[class*="btn"]',
-        'a[class*="button"]'
+    if not colors:
+        return []
+    nearest, delta_e = PALETTE_INDEX.nearest(colors)
+    return [
+        {
+            'color': color.upper(),
+            'nearest': PALETTE_INDEX.hexes[i],
+            'group': PALETTE_INDEX.groups[i],
+            'delta_e': round(float(d), 2),
+        }
+        for color, i, d in zip(colors, nearest, delta_e)
     ]
-    
+
+def closest_palette_group(colors: Sequence[str]) -> Optional[Dict[str, Any]]:
+    """
+    Pick the palette group closest to a set of brand colours: the group whose
+    nearest tones have the lowest mean Delta E across all of them.
+    """
+    if not colors:
+        return None
+    mean_distances = PALETTE_INDEX.group_distances(colors).mean(axis=0)
+    best = int(np.argmin(mean_distances))
+    group_name = PALETTE_INDEX.group_names[best]
+    return {
+        'group': group_name,
+        'darkest_tone': PALETTE_INDEX.group_darkest[group_name],
+        'mean_delta_e': round(float(mean_distances[best]), 2),
+        'ranking': [
+            {'group': PALETTE_INDEX.group_names[i], 'mean_delta_e': round(float(mean_distances[i]), 2)}
+            for i in np.argsort(mean_distances)
+        ],
+    }
+
+BUTTON_CLASS_HINTS = ('btn', 'button')
+
+def is_button_element(element: Tag) -> bool:
+    """
+    True for button-like elements: <button>, button/submit inputs, links with
+    role="button", and anything whose class marks it as a button
+    (.btn, .button, or an <a> with "btn"/"button" anywhere in its class).
+    """
+    name = element.name
+    if name == 'button':
+        return True
+    if name == 'input':
+        return element.get('type') in ('button', 'submit')
+    classes = element.get('class', [])
+    if 'btn' in classes or 'button' in classes:
+        return True
+    if name == 'a':
+        if element.get('role') == 'button':
+            return True
+        class_attr = ' '.join(classes)
+        return any(hint in class_attr for hint in BUTTON_CLASS_HINTS)
+    return False
+
+def get_button_elements(soup: BeautifulSoup) -> List[Dict[str, Any]]:
+    """
+    Find all button-like elements in the page in one pass over the tree.
+    Returns a list of button records with their details; each element appears
+    once and ``node`` keeps a reference to it for later lookups.
+    """
     buttons = []
-    for selector in button_selectors:
-        for element in soup.select(selector):
-            # Skip hidden elements
-            if element.get('style', '').lower().find('display: none') != -1:
-                continue
-                
-            # Get button text
-            text = ''
-            if element.name == 'input' and element.get('type') in ['button', 'submit']:
-                text = element.get('value', '')
-            else:
-                text = element.get_text(strip=True)
-            
-            # Skip empty or non-interactive buttons
-            if not text or len(text) < 2:
-                continue
-                
-            buttons.append({
-                'element': str(element.name),
-                'text': text[:100],  # Limit text length
-                'classes': element.get('class', []),
-                'id': element.get('id', ''),
-                'html': str(element)[:200] + ('...' if len(str(element)) > 200 else '')
-            })
-    
+    for element in soup.find_all(is_button_element):
+        # Skip hidden elements
+        if element.get('style', '').lower().find('display: none') != -1:
+            continue
+
+        # Get button text
+        if element.name == 'input':
+            text = element.get('value', '')
+        else:
+            text = element.get_text(strip=True)
+
+        # Skip empty or non-interactive buttons
+        if not text or len(text) < 2:
+            continue
+
+        html = str(element)
+        buttons.append({
+            'element': str(element.name),
+            'text': text[:100],  # Limit text length
+            'classes': element.get('class', []),
+            'id': element.get('id', ''),
+            'html': html[:200] + ('...' if len(html) > 200 else ''),
+            'node': element
+        })
+
     return buttons
 
 def get_button_background_color(element: Dict[str, Any], soup: BeautifulSoup) -> Dict[str, Any]:
@@ -139,58 +251,24 @@ def get_button_background_color(element: Dict[str, Any], soup: BeautifulSoup) ->
     
     Tries multiple methods to detect background color:
     1. Inline styles
-    2. Direct CSS selectors
-    3. Parent element styles
+    2. Parent element styles
+    3. Stylesheet rules matching the element (via the page's stylesheet index)
     4. CSS class-based selectors
+
+    The result is memoized on the button record.
     """
-    def get_element_selectors(el):
-        """Generate all possible CSS selectors for an element."""
-        selectors = []
-        
-        # Element name
-        if el.name:
-            selectors.append(el.name)
-            
-        # ID selector
-        if el.get('id'):
-            selectors.append(f'#{el["id"]}')
-            
-        # Class selectors
-        for cls in el.get('class', []):
-            selectors.append(f'.{cls}')
-            
-        # Combined selectors
-        combined = []
-        if el.name:
-            if el.get('id'):
-                combined.append(f'{el.name}#{el["id"]}')
-            if el.get('class'):
-                combined.append(f"{el.name}.{'.'.join(el['class'])}")
-        
-        return selectors + combined
-
-    def find_background_in_styles(style_text, selectors):
-        """Search for background color in style text using multiple selectors."""
-        for sel in selectors:
-            # Look for direct background-color rules
-            bg_pattern = rf'{re.escape(sel)}\s*{{[^}}]*background(?:-color)?\s*:\s*([^;}}]+)'
-            bg_match = re.search(bg_pattern, style_text, re.IGNORECASE | re.DOTALL)
-            if bg_match:
-                return bg_match.group(1).strip()
-                
-            # Look for background shorthand
-            bg_shorthand = rf'{re.escape(sel)}\s*{{[^}}]*background\s*:\s*([^;}}]+)'
-            bg_match = re.search(bg_shorthand, style_text, re.IGNORECASE | re.DOTALL)
-            if bg_match:
-                return bg_match.group(1).split()[0].strip()  # Take first value from shorthand
-        return None
+    if 'color_info' in element:
+        return element['color_info']
+    element['color_info'] = _resolve_button_background_color(element, soup)
+    return element['color_info']
 
+def _resolve_button_background_color(element: Dict[str, Any], soup: BeautifulSoup) -> Dict[str, Any]:
     try:
-        # Try to find the element in the soup
-        element_obj = None
-        if element.get('id'):
+        # Records from get_button_elements carry the node itself; otherwise find it again
+        element_obj = element.get('node')
+        if element_obj is None and element.get('id'):
             element_obj = soup.select_one(f'#{element["id"]}')
-        elif element.get('classes'):
+        elif element_obj is None and element.get('classes'):
             # Try different combinations of classes
             for cls in element['classes']:
                 element_obj = soup.select_one(f'.{cls}')
@@ -204,61 +282,55 @@ def get_button_background_color(element: Dict[str, Any], soup: BeautifulSoup) ->
                 'note': 'Try checking if the element has dynamic classes or IDs'
             }
         
+        css_index = get_stylesheet_index(soup)
+
         # 1. Check inline style first (highest priority)
-        style = element_obj.get('style', '')
-        bg_match = re.search(r'background(?:-color)?\s*:\s*(#[0-9a-fA-F]{3,8}|rgba?\s*\([^)]+\)|\w+)', style, re.IGNORECASE)
-        if bg_match:
+        color = css_index.inline_background_color(element_obj.get('style', ''))
+        if color:
             return {
                 'status': 'success',
-                'color': bg_match.group(1).strip(),
+                'color': color,
                 'source': 'inline_style'
             }
         
         # 2. Check parent elements for inherited styles
         parent = element_obj.parent
         while parent and parent.name:
-            parent_style = parent.get('style', '')
-            bg_match = re.search(r'background(?:-color)?\s*:\s*(#[0-9a-fA-F]{3,8}|rgba?\s*\([^)]+\)|\w+)', 
-                               parent_style, re.IGNORECASE)
-            if bg_match:
+            color = css_index.inline_background_color(parent.get('style', ''))
+            if color:
                 return {
                     'status': 'success',
-                    'color': bg_match.group(1).strip(),
+                    'color': color,
                     'source': 'parent_inline_style',
                     'parent_tag': parent.name
                 }
             parent = parent.parent
             
-        # 3. Check all style tags for matching selectors
-        element_selectors = get_element_selectors(element_obj)
-        
-        for style_tag in soup.find_all('style'):
-            style_text = style_tag.get_text()
-            bg_color = find_background_in_styles(style_text, element_selectors)
-            if bg_color:
-                return {
-                    'status': 'success',
-                    'color': bg_color,
-                    'source': 'stylesheet',
-                    'selector': next((s for s in element_selectors if s in style_text), '')
-                }
+        # 3. Check the stylesheet rules that match the element
+        match = css_index.background_color(element_obj)
+        if match:
+            color, rule = match
+            return {
+                'status': 'success',
+                'color': color,
+                'source': 'stylesheet',
+                'selector': rule.selector,
+                'specificity': list(rule.specificity)
+            }
         
         # 4. Check for common button classes
         common_button_classes = ['btn', 'button', 'primary', 'secondary', 'cta']
-        for cls in element_obj.get('class', []):
-            if cls in common_button_classes:
-                # Look for common button styles
-                for style_tag in soup.find_all('style'):
-                    style_text = style_tag.get_text()
-                    for btn_class in common_button_classes:
-                        bg_color = find_background_in_styles(style_text, [f'.{btn_class}'])
-                        if bg_color:
-                            return {
-                                'status': 'success',
-                                'color': bg_color,
-                                'source': 'common_button_style',
-                                'class': btn_class
-                            }
+        if any(cls in common_button_classes for cls in element_obj.get('class', [])):
+            # Look for common button styles
+            for btn_class in common_button_classes:
+                match = css_index.background_color_for_key(f'.{btn_class}')
+                if match:
+                    return {
+                        'status': 'success',
+                        'color': match[0],
+                        'source': 'common_button_style',
+                        'class': btn_class
+                    }
         
         return {
             'status': 'no_background_found',
@@ -278,16 +350,9 @@ def is_color_in_palette(color: str) -> bool:
     """
     Check if a color is in any of the government color palette groups.
     """
-    # Normalize the color to uppercase for comparison
-    color = color.upper()
-    
-    # Check all colors in all groups
-    for group_name, colors in GOVERNMENT_COLOR_GROUPS.items():
-        if color in [c.upper() for c in colors]:
-            return True
-    return False
+    return color.upper() in PALETTE_INDEX.hex_to_group
 
-def get_footer_background_color(url: str) -> Dict[str, Any]:
+async def get_footer_background_color(url: str) -> Dict[str, Any]:
     """
     Extract the background color of the footer element from a given URL.
     
@@ -298,18 +363,13 @@ def get_footer_background_color(url: str) -> Dict[str, Any]:
         Dict containing status, color, and element information
     """
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        # Make sure URL has a scheme
-        if not url.startswith(('http://', 'https://')):
-            url = 'https://' + url
-            
-        response = requests.get(url, headers=headers, timeout=15, allow_redirects=True)
-        response.raise_for_status()
+        # Shared, cached fetch through the async HTTP client
+        page = await get_page(url)
+        page.raise_for_status()
         
-        soup = BeautifulSoup(response.text, 'html.parser')
+        soup = page.soup
+        # Linked stylesheets are fetched (or revalidated from the shared cache) once per page
+        await load_stylesheet_index(soup, page.url)
         
         # Try different ways to find the footer
         footer = None
@@ -336,57 +396,40 @@ def get_footer_background_color(url: str) -> Dict[str, Any]:
                 'tried_selectors': footer_selectors
             }
         
+        css_index = get_stylesheet_index(soup)
+
         # Check inline styles
-        if footer.has_attr('style'):
-            style = footer['style']
-            bg_match = re.search(r'background(?:-color)?\s*:\s*(#[0-9a-fA-F]{3,8}|rgba?\s*\([^)]+\)|\w+)', style, re.IGNORECASE)
-            if bg_match:
-                return {
-                    'status': 'success',
-                    'color': bg_match.group(1).strip(),
-                    'element': str(footer.name),
-                    'source': 'inline_style'
-                }
-        
-        # Check style attribute
-        style = footer.get('style', '')
-        if style:
-            bg_match = re.search(r'background(?:-color)?\s*:\s*(#[0-9a-fA-F]{3,8}|rgba?\s*\([^)]+\)|\w+)', style, re.IGNORECASE)
-            if bg_match:
-                return {
-                    'status': 'success',
-                    'color': bg_match.group(1).strip(),
-                    'element': str(footer.name),
-                    'source': 'style_attribute'
-                }
+        color = css_index.inline_background_color(footer.get('style', ''))
+        if color:
+            return {
+                'status': 'success',
+                'color': color,
+                'element': str(footer.name),
+                'source': 'inline_style'
+            }
         
-        # Check computed styles from stylesheets (basic implementation)
-        for style_tag in soup.find_all('style'):
-            # Look for footer-related styles
-            style_text = style_tag.get_text()
-            if any(selector in style_text for selector in ['.footer', '#footer', 'footer[', 'footer ', 'footer.']):
-                # Try to find specific background color definitions
-                bg_match = re.search(r'(?:footer[^{}]*|\.[^{}]*footer[^{}]*|#[^{}]*footer[^{}]*)\s*{[^}]*background(?:-color)?\s*:\s*([^;\n}]+)', style_text, re.IGNORECASE)
-                if bg_match:
-                    color = bg_match.group(1).strip()
-                    return {
-                        'status': 'success',
-                        'color': color,
-                        'element': str(footer.name),
-                        'source': 'stylesheet_parsed',
-                        'note': 'Color extracted from stylesheet'
-                    }
+        # Check the stylesheet rules that match the footer
+        match = css_index.background_color(footer)
+        if match:
+            color, rule = match
+            return {
+                'status': 'success',
+                'color': color,
+                'element': str(footer.name),
+                'source': 'stylesheet_parsed',
+                'selector': rule.selector,
+                'note': 'Color extracted from stylesheet'
+            }
         
         # Check parent elements for background color
         parent = footer.parent
         for _ in range(3):  # Check up to 3 levels up
             if parent and hasattr(parent, 'get'):
-                parent_style = parent.get('style', '')
-                bg_match = re.search(r'background(?:-color)?\s*:\s*(#[0-9a-fA-F]{3,8}|rgba?\s*\([^)]+\)|\w+)', parent_style, re.IGNORECASE)
-                if bg_match:
+                color = css_index.inline_background_color(parent.get('style', ''))
+                if color:
                     return {
                         'status': 'success',
-                        'color': bg_match.group(1).strip(),
+                        'color': color,
                         'element': f"{parent.name} (parent of footer)",
                         'source': 'parent_element_style',
                         'note': 'Color found on a parent element of the footer'
@@ -397,12 +440,11 @@ def get_footer_background_color(url: str) -> Dict[str, Any]:
         
         # Check child elements for background color (common in modern designs)
         for child in footer.find_all(recursive=False, limit=5):  # Check first 5 direct children
-            child_style = child.get('style', '')
-            bg_match = re.search(r'background(?:-color)?\s*:\s*(#[0-9a-fA-F]{3,8}|rgba?\s*\([^)]+\)|\w+)', child_style, re.IGNORECASE)
-            if bg_match:
+            color = css_index.inline_background_color(child.get('style', ''))
+            if color:
                 return {
                     'status': 'success',
-                    'color': bg_match.group(1).strip(),
+                    'color': color,
                     'element': f"{child.name} (child of footer)",
                     'source': 'child_element_style',
                     'note': 'Color found on a child element of the footer'
@@ -452,7 +494,7 @@ def get_footer_background_color(url: str) -> Dict[str, Any]:
             'note': 'Consider checking the computed styles in browser developer tools for more accurate results.'
         }
         
-    except requests.RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f"Request error: {e}")
         return {
             'status': 'request_error',